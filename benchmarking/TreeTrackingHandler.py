@@ -25,6 +25,7 @@ class TrackingModeEnum(str, Enum):
     NODE_STEAL = "node_steal"
 
     REBALANCING = "rebalance"
+    BULK_LOAD = "bulk_load"
     OVERWRITE_PARENT = 'IO_overwrite_parent_pointer'
 
     # For buffer tree only:
@@ -33,6 +34,7 @@ class TrackingModeEnum(str, Enum):
     MERGE_BUFFER_WITH_LEAF = 'merge_sort_buffer_with_leafs'
 
     FLUSH_ALL_BUFFERS = "flush_buffers"
+    FLUSH_BUFFERS_FOR_RANGE = "flush_buffers_for_range"
 
     INTERNAL_BUFFER_EMPTYING = "internal_buffer_emptying"
     LEAF_BUFFER_EMPTYING = "leaf_buffer_emptying"
@@ -45,6 +47,9 @@ class TrackingModeEnum(str, Enum):
     # Sub-modes for IOCalls writing and reading
     NODE_READ = "IO_node_read"
     NODE_WRITE = "IO_node_write"
+    # Logical node reads, which were (not) answered by the node cache. Physical reads and writes are still counted as NODE_READ/NODE_WRITE
+    NODE_CACHE_HIT = "node_cache_hit"
+    NODE_CACHE_MISS = "node_cache_miss"
 
     BUFFER_ELEMENT_READ = "IO_buffer_elem_read"
     BUFFER_ELEMENT_WRITE = "IO_buffer_elem_write"
@@ -247,6 +252,12 @@ class TreeTrackingHandler:
     def exit_merge_with_neighbor_mode(self):
         self._exit_mode(TrackingModeEnum.NODE_MERGE)
 
+    def enter_bulk_load_mode(self):
+        self._enter_mode(TrackingModeEnum.BULK_LOAD)
+
+    def exit_bulk_load_mode(self):
+        self._exit_mode(TrackingModeEnum.BULK_LOAD)
+
     def enter_initial_buffer_emptying_mode(self):
         self._enter_mode(TrackingModeEnum.TREE_BUFFER_FULL)
 
@@ -259,6 +270,12 @@ class TreeTrackingHandler:
     def exit_buffer_flush_mode(self):
         self._exit_mode(TrackingModeEnum.FLUSH_ALL_BUFFERS)
 
+    def enter_range_buffer_flush_mode(self):
+        self._enter_mode(TrackingModeEnum.FLUSH_BUFFERS_FOR_RANGE)
+
+    def exit_range_buffer_flush_mode(self):
+        self._exit_mode(TrackingModeEnum.FLUSH_BUFFERS_FOR_RANGE)
+
     def enter_internal_buffer_emptying_mode(self):
         self._enter_mode(TrackingModeEnum.INTERNAL_BUFFER_EMPTYING)
 
@@ -331,6 +348,18 @@ class TreeTrackingHandler:
     def exit_node_write_sub_mode(self, counter):
         self._exit_sub_mode(TrackingModeEnum.NODE_WRITE, counter)
 
+    def enter_node_cache_hit_sub_mode(self):
+        self._enter_mode(TrackingModeEnum.NODE_CACHE_HIT)
+
+    def exit_node_cache_hit_sub_mode(self, counter):
+        self._exit_sub_mode(TrackingModeEnum.NODE_CACHE_HIT, counter)
+
+    def enter_node_cache_miss_sub_mode(self):
+        self._enter_mode(TrackingModeEnum.NODE_CACHE_MISS)
+
+    def exit_node_cache_miss_sub_mode(self, counter):
+        self._exit_sub_mode(TrackingModeEnum.NODE_CACHE_MISS, counter)
+
     def enter_buffer_element_read_sub_mode(self):
         self._enter_mode(TrackingModeEnum.BUFFER_ELEMENT_READ)
 
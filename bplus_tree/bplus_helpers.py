@@ -40,6 +40,24 @@ def get_node_file_name(node_id):
     return f'{NODE_STRING}_{node_id}_data.txt'
 
 
+def group_into_nodes_with_fill_size(children, fill_size, max_size):
+    """ Groups the children iterable into lists of fill_size children, except for the last two groups, which share the rest evenly and hold at most max_size children.
+        So if there is more than one group, every group has at least min(fill_size, (max_size + 1) // 2) children. Holds at most fill_size + max_size children at once."""
+    pending_children = []
+    for child in children:
+        pending_children.append(child)
+        if len(pending_children) == fill_size + max_size:
+            yield pending_children[:fill_size]
+            pending_children = pending_children[fill_size:]
+
+    if len(pending_children) > max_size:
+        half = len(pending_children) // 2
+        yield pending_children[:half]
+        yield pending_children[half:]
+    elif pending_children:
+        yield pending_children
+
+
 def get_max_int():
     return sys.maxsize
 
@@ -0,0 +1,94 @@
+from collections import OrderedDict
+
+
+class BufferPool:
+    """ Fixed amount of in-memory node frames. Unpinned frames are evicted least recently used first, dirty frames are written back
+        (via write_back(node)) once they get evicted or the pool is flushed. Pinned frames are never evicted, so the pool may hold more frames than
+        amount_frames if more nodes are pinned than there are frames.
+        Nodes are copied when putting and getting them, so changes to a loaded node never reach the pool without writing the node."""
+    def __init__(self, amount_frames, write_back):
+        if amount_frames < 0:
+            raise ValueError(f"Amount of buffer pool frames must not be negative, but is {amount_frames}")
+
+        self.amount_frames = amount_frames
+        self.write_back = write_back
+        # node_id -> [node, is_dirty]. Only unpinned frames are in the LRU order (least recently used first), so evicting takes the first one
+        self.frames = OrderedDict()
+        self.pinned_frames = {}
+        self.pinned_node_ids = set()
+
+    def is_enabled(self):
+        return self.amount_frames > 0
+
+    def get(self, node_id):
+        # Returns a copy of the node, or None if the node isn't in the pool
+        frame = self.pinned_frames.get(node_id)
+        if frame is None:
+            frame = self.frames.get(node_id)
+            if frame is None:
+                return None
+            self.frames.move_to_end(node_id)
+        return frame[0].copy()
+
+    def put(self, node, is_dirty):
+        frames = self.pinned_frames if node.node_id in self.pinned_node_ids else self.frames
+        frame = frames.get(node.node_id)
+        if frame is not None:
+            # A clean put (after a read) must not lose an earlier write
+            is_dirty = is_dirty or frame[1]
+            if frames is self.frames:
+                self.frames.move_to_end(node.node_id)
+        frames[node.node_id] = [node.copy(), is_dirty]
+
+        self.evict_unpinned_frames()
+
+    def pin(self, node_id):
+        # Node stays resident once it is in the pool, until it gets unpinned
+        self.pinned_node_ids.add(node_id)
+        frame = self.frames.pop(node_id, None)
+        if frame is not None:
+            self.pinned_frames[node_id] = frame
+
+    def unpin(self, node_id):
+        self.pinned_node_ids.discard(node_id)
+        self.move_to_unpinned_frames(node_id)
+        self.evict_unpinned_frames()
+
+    def unpin_all(self):
+        self.pinned_node_ids.clear()
+        for node_id in list(self.pinned_frames):
+            self.move_to_unpinned_frames(node_id)
+        self.evict_unpinned_frames()
+
+    def move_to_unpinned_frames(self, node_id):
+        # Unpinned nodes are the first to be evicted, they were only resident because of the pin
+        frame = self.pinned_frames.pop(node_id, None)
+        if frame is not None:
+            self.frames[node_id] = frame
+            self.frames.move_to_end(node_id, last=False)
+
+    def is_pinned(self, node_id):
+        return node_id in self.pinned_node_ids
+
+    def all_frames(self):
+        # (node_id, [node, is_dirty]) of the pinned and unpinned frames
+        yield from self.pinned_frames.items()
+        yield from self.frames.items()
+
+    def discard(self, node_id):
+        # Node got deleted, so it must never be written back
+        self.frames.pop(node_id, None)
+        self.pinned_frames.pop(node_id, None)
+        self.pinned_node_ids.discard(node_id)
+
+    def flush(self):
+        for _, frame in self.all_frames():
+            if frame[1]:
+                self.write_back(frame[0])
+                frame[1] = False
+
+    def evict_unpinned_frames(self):
+        while self.frames and len(self.frames) + len(self.pinned_frames) > self.amount_frames:
+            _, (evicted_node, evicted_is_dirty) = self.frames.popitem(last=False)
+            if evicted_is_dirty:
+                self.write_back(evicted_node)
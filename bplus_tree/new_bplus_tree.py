@@ -1,7 +1,10 @@
 """ Bplus Tree after description of Comer"""
 import math
+from bisect import bisect_left
 from itertools import chain
 from bplus_tree.bplus_helpers import *
+from bplus_tree.buffer_pool import BufferPool
+from current_implementation.key_type import get_key_type, KEY_TYPES, StrKeyType
 from abc import abstractmethod
 from benchmarking.TreeTrackingHandler import *
 
@@ -75,15 +78,27 @@ class AbstractNode:
     def merge_with_neighbor(self, parent_split_key_index, neighbor_node, parent_node, is_left_neighbor):
         raise NotImplementedError()
 
+    @abstractmethod
+    def copy(self):
+        raise NotImplementedError()
+
 
 class BPlusTree:
 
     tree_instance = None
 
-    def __init__(self, order, max_leaf_size=None):
+    def __init__(self, order, max_leaf_size=None, buffer_pool_frames=0, pinned_levels=1, key_type='str'):
+        """ buffer_pool_frames: Amount of nodes kept in memory, 0 disables the buffer pool. Written nodes are only written back once they get evicted or
+            flush_buffer_pool is called.
+            pinned_levels: Amount of levels from the root downwards whose nodes are pinned in the buffer pool and never evicted.
+            key_type: Keys are str, int or bytes (by name or type) and compared natively."""
+        if pinned_levels < 0:
+            raise ValueError(f"Amount of pinned levels must not be negative, but is {pinned_levels}")
+
         clean_up_and_initialize_resource_directories()
 
         BPlusTree.tree_instance = self
+        self.key_type = get_key_type(key_type)
         self.b = order
         self.a = math.ceil(order / 2)
 
@@ -102,9 +117,12 @@ class BPlusTree:
         self.tracking_handler = TreeTrackingHandler()
         self.root_node_type = NodeType.LEAF
 
+        self.buffer_pool = BufferPool(buffer_pool_frames, write_back=write_node_to_ext_memory)
+        self.pinned_levels = pinned_levels
+
         root_node = self.create_root_leaf()
         write_node(root_node)
-        self.root_node_id = root_node.node_id
+        self.set_root_node(root_node)
 
     # Must be called from outside this script
     def start_tracking_handler(self):
@@ -113,12 +131,28 @@ class BPlusTree:
     def stop_tracking_handler(self, benchmark_name=None):
         self.tracking_handler.stop_tracking(is_buffer_tree=False, benchmark_name=benchmark_name)
 
+    def flush_buffer_pool(self):
+        # Writes all nodes that have only been written to the buffer pool so far to external memory
+        self.buffer_pool.flush()
+
+    def set_root_node(self, root_node):
+        # Pins of the old upper levels are dropped, the new ones get pinned while finding leaves
+        self.root_node_id = root_node.node_id
+        self.root_node_type = root_node.node_type
+        self.buffer_pool.unpin_all()
+        self.pin_node_at_depth(self.root_node_id, 0)
+
+    def pin_node_at_depth(self, node_id, depth):
+        if depth < self.pinned_levels and self.buffer_pool.is_enabled():
+            self.buffer_pool.pin(node_id)
+
     @staticmethod
     def create_root_leaf():
         # Returns an empty Leaf
         return Leaf()
 
     def insert_to_tree(self, ele):
+        self.key_type.check_key(ele)
         self.tracking_handler.enter_insert_to_tree_mode()
 
         root_node = self.load_root()
@@ -131,10 +165,70 @@ class BPlusTree:
 
         self.tracking_handler.exit_insert_to_tree_mode()
 
+    def bulk_load(self, sorted_iterable, fill_factor=1.0):
+        """ Loads the sorted elements into the (empty) tree by writing the leaves from left to right and building the nodes bottom-up.
+            Leaves and nodes are filled to fill_factor of their maximum size, but at least to their minimum size. Elements occurring several times are only loaded once."""
+        def strictly_ascending_elements():
+            previous_element = None
+            for element in map(self.key_type.check_key, sorted_iterable):
+                if previous_element is not None and element <= previous_element:
+                    if element == previous_element:
+                        continue
+                    raise ValueError(f"Bulk load expects sorted elements, but {previous_element} comes before {element}")
+                previous_element = element
+                yield element
+
+        def build_leaves():
+            for leaf_elements in group_into_nodes_with_fill_size(strictly_ascending_elements(), leaf_fill_size, self.max_leaf_size):
+                yield Leaf(children=leaf_elements), leaf_elements[-1]
+
+        def build_level(children_with_biggest_keys, node_type):
+            for group in group_into_nodes_with_fill_size(children_with_biggest_keys, node_fill_size, self.b):
+                new_node = BPlusTreeNode(node_type=node_type, split_keys=[biggest_key for _, biggest_key in group[:-1]], children=[child.node_id for child, _ in group])
+                for child, _ in group:
+                    child.parent_id = new_node.node_id
+                    write_node(child)
+                yield new_node, group[-1][1]
+
+        if not 0 < fill_factor <= 1:
+            raise ValueError(f"Fill factor must be in ]0; 1], but is {fill_factor}")
+
+        old_root_node = self.load_root()
+        if not old_root_node.is_leaf() or old_root_node.children:
+            raise ValueError(f"Bulk loading is only possible for an empty tree, but root node is {old_root_node}")
+
+        self.tracking_handler.enter_bulk_load_mode()
+
+        leaf_fill_size = max(self.min_leaf_size, math.floor(self.max_leaf_size * fill_factor))
+        node_fill_size = max(self.a, math.floor(self.b * fill_factor))
+
+        level = build_leaves()
+        parent_node_type = NodeType.LEAF_NODE
+        new_root_node = None
+        while new_root_node is None:
+            first = next(level, None)
+            if first is None:
+                break
+            second = next(level, None)
+            if second is None:
+                new_root_node = first[0]
+            else:
+                level = build_level(chain([first, second], level), parent_node_type)
+                parent_node_type = NodeType.INTERNAL_NODE
+
+        if new_root_node is not None:
+            new_root_node.parent_id = None
+            write_node(new_root_node)
+            delete_node(old_root_node.node_id)
+            self.set_root_node(new_root_node)
+
+        self.tracking_handler.exit_bulk_load_mode()
+
     def load_root(self):
         return load_node(self.root_node_id, is_leaf=self.root_node_type == NodeType.LEAF)
 
     def delete_from_tree(self, k):
+        self.key_type.check_key(k)
         self.tracking_handler.enter_delete_from_tree_mode()
 
         root_node = self.load_root()
@@ -161,8 +255,7 @@ class BPlusTree:
                 # Create new root, if previous root has gotten too big
                 new_root_node_type = self.parent_type_of_node_type(node_to_be_split.node_type)
                 parent_node = BPlusTreeNode(node_type=new_root_node_type, split_keys=[split_key_for_parent], children=[neighbor_node.node_id, node_to_be_split.node_id])
-                self.root_node_type = new_root_node_type
-                self.root_node_id = parent_node.node_id
+                self.set_root_node(parent_node)
                 neighbor_node.parent_id = parent_node.node_id
                 node_to_be_split.parent_id = parent_node.node_id
             else:
@@ -186,9 +279,12 @@ class BPlusTree:
     def find_leaf_for_element_iteratively(self, current_node: AbstractNode, ele):
         self.tracking_handler.enter_find_leaf_mode()
 
+        depth = 0
         while not current_node.is_leaf():
             node_id = current_node.find_fitting_child_for_key(ele)
 
+            depth += 1
+            self.pin_node_at_depth(node_id, depth)
             current_node = load_node(node_id, current_node.is_leaf_node())
 
         self.tracking_handler.exit_find_leaf_mode()
@@ -229,14 +325,14 @@ class BPlusTree:
                 self.handle_too_small_root_node(too_small_node)
                 too_small_node = None
             else:
-                parent_node = load_node_non_leaf(too_small_node.parent_id)
+                parent_node = load_node(too_small_node.parent_id, is_leaf=False)
                 neighbor_node, parent_split_key_index, is_left_neighbor = parent_node.get_neighbor_of_child_id(too_small_node.node_id)
                 if len(neighbor_node.children) > self.min_amount_of_children_for_node(neighbor_node):
                     too_small_node.steal_from_neighbor(parent_split_key_index, neighbor_node, parent_node, is_left_neighbor)
                     write_node(neighbor_node)
                 else:
                     too_small_node.merge_with_neighbor(parent_split_key_index, neighbor_node, parent_node, is_left_neighbor)
-                    delete_node_data_from_ext_memory(neighbor_node.node_id)
+                    delete_node(neighbor_node.node_id)
 
                 write_node(too_small_node)
 
@@ -252,12 +348,11 @@ class BPlusTree:
         if len(old_root_node.children) != 1 or old_root_node.is_leaf():
             raise ValueError(f"Trying to handle root {old_root_node}. It does not have exactly one child or is a Leaf Node")
 
-        self.root_node_id = old_root_node.children[0]
         new_root_node = load_node(old_root_node.children[0], is_leaf=old_root_node.is_leaf_node())
-        self.root_node_type = new_root_node.node_type
         new_root_node.parent_id = None
         write_node(new_root_node)
-        delete_node_data_from_ext_memory(old_root_node.node_id)
+        delete_node(old_root_node.node_id)
+        self.set_root_node(new_root_node)
 
 
 class BPlusTreeNode(AbstractNode):
@@ -273,15 +368,15 @@ class BPlusTreeNode(AbstractNode):
     def __str__(self):
         return f'{self.node_id}: {self.__dict__}'
 
+    def copy(self):
+        return BPlusTreeNode(node_type=self.node_type, node_id=self.node_id, split_keys=list(self.split_keys), children=list(self.children), parent_id=self.parent_id)
+
     def index_for_child(self, child):
         return self.children.index(child)
 
     def child_index_according_to_split_keys(self, ele):
-        i = 0
-        while i < len(self.split_keys) and ele > self.split_keys[i]:
-            i += 1
-
-        return i
+        # Index of the first key not smaller than ele
+        return bisect_left(self.split_keys, ele)
 
     def find_fitting_child_for_key(self, k):
         if len(self.split_keys) != len(self.children) - 1:
@@ -423,12 +518,12 @@ class Leaf(AbstractNode):
     def __init__(self, node_id=None, children=None, parent_id=None):
         super().__init__(NodeType.LEAF, node_id, children, parent_id)
 
-    def child_index_according_to_split_keys(self, ele):
-        i = 0
-        while i < len(self.children) and ele > self.children[i]:
-            i += 1
+    def copy(self):
+        return Leaf(node_id=self.node_id, children=list(self.children), parent_id=self.parent_id)
 
-        return i
+    def child_index_according_to_split_keys(self, ele):
+        # Index of the first key not smaller than ele
+        return bisect_left(self.children, ele)
 
     def split_return_new_neighbor_and_split_key_to_parent(self):
         children_for_neighbor = self.split_children_in_half_return_left_half()
@@ -439,14 +534,33 @@ class Leaf(AbstractNode):
         return new_left_neighbor_node, split_key_to_parent
 
     def leaf_delete_child_for_key(self, k):
-        if k in self.children:
-            self.children.remove(k)
+        child_index = self.child_index_according_to_split_keys(k)
+        if child_index < len(self.children) and self.children[child_index] == k:
+            del self.children[child_index]
 
 
 def load_node(node_id, is_leaf) -> BPlusTreeNode | Leaf:
 
     # Tracking happens in sub-call
 
+    buffer_pool = get_buffer_pool()
+    if buffer_pool is None:
+        return load_node_from_ext_memory(node_id, is_leaf)
+
+    node = buffer_pool.get(node_id)
+    if node is not None:
+        get_tracking_handler_instance().enter_node_cache_hit_sub_mode()
+        get_tracking_handler_instance().exit_node_cache_hit_sub_mode(1)
+        return node
+
+    get_tracking_handler_instance().enter_node_cache_miss_sub_mode()
+    get_tracking_handler_instance().exit_node_cache_miss_sub_mode(1)
+    node = load_node_from_ext_memory(node_id, is_leaf)
+    buffer_pool.put(node, is_dirty=False)
+    return node
+
+
+def load_node_from_ext_memory(node_id, is_leaf) -> BPlusTreeNode | Leaf:
     if is_leaf:
         return load_leaf(node_id)
     else:
@@ -472,7 +586,7 @@ def load_node_non_leaf(node_id) -> BPlusTreeNode:
 
     num_handles = int(first_line[1])
     index = 2
-    split_keys = first_line[index:index + num_handles]
+    split_keys = [get_key_type_instance().from_text(split_key) for split_key in first_line[index:index + num_handles]]
     index += num_handles
 
     num_children = int(first_line[index])
@@ -503,6 +617,8 @@ def load_leaf(node_id) -> Leaf:
     with open(leaf_file_path, 'r') as f:
         elements = [line[:-1] for line in f]
         parent_id = elements.pop(-1)
+    from_text = get_key_type_instance().from_text
+    elements = [from_text(element) for element in elements]
 
     if parent_id == 'None':
         parent_id = None
@@ -525,6 +641,14 @@ def overwrite_parent_id(child_id, new_parent_id, is_leaf):
 
 
 def write_node(node: AbstractNode):
+    buffer_pool = get_buffer_pool()
+    if buffer_pool is None:
+        write_node_to_ext_memory(node)
+    else:
+        buffer_pool.put(node, is_dirty=True)
+
+
+def write_node_to_ext_memory(node: AbstractNode):
     if node.is_leaf():
         write_leaf(node)
     elif isinstance(node, BPlusTreeNode):
@@ -539,8 +663,9 @@ def write_leaf(leaf):
     file_path = get_file_path_for_node_id(leaf.node_id)
 
     with open(file_path, 'w') as f:
+        to_text = get_key_type_instance().to_text
         for ele in leaf.children:
-            f.write(f'{ele}\n')
+            f.write(f'{to_text(ele)}\n')
         f.write(f'{leaf.parent_id}\n')
 
     get_tracking_handler_instance().exit_leaf_element_write_sub_mode(len(leaf.children))
@@ -549,7 +674,8 @@ def write_leaf(leaf):
 def write_node_non_leaf(node: BPlusTreeNode):
     get_tracking_handler_instance().enter_node_write_sub_mode()
 
-    first_line_raw = [node.node_type.value, len(node.split_keys), *node.split_keys, len(node.children), *node.children]
+    to_text = get_key_type_instance().to_text
+    first_line_raw = [node.node_type.value, len(node.split_keys), *(to_text(split_key) for split_key in node.split_keys), len(node.children), *node.children]
     first_line_str = [str(elem) for elem in first_line_raw]
 
     first_line_output_string = SEP.join(first_line_str)
@@ -564,10 +690,34 @@ def write_node_non_leaf(node: BPlusTreeNode):
     get_tracking_handler_instance().exit_node_write_sub_mode(1)
 
 
+def delete_node(node_id):
+    buffer_pool = get_buffer_pool()
+    if buffer_pool is not None:
+        buffer_pool.discard(node_id)
+    # With a buffer pool, a node might never have been written back before being deleted
+    if os.path.exists(get_file_path_for_node_id(node_id)):
+        delete_node_data_from_ext_memory(node_id)
+
+
 def get_tree_instance() -> BPlusTree:
     return BPlusTree.tree_instance
 
 
+def get_key_type_instance():
+    # Nodes created without a tree (only in some unit tests) hold string keys
+    tree = get_tree_instance()
+    if tree is None:
+        return KEY_TYPES[StrKeyType.name]
+    return tree.key_type
+
+
+def get_buffer_pool() -> BufferPool | None:
+    tree = get_tree_instance()
+    if tree is None or not tree.buffer_pool.is_enabled():
+        return None
+    return tree.buffer_pool
+
+
 def get_tracking_handler_instance() -> TreeTrackingHandler:
     # Kinda fails for some unit tests where no tree, but only nodes are created... So let's return a dummy TrackingHandler, without a tree, tracker isn't enabled anyways
     tree = get_tree_instance()
@@ -0,0 +1,77 @@
+import random
+import unittest
+from bplus_tree.new_bplus_tree import *
+from bplus_tree.buffer_pool import BufferPool
+from current_implementation.create_comparable_string import create_string_from_int_biggest_number
+from get_all_leaf_elements import get_all_leaf_elements
+
+
+class TestBufferPool(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+
+    def test_pinned_frames_are_not_evicted(self):
+        written_back = []
+        pool = BufferPool(2, write_back=lambda node: written_back.append(node.node_id))
+        pool.pin('1')
+        pool.put(Leaf(node_id='1'), is_dirty=True)
+        pool.put(Leaf(node_id='2'), is_dirty=True)
+        pool.put(Leaf(node_id='3'), is_dirty=False)
+        self.assertEqual(['2'], written_back)
+        self.assertEqual(['3'], list(pool.frames))
+        self.assertEqual(['1'], list(pool.pinned_frames))
+
+        pool.unpin('1')
+        pool.put(Leaf(node_id='4'), is_dirty=False)
+        self.assertEqual(['2', '1'], written_back)
+        self.assertIsNone(pool.get('1'))
+
+    def test_nodes_are_copied(self):
+        pool = BufferPool(2, write_back=lambda node: None)
+        node = BPlusTreeNode(node_type=NodeType.LEAF_NODE, node_id='1', split_keys=['b'], children=['2', '3'])
+        pool.put(node, is_dirty=True)
+        node.children.append('4')
+        loaded_node = pool.get('1')
+        loaded_node.split_keys.append('c')
+
+        loaded_node = pool.get('1')
+        self.assertEqual((['b'], ['2', '3']), (loaded_node.split_keys, loaded_node.children))
+
+    def test_tree_with_buffer_pool(self):
+        tree = BPlusTree(order=8, buffer_pool_frames=16, pinned_levels=2)
+        tree.start_tracking_handler()
+        biggest_int = 5_000
+        existing_ints = set()
+        for _ in range(3):
+            for _ in range(600):
+                i = random.randint(0, biggest_int)
+                existing_ints.add(i)
+                tree.insert_to_tree(create_string_from_int_biggest_number(i, biggest_int))
+            for i in random.sample(sorted(existing_ints), 200):
+                existing_ints.remove(i)
+                tree.delete_from_tree(create_string_from_int_biggest_number(i, biggest_int))
+
+        # Root and its children stay resident
+        root_node = load_node(tree.root_node_id, is_leaf=False)
+        self.assertTrue(tree.buffer_pool.is_pinned(root_node.node_id))
+        self.assertTrue(all(tree.buffer_pool.is_pinned(child_id) for child_id in root_node.children if child_id in tree.buffer_pool.pinned_frames))
+        self.assertFalse(any(tree.buffer_pool.is_pinned(node_id) for node_id in tree.buffer_pool.frames))
+
+        totals = tree.tracking_handler.total_benchmarks
+        self.assertGreater(totals[TrackingModeEnum.NODE_CACHE_HIT].io_calls[TrackingModeEnum.NODE_CACHE_HIT], 0)
+
+        expected = [create_string_from_int_biggest_number(i, biggest_int) for i in sorted(existing_ints)]
+        self.assertEqual(expected, get_all_leaf_elements(tree))
+
+        # After flushing, the nodes on disk are the same as the ones in the pool
+        tree.flush_buffer_pool()
+        for node_id, (node, is_dirty) in tree.buffer_pool.all_frames():
+            self.assertFalse(is_dirty)
+            self.assertEqual(node.__dict__, load_node_from_ext_memory(node_id, node.is_leaf()).__dict__)
+
+    def test_invalid_buffer_pool_parameters(self):
+        with self.assertRaises(ValueError):
+            BPlusTree(order=8, buffer_pool_frames=-1)
+        with self.assertRaises(ValueError):
+            BPlusTree(order=8, pinned_levels=-1)
@@ -0,0 +1,90 @@
+import random
+import unittest
+from bplus_tree.new_bplus_tree import *
+from current_implementation.create_comparable_string import create_string_from_int_biggest_number
+from get_all_leaf_elements import get_all_leaf_elements
+
+
+class TestBulkLoad(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+
+    def test_bulk_load_nothing(self):
+        tree = BPlusTree(8)
+        tree.bulk_load([])
+
+        self.assertEqual(NodeType.LEAF, tree.root_node_type)
+        self.assertEqual([], get_all_leaf_elements(tree))
+
+    def test_bulk_load_into_single_leaf(self):
+        tree = BPlusTree(8)
+        elements = ['a', 'b', 'b', 'c']
+        tree.bulk_load(elements)
+
+        self.assertEqual(NodeType.LEAF, tree.root_node_type)
+        self.assertEqual(['a', 'b', 'c'], get_all_leaf_elements(tree))
+
+    def test_bulk_load_full_leaves(self):
+        tree = BPlusTree(8)
+        biggest_int = 640
+        elements = [create_string_from_int_biggest_number(i, biggest_int) for i in range(biggest_int)]
+        tree.bulk_load(elements)
+
+        self.assertEqual(elements, get_all_leaf_elements(tree))
+        self.assert_node_sizes(tree, load_node(tree.root_node_id, is_leaf=False))
+        leaf_sizes = self.collect_leaf_sizes(load_node(tree.root_node_id, is_leaf=False))
+        self.assertEqual([8] * 80, leaf_sizes)
+
+    def test_bulk_load_with_fill_factor_and_keep_using_tree(self):
+        tree = BPlusTree(9)
+        biggest_int = 2000
+        elements = [create_string_from_int_biggest_number(i, biggest_int) for i in range(0, biggest_int, 2)]
+        tree.bulk_load(elements, fill_factor=0.7)
+
+        self.assertEqual(elements, get_all_leaf_elements(tree))
+        root_node = load_node(tree.root_node_id, is_leaf=False)
+        self.assert_node_sizes(tree, root_node)
+        self.assertTrue(all(size <= 7 for size in self.collect_leaf_sizes(root_node)))
+
+        existing_elements = set(elements)
+        for i in random.sample(range(biggest_int), 500):
+            element = create_string_from_int_biggest_number(i, biggest_int)
+            if element in existing_elements:
+                tree.delete_from_tree(element)
+                existing_elements.remove(element)
+            else:
+                tree.insert_to_tree(element)
+                existing_elements.add(element)
+
+        self.assertEqual(sorted(existing_elements), get_all_leaf_elements(tree))
+
+    def test_bulk_load_rejects_unsorted_input_and_bad_fill_factor(self):
+        tree = BPlusTree(8)
+        with self.assertRaises(ValueError):
+            tree.bulk_load(['a'], fill_factor=0)
+        with self.assertRaises(ValueError):
+            tree.bulk_load(['b', 'a'])
+
+    def assert_node_sizes(self, tree, node, is_root=True):
+        if node.is_leaf():
+            if not is_root:
+                self.assertGreaterEqual(len(node.children), tree.min_leaf_size)
+            self.assertLessEqual(len(node.children), tree.max_leaf_size)
+            return
+
+        self.assertGreaterEqual(len(node.children), 2 if is_root else tree.a)
+        self.assertLessEqual(len(node.children), tree.b)
+        self.assertEqual(len(node.split_keys) + 1, len(node.children))
+        for child_id in node.children:
+            child_node = load_node(child_id, is_leaf=node.is_leaf_node())
+            self.assertEqual(node.node_id, child_node.parent_id)
+            self.assert_node_sizes(tree, child_node, is_root=False)
+
+    def collect_leaf_sizes(self, node):
+        if node.is_leaf():
+            return [len(node.children)]
+        sizes = []
+        for child_id in node.children:
+            sizes.extend(self.collect_leaf_sizes(load_node(child_id, is_leaf=node.is_leaf_node())))
+        return sizes
@@ -0,0 +1,42 @@
+import random
+import unittest
+from bplus_tree.new_bplus_tree import *
+from get_all_leaf_elements import get_all_leaf_elements
+
+
+class TestKeyType(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+
+    def tearDown(self):
+        # Nodes created without a tree in other tests must not pick up these key types
+        BPlusTree.tree_instance = None
+
+    def test_integer_keys(self):
+        tree = BPlusTree(order=8, key_type=int)
+        ints = [random.randint(-10_000, 10_000) for _ in range(2_000)]
+        to_delete = set(random.sample(ints, 500))
+        for i in ints:
+            tree.insert_to_tree(i)
+        for i in to_delete:
+            tree.delete_from_tree(i)
+
+        # Compared as integers, not as strings
+        self.assertEqual(sorted(set(ints) - to_delete), get_all_leaf_elements(tree))
+
+    def test_bytes_keys_with_separators(self):
+        tree = BPlusTree(order=4, key_type='bytes')
+        keys = [bytes([i, ord(';'), ord('\n')]) for i in range(200)]
+        random.shuffle(keys)
+        for key in keys:
+            tree.insert_to_tree(key)
+
+        self.assertEqual(sorted(keys), get_all_leaf_elements(tree))
+
+    def test_bulk_load_rejects_wrong_keys(self):
+        tree = BPlusTree(order=8, key_type=int)
+        with self.assertRaises(ValueError):
+            tree.bulk_load(['1', '2'])
+        with self.assertRaises(ValueError):
+            tree.insert_to_tree('1')
@@ -0,0 +1,561 @@
+""" Where buffer blocks, sorted runs, leaf blocks and node records end up on disk. All of them are passed around as (already encoded) bytes.
+The directory storage keeps one directory per node and one file per block, the page file storage keeps everything in a single file of fixed-size pages."""
+import io
+import mmap
+import os
+import shutil
+import struct
+import threading
+from pathlib import Path
+from current_implementation.constants_and_helpers import *
+
+# Next page id of the chain (0 for the last page), amount of used bytes in the page
+PAGE_HEADER = struct.Struct('<II')
+DEFAULT_PAGE_SIZE = 4096
+# The page file grows by at least this many pages at once
+PREALLOCATED_PAGES = 1024
+# Paths (relative to the resource directory) created after a checkpoint, one per line, in the undo directory of the directory storage
+CREATED_PATHS_FILE_NAME = 'created_paths'
+DIRECTORY_FLAGS = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0)
+# Id of a page in the undo file of the page file storage, followed by the whole page as it was at the checkpoint
+UNDO_PAGE_ID = struct.Struct('<I')
+UNDO_PAGES_FILE_NAME = 'pages'
+
+
+def fsync_path(path, flags):
+    try:
+        fd = os.open(path, flags)
+    except FileNotFoundError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class DirectoryStorage:
+    """ One directory per node (holding the node record, buffer blocks and sorted runs) and one file per leaf block.
+        The files and directories changed since the last sync are remembered, so a checkpoint only syncs those.
+        After a checkpoint, the first change of one of its files moves the file aside to the undo directory of the checkpoint (appending copies it),
+        files created afterwards are noted there. Reopening the storage at the checkpoint restores its files and removes the newer ones.
+        This relies on the file system persisting the renames and the notes in the order they were made, as journaling file systems do."""
+    name = 'directory'
+
+    def __init__(self, root_dir=RESOURCES_DIR, undo_dir=None, checkpoint_number=None):
+        """ Without a checkpoint number, nothing is kept for a rollback until keep_checkpoint is called.
+            Otherwise, the files are rolled back to the checkpoint first (undo_dir holds what is needed for that)."""
+        self.root_dir = root_dir
+        self.undo_dir = undo_dir
+        # Written files by their directory, so the files of a deleted node are dropped at once. Deleted files are dropped as well
+        self.written_files = {}
+        self.changed_dirs = set()
+        # Paths changed since the checkpoint, only their first change has to keep the version of the checkpoint
+        self.checkpoint_undo_dir = None
+        self.changed_since_checkpoint = set()
+        self.created_paths_file = None
+        self.checkpoint_lock = threading.Lock()
+        if checkpoint_number is not None:
+            self.roll_back_to_checkpoint(checkpoint_number)
+            self.keep_checkpoint(checkpoint_number)
+
+    def keep_checkpoint(self, checkpoint_number):
+        # Called once the checkpoint is complete, the undo directory of the previous one isn't needed anymore
+        self.close()
+        shutil.rmtree(self.undo_dir, ignore_errors=True)
+        self.checkpoint_undo_dir = os.path.join(self.undo_dir, str(checkpoint_number))
+        Path(self.checkpoint_undo_dir).mkdir(parents=True)
+        fsync_path(self.undo_dir, DIRECTORY_FLAGS)
+        self.changed_since_checkpoint = set()
+        self.created_paths_file = open(os.path.join(self.checkpoint_undo_dir, CREATED_PATHS_FILE_NAME), 'w')
+
+    def roll_back_to_checkpoint(self, checkpoint_number):
+        checkpoint_undo_dir = os.path.join(self.undo_dir, str(checkpoint_number))
+        if not os.path.isdir(checkpoint_undo_dir):
+            # Nothing changed since the checkpoint
+            return
+        created_paths_file_path = os.path.join(checkpoint_undo_dir, CREATED_PATHS_FILE_NAME)
+        if os.path.exists(created_paths_file_path):
+            with open(created_paths_file_path) as f:
+                created_paths = f.read().splitlines()
+            for relative_path in reversed(created_paths):
+                path = os.path.join(self.root_dir, relative_path)
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                elif os.path.exists(path):
+                    os.remove(path)
+                self.changed_dirs.add(os.path.dirname(path))
+            os.remove(created_paths_file_path)
+
+        # Files of the checkpoint, their directories might have been deleted in the meantime
+        for dir_path, _, file_names in os.walk(checkpoint_undo_dir):
+            for file_name in file_names:
+                undo_path = os.path.join(dir_path, file_name)
+                path = os.path.join(self.root_dir, os.path.relpath(undo_path, checkpoint_undo_dir))
+                Path(os.path.dirname(path)).mkdir(parents=True, exist_ok=True)
+                os.replace(undo_path, path)
+                self.changed_dirs.add(os.path.dirname(path))
+                self.changed_dirs.add(os.path.dirname(os.path.dirname(path)))
+        # The restored files have to be in place, before the undo directory is gone
+        self.sync()
+
+    def keep_checkpoint_version(self, path, copy):
+        # Called before a file is changed or removed. Returns whether the file of the checkpoint has been moved aside, i.e. it is removed already
+        path = os.fspath(path)
+        if self.checkpoint_undo_dir is None or path in self.changed_since_checkpoint:
+            return False
+        with self.checkpoint_lock:
+            if path in self.changed_since_checkpoint:
+                return False
+            self.changed_since_checkpoint.add(path)
+            relative_path = os.path.relpath(path, self.root_dir)
+            if not os.path.exists(path):
+                self.note_created_path(relative_path)
+                return False
+
+            undo_path = os.path.join(self.checkpoint_undo_dir, relative_path)
+            Path(os.path.dirname(undo_path)).mkdir(parents=True, exist_ok=True)
+            if copy:
+                shutil.copyfile(path, undo_path)
+                return False
+            os.replace(path, undo_path)
+            return True
+
+    def note_created_path(self, relative_path):
+        # Written before the path is created
+        self.created_paths_file.write(relative_path + '\n')
+        self.created_paths_file.flush()
+
+    def write_file(self, file_path, data: bytes, mode):
+        self.keep_checkpoint_version(file_path, copy=mode == 'ab')
+        with open(file_path, mode) as f:
+            f.write(data)
+        self.track_written_file(file_path)
+
+    def remove_file(self, file_path):
+        if not self.keep_checkpoint_version(file_path, copy=False):
+            delete_filepath(file_path)
+        self.track_removed_file(file_path)
+
+    def track_written_file(self, file_path):
+        # Leaf emptying workers write in parallel, single dict and set operations are atomic
+        dir_path, file_name = os.path.split(file_path)
+        self.written_files.setdefault(dir_path, set()).add(file_name)
+        self.changed_dirs.add(dir_path)
+
+    def track_removed_file(self, file_path):
+        dir_path, file_name = os.path.split(file_path)
+        self.written_files.get(dir_path, set()).discard(file_name)
+        self.changed_dirs.add(dir_path)
+
+    def track_node_dir(self, node_id, removed):
+        # The entry of the node directory in the nodes directory changed
+        node_dir_path = os.fspath(get_node_dir_path_from_id(node_id))
+        if removed:
+            self.written_files.pop(node_dir_path, None)
+            self.changed_dirs.discard(node_dir_path)
+        self.changed_dirs.add(os.path.dirname(node_dir_path))
+
+    def close(self):
+        if self.created_paths_file is not None:
+            self.created_paths_file.close()
+            self.created_paths_file = None
+
+    @staticmethod
+    def get_state():
+        # All ids come from the counters of the tree resources
+        return None
+
+    def sync(self):
+        # Syncs the tracked files, then the directories holding their (new or removed) entries. Files and directories deleted in the meantime are skipped
+        written_files, self.written_files = self.written_files, {}
+        changed_dirs, self.changed_dirs = self.changed_dirs, set()
+        for dir_path, file_names in written_files.items():
+            for file_name in file_names:
+                fsync_path(os.path.join(dir_path, file_name), os.O_RDONLY)
+        for dir_path in changed_dirs:
+            fsync_path(dir_path, DIRECTORY_FLAGS)
+
+    def new_node_id(self):
+        node_id = get_new_node_id()
+        self.keep_checkpoint_version(get_node_dir_path_from_id(node_id), copy=False)
+        generate_node_dir_for_id(node_id)
+        self.track_node_dir(node_id, removed=False)
+        return node_id
+
+    def write_node_record(self, node_id, data: bytes):
+        self.write_file(node_information_file_path_from_id(node_id), data, 'wb')
+
+    @staticmethod
+    def read_node_record(node_id) -> bytes:
+        with open(node_information_file_path_from_id(node_id), 'rb') as f:
+            return f.read()
+
+    def delete_node(self, node_id):
+        if self.checkpoint_undo_dir is None:
+            delete_node_from_ext_memory(node_id)
+        else:
+            # Files of the checkpoint are moved aside one by one, their directory is created again when they are restored
+            node_dir_path = get_node_dir_path_from_id(node_id)
+            for file_name in os.listdir(node_dir_path):
+                self.remove_file(os.path.join(node_dir_path, file_name))
+            os.rmdir(node_dir_path)
+        self.track_node_dir(node_id, removed=True)
+
+    @staticmethod
+    def new_buffer_block_id(node_id, amount_previous_blocks):
+        return generate_new_buffer_block_id(amount_previous_blocks)
+
+    def write_buffer_block(self, node_id, buffer_block_id, data: bytes):
+        self.write_file(get_buffer_file_path_from_ids(node_id, buffer_block_id), data, 'wb')
+
+    def append_to_buffer_block(self, node_id, buffer_block_id, data: bytes):
+        self.write_file(get_buffer_file_path_from_ids(node_id, buffer_block_id), data, 'ab')
+
+    @staticmethod
+    def read_buffer_block(node_id, buffer_block_id) -> bytes:
+        with open(get_buffer_file_path_from_ids(node_id, buffer_block_id), 'rb') as f:
+            return f.read()
+
+    def delete_buffer_block(self, node_id, buffer_block_id):
+        self.remove_file(get_buffer_file_path_from_ids(node_id, buffer_block_id))
+
+    @staticmethod
+    def release_unwritten_buffer_block(node_id, buffer_block_id):
+        # No file is created before the block is written
+        pass
+
+    @staticmethod
+    def new_leaf_id():
+        return generate_new_leaf_id()
+
+    def write_leaf_block(self, leaf_id, data: bytes):
+        self.write_file(get_leaf_file_path_from_id(leaf_id), data, 'wb')
+
+    @staticmethod
+    def read_leaf_block(leaf_id) -> bytes:
+        with open(get_leaf_file_path_from_id(leaf_id), 'rb') as f:
+            return f.read()
+
+    def delete_leaf_block(self, leaf_id):
+        self.remove_file(get_leaf_file_path_from_id(leaf_id))
+
+    @staticmethod
+    def new_sorted_id(node_id):
+        return get_new_sorted_id()
+
+    def append_to_sorted_run(self, node_id, sorted_id, data: bytes):
+        self.write_file(get_sorted_file_path_from_ids(node_id, sorted_id), data, 'ab')
+
+    @staticmethod
+    def sorted_run_reference(node_id, sorted_id):
+        # A sorted run is referenced by its file path
+        return get_sorted_file_path_from_ids(node_id, sorted_id)
+
+    @staticmethod
+    def open_sorted_run(reference):
+        return open(reference, 'rb')
+
+    def delete_sorted_run(self, reference):
+        self.remove_file(reference)
+
+
+class PageFileStorage:
+    """ Single, preallocated file of fixed-size pages. Every block, sorted run and node record is a chain of pages and is identified by the id of its first page.
+        Pages of deleted chains are put on a free list and reused before the file is grown. Page 0 is never handed out, so it can mark the end of a chain.
+        Pages are read through a memory mapping of the file. Reading a single-page chain returns a memoryview on the mapping instead of a copy,
+        it's only valid until the page gets written again, so it has to be decoded right away.
+        After a checkpoint, pages in use at the checkpoint are copied to the undo file of the checkpoint before they are overwritten the first time.
+        Reopening the storage at the checkpoint writes these pages back. Like the page file, the undo file is only synced by sync, right before the page file."""
+    name = 'paged'
+
+    def __init__(self, page_size=DEFAULT_PAGE_SIZE, file_path=PAGE_FILE_PATH, state=None, undo_dir=None, checkpoint_number=None):
+        """ Without a state, a new page file is created. Otherwise, the existing page file is reopened with the state returned by get_state
+            at the checkpoint with the given number, the pages changed since are rolled back (undo_dir holds their checkpoint versions)."""
+        if page_size <= PAGE_HEADER.size:
+            raise ValueError(f"Page size must be bigger than the page header of {PAGE_HEADER.size} bytes, but is {page_size}")
+
+        self.page_size = page_size
+        self.payload_size = page_size - PAGE_HEADER.size
+
+        Path(os.path.dirname(file_path)).mkdir(parents=True, exist_ok=True)
+        self.file = open(file_path, 'w+b' if state is None else 'r+b', buffering=0)
+        self.amount_pages = 1
+        self.next_unused_page_id = 1
+        self.free_page_ids = []
+        # Read-only mapping of the whole file, remapped whenever the file grows
+        self.mapping = None
+        self.view = None
+        # Last page of chains that have been appended to, so appending doesn't have to walk the whole chain
+        self.chain_tails = {}
+        self.undo_dir = undo_dir
+        self.undo_file = None
+        # Pages at or after this one were unused at the checkpoint, as well as the free pages. Pages whose checkpoint version is in the undo file are added
+        self.first_page_unused_at_checkpoint = 0
+        self.kept_page_ids = set()
+        if state is not None:
+            self.next_unused_page_id = state['next_unused_page_id']
+            self.free_page_ids = state['free_page_ids']
+            self.chain_tails = state['chain_tails']
+            if state['amount_pages'] > 1:
+                # The pages are in the file already, the mapping is the only thing to set up
+                self.grow_file(state['amount_pages'] - 1)
+        if checkpoint_number is not None:
+            self.roll_back_to_checkpoint(checkpoint_number)
+            self.keep_checkpoint(checkpoint_number)
+
+    def get_state(self):
+        return {'amount_pages': self.amount_pages, 'next_unused_page_id': self.next_unused_page_id, 'free_page_ids': self.free_page_ids,
+                'chain_tails': self.chain_tails}
+
+    def sync(self):
+        # The checkpoint versions of the pages have to be on disk before their new versions. The page file is unbuffered, so everything written is with the OS already
+        if self.undo_file is not None:
+            self.undo_file.flush()
+            os.fsync(self.undo_file.fileno())
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        # Views handed out might still be alive, so the mapping is only dropped and gets closed once the last view is gone
+        self.view = None
+        self.mapping = None
+        self.file.close()
+        if self.undo_file is not None:
+            self.undo_file.close()
+
+    def keep_checkpoint(self, checkpoint_number):
+        # Called once the checkpoint is complete, the undo file of the previous one isn't needed anymore
+        if self.undo_file is not None:
+            self.undo_file.close()
+        shutil.rmtree(self.undo_dir, ignore_errors=True)
+        checkpoint_undo_dir = os.path.join(self.undo_dir, str(checkpoint_number))
+        Path(checkpoint_undo_dir).mkdir(parents=True)
+        self.undo_file = open(os.path.join(checkpoint_undo_dir, UNDO_PAGES_FILE_NAME), 'wb')
+        fsync_path(self.undo_dir, DIRECTORY_FLAGS)
+        self.first_page_unused_at_checkpoint = self.next_unused_page_id
+        self.kept_page_ids = set(self.free_page_ids)
+
+    def roll_back_to_checkpoint(self, checkpoint_number):
+        undo_file_path = os.path.join(self.undo_dir, str(checkpoint_number), UNDO_PAGES_FILE_NAME)
+        if not os.path.exists(undo_file_path):
+            return
+        with open(undo_file_path, 'rb') as f:
+            undo_pages = f.read()
+        record_size = UNDO_PAGE_ID.size + self.page_size
+        # An incomplete last record belongs to a page that hasn't been overwritten yet
+        for offset in range(0, len(undo_pages) - record_size + 1, record_size):
+            page_id, = UNDO_PAGE_ID.unpack_from(undo_pages, offset)
+            self.file.seek(page_id * self.page_size)
+            self.file.write(undo_pages[offset + UNDO_PAGE_ID.size:offset + record_size])
+        self.sync()
+
+    def keep_checkpoint_version_of_pages(self, page_ids):
+        # Called before the pages are written. Appends the ones still holding the version of the checkpoint to the undo file, it is synced by sync
+        if self.undo_file is None:
+            return
+        page_ids = [page_id for page_id in page_ids if page_id < self.first_page_unused_at_checkpoint and page_id not in self.kept_page_ids]
+        for page_id in page_ids:
+            offset = page_id * self.page_size
+            self.undo_file.write(UNDO_PAGE_ID.pack(page_id) + self.view[offset:offset + self.page_size])
+            self.kept_page_ids.add(page_id)
+
+    def new_node_id(self):
+        return self.new_chain()
+
+    def write_node_record(self, node_id, data: bytes):
+        self.write_chain(node_id, data)
+
+    def read_node_record(self, node_id) -> bytes:
+        return self.read_chain(node_id)
+
+    def delete_node(self, node_id):
+        # Buffer of a node is always empty when the node gets deleted, so only its record has to be freed
+        self.free_chain(node_id)
+
+    def new_buffer_block_id(self, node_id, amount_previous_blocks):
+        return self.new_chain()
+
+    def write_buffer_block(self, node_id, buffer_block_id, data: bytes):
+        self.write_chain(buffer_block_id, data)
+
+    def append_to_buffer_block(self, node_id, buffer_block_id, data: bytes):
+        self.append_to_chain(buffer_block_id, data)
+
+    def read_buffer_block(self, node_id, buffer_block_id) -> bytes:
+        return self.read_chain(buffer_block_id)
+
+    def delete_buffer_block(self, node_id, buffer_block_id):
+        self.free_chain(buffer_block_id)
+
+    def release_unwritten_buffer_block(self, node_id, buffer_block_id):
+        # The first page has been allocated along with the id
+        self.free_chain(buffer_block_id)
+
+    def new_leaf_id(self):
+        return self.new_chain()
+
+    def write_leaf_block(self, leaf_id, data: bytes):
+        self.write_chain(leaf_id, data)
+
+    def read_leaf_block(self, leaf_id) -> bytes:
+        return self.read_chain(leaf_id)
+
+    def delete_leaf_block(self, leaf_id):
+        self.free_chain(leaf_id)
+
+    def new_sorted_id(self, node_id):
+        return self.new_chain()
+
+    def append_to_sorted_run(self, node_id, sorted_id, data: bytes):
+        self.append_to_chain(sorted_id, data)
+
+    @staticmethod
+    def sorted_run_reference(node_id, sorted_id):
+        return sorted_id
+
+    def open_sorted_run(self, reference):
+        return io.BufferedReader(PageChainReader(self, reference), buffer_size=self.payload_size)
+
+    def delete_sorted_run(self, reference):
+        self.free_chain(reference)
+
+    def new_chain(self):
+        page_id = self.allocate_page()
+        self.write_page(page_id, 0, b'')
+        return str(page_id)
+
+    def write_chain(self, chain_id, data: bytes):
+        # Overwrites the chain, reusing its pages. The first page (and therefore the id) stays the same
+        old_page_ids = self.page_ids_of_chain(chain_id)
+        chunks = [data[start:start + self.payload_size] for start in range(0, len(data), self.payload_size)] or [b'']
+        page_ids = old_page_ids[:len(chunks)]
+        while len(page_ids) < len(chunks):
+            page_ids.append(self.allocate_page())
+        self.free_page_ids.extend(old_page_ids[len(chunks):])
+        self.keep_checkpoint_version_of_pages(page_ids)
+
+        for index, chunk in enumerate(chunks):
+            next_page_id = page_ids[index + 1] if index + 1 < len(page_ids) else 0
+            self.write_page(page_ids[index], next_page_id, chunk)
+        self.chain_tails.pop(chain_id, None)
+
+    def append_to_chain(self, chain_id, data: bytes):
+        tail_page_id = self.chain_tails.get(chain_id)
+        if tail_page_id is None:
+            tail_page_id = self.page_ids_of_chain(chain_id)[-1]
+
+        _, used = self.read_page_header(tail_page_id)
+        fitting = min(len(data), self.payload_size - used)
+        chunks = [data[start:start + self.payload_size] for start in range(fitting, len(data), self.payload_size)]
+        new_page_ids = [self.allocate_page() for _ in chunks]
+        self.keep_checkpoint_version_of_pages([tail_page_id] + new_page_ids)
+
+        # Fill up the tail first, the rest goes to new pages linked from the tail
+        self.file.seek(tail_page_id * self.page_size)
+        self.file.write(PAGE_HEADER.pack(new_page_ids[0] if new_page_ids else 0, used + fitting))
+        if fitting:
+            self.file.seek(tail_page_id * self.page_size + PAGE_HEADER.size + used)
+            self.file.write(data[:fitting])
+
+        for index, chunk in enumerate(chunks):
+            next_page_id = new_page_ids[index + 1] if index + 1 < len(new_page_ids) else 0
+            self.write_page(new_page_ids[index], next_page_id, chunk)
+
+        self.chain_tails[chain_id] = new_page_ids[-1] if new_page_ids else tail_page_id
+
+    def read_chain(self, chain_id):
+        next_page_id, payload = self.read_page(int(chain_id))
+        if not next_page_id:
+            # Most blocks and node records fit into a single page, no need to copy those
+            return payload
+
+        parts = [payload]
+        while next_page_id:
+            next_page_id, payload = self.read_page(next_page_id)
+            parts.append(payload)
+        return b''.join(parts)
+
+    def free_chain(self, chain_id):
+        self.free_page_ids.extend(self.page_ids_of_chain(chain_id))
+        self.chain_tails.pop(chain_id, None)
+
+    def page_ids_of_chain(self, chain_id):
+        page_ids = []
+        page_id = int(chain_id)
+        while page_id:
+            page_ids.append(page_id)
+            page_id, _ = self.read_page_header(page_id)
+        return page_ids
+
+    def allocate_page(self):
+        if self.free_page_ids:
+            return self.free_page_ids.pop()
+
+        if self.next_unused_page_id == self.amount_pages:
+            self.grow_file(max(self.amount_pages, PREALLOCATED_PAGES))
+        page_id = self.next_unused_page_id
+        self.next_unused_page_id += 1
+        return page_id
+
+    def grow_file(self, additional_pages):
+        new_amount_pages = self.amount_pages + additional_pages
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(self.file.fileno(), self.amount_pages * self.page_size, additional_pages * self.page_size)
+        else:
+            self.file.truncate(new_amount_pages * self.page_size)
+        self.amount_pages = new_amount_pages
+
+        self.mapping = mmap.mmap(self.file.fileno(), self.amount_pages * self.page_size, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mapping)
+
+    def write_page(self, page_id, next_page_id, payload: bytes):
+        self.keep_checkpoint_version_of_pages([page_id])
+        self.file.seek(page_id * self.page_size)
+        self.file.write(PAGE_HEADER.pack(next_page_id, len(payload)) + payload)
+
+    def read_page(self, page_id):
+        # Returns the id of the next page and a view on the used part of the payload
+        offset = page_id * self.page_size
+        next_page_id, used = PAGE_HEADER.unpack_from(self.view, offset)
+        payload_start = offset + PAGE_HEADER.size
+        return next_page_id, self.view[payload_start:payload_start + used]
+
+    def read_page_header(self, page_id):
+        return PAGE_HEADER.unpack_from(self.view, page_id * self.page_size)
+
+
+class PageChainReader(io.RawIOBase):
+    """ Sequential, file-like access to a chain of pages. Used to stream sorted runs."""
+    def __init__(self, storage: PageFileStorage, chain_id):
+        self.storage = storage
+        self.next_page_id = int(chain_id)
+        self.payload = b''
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self.position == len(self.payload):
+            if not self.next_page_id:
+                return 0
+            self.next_page_id, self.payload = self.storage.read_page(self.next_page_id)
+            self.position = 0
+
+        amount = min(len(buffer), len(self.payload) - self.position)
+        buffer[:amount] = self.payload[self.position:self.position + amount]
+        self.position += amount
+        return amount
+
+
+BLOCK_STORAGES = {storage.name: storage for storage in (DirectoryStorage, PageFileStorage)}
+
+
+def create_block_storage(name, page_size=DEFAULT_PAGE_SIZE, resources=None, state=None, checkpoint_number=None):
+    """ Storage in the directory of the resources. With a checkpoint number, the storage is reopened and rolled back to that checkpoint."""
+    if name not in BLOCK_STORAGES:
+        raise ValueError(f"Unknown block storage {name}, available are {list(BLOCK_STORAGES)}")
+    resources = resources or TreeResources()
+    if name == PageFileStorage.name:
+        return PageFileStorage(page_size=page_size, file_path=resources.page_file_path, state=state, undo_dir=resources.undo_dir,
+                               checkpoint_number=checkpoint_number)
+    return DirectoryStorage(root_dir=resources.root_dir, undo_dir=resources.undo_dir, checkpoint_number=checkpoint_number)
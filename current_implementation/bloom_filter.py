@@ -0,0 +1,53 @@
+""" Bloom filters over the keys of leaf nodes. A key that isn't in the filter is certainly not present in the leaf node,
+a key in the filter might be present (with a false positive rate depending on the bits per key).
+The bit positions of a key come from the two halves of a 64 bit blake2b digest of the key's bytes (double hashing), so they are the same in every process."""
+import hashlib
+import math
+import struct
+
+# Two 32 bit hashes per key
+KEY_HASHES = struct.Struct('<II')
+# Serialized filter: amount of bits, amount of hashes, then the bits
+FILTER_HEADER = struct.Struct('<IB')
+
+
+class BloomFilter:
+
+    def __init__(self, amount_bits, amount_hashes, bits=None):
+        self.amount_bits = amount_bits
+        self.amount_hashes = amount_hashes
+        self.bits = bytearray((amount_bits + 7) // 8) if bits is None else bits
+
+    @classmethod
+    def for_capacity(cls, capacity, bits_per_key):
+        # Optimal amount of hashes for the bits per key is ln(2) * bits_per_key
+        return cls(max(8, capacity * bits_per_key), max(1, round(math.log(2) * bits_per_key)))
+
+    def copy(self):
+        return BloomFilter(self.amount_bits, self.amount_hashes, bytearray(self.bits))
+
+    def bit_positions(self, key_bytes):
+        first_hash, second_hash = KEY_HASHES.unpack(hashlib.blake2b(key_bytes, digest_size=KEY_HASHES.size).digest())
+        return [(first_hash + i * second_hash) % self.amount_bits for i in range(self.amount_hashes)]
+
+    def add(self, key_bytes):
+        for position in self.bit_positions(key_bytes):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def might_contain(self, key_bytes):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.bit_positions(key_bytes))
+
+    def union(self, other):
+        # Afterwards contains the keys of both filters, which must have the same size
+        if (other.amount_bits, other.amount_hashes) != (self.amount_bits, self.amount_hashes):
+            raise ValueError(f"Can't unite Bloom filters of {self.amount_bits} and {other.amount_bits} bits with {self.amount_hashes} and {other.amount_hashes} hashes")
+        united = int.from_bytes(self.bits, 'little') | int.from_bytes(other.bits, 'little')
+        self.bits = bytearray(united.to_bytes(len(self.bits), 'little'))
+
+    def to_bytes(self) -> bytes:
+        return FILTER_HEADER.pack(self.amount_bits, self.amount_hashes) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        amount_bits, amount_hashes = FILTER_HEADER.unpack_from(data)
+        return cls(amount_bits, amount_hashes, bytearray(data[FILTER_HEADER.size:]))
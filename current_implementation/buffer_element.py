@@ -1,20 +1,23 @@
 from collections import deque
 from enum import unique, Enum
+from itertools import islice
 from current_implementation.constants_and_helpers import get_current_timer_as_float, SEP
 import current_implementation.new_buffer_tree as bt
 
 
 class BufferElement:
-    def __init__(self, element, action, timestamp=None):
+    def __init__(self, element, action, timestamp=None, value=None):
         if timestamp is None:
             timestamp = get_current_timer_as_float()
 
         self.element = element
         self.timestamp = timestamp
         self.action = Action(action)
+        # Only insertions into key-value trees carry a value: Either the value itself (bytes) or a ValueReference into the value log
+        self.value = value
 
     def __eq__(self, other):
-        return self.element == other.element and self.action == other.action and self.timestamp == other.timestamp
+        return self.element == other.element and self.action == other.action and self.timestamp == other.timestamp and self.value == other.value
 
     def to_output_string(self):
         return f'{self.element}{SEP}{self.timestamp}{SEP}{self.action}\n'
@@ -26,9 +29,13 @@ class BufferElement:
 
 @unique
 class Action(str, Enum):
-    """ Indication to whether an element is deleted or inserted."""
+    """ Indication to whether an element is deleted, inserted or looked up."""
     INSERT = 'i'
     DELETE = 'd'
+    # Queries travel down the buffers like insertions/deletions, but never end up in a leaf
+    QUERY = 'q'
+    # Combines the carried value (a delta) into the value of the key with the tree's combine function, or inserts it if the key is not present
+    COMBINE = 'c'
 
 
 def get_buffer_elements_from_sorted_filereader_into_deque(file_reader, max_lines):
@@ -38,12 +45,7 @@ def get_buffer_elements_from_sorted_filereader_into_deque(file_reader, max_lines
 
     bt.get_tracking_handler_instance().enter_buffer_element_read_sub_mode()
 
-    lines = deque()
-    for line in file_reader:
-        lines.append(parse_line_into_buffer_element(line))
-        max_lines -= 1
-        if not max_lines:
-            break
+    lines = deque(islice(bt.get_storage_codec().iterate_buffer_elements(file_reader), max_lines))
 
     bt.get_tracking_handler_instance().exit_buffer_element_read_sub_mode(len(lines))
 
@@ -52,7 +54,20 @@ def get_buffer_elements_from_sorted_filereader_into_deque(file_reader, max_lines
     return lines
 
 
+def group_buffer_elements_into_deques(buffer_elements, max_elements):
+    # Yields the buffer elements in deques of up to max_elements buffer elements, none of them empty
+    buffer_elements = iter(buffer_elements)
+    group = deque(islice(buffer_elements, max_elements))
+    while group:
+        yield group
+        group = deque(islice(buffer_elements, max_elements))
+
+
 def parse_line_into_buffer_element(line):
     [element, action_timestamp, action] = line.split(sep=SEP)
     # The line splitting [:-1] on action gets rid of the line break
     return BufferElement(element, action[:-1], float(action_timestamp))
+
+
+def append_to_sorted_buffer_elements_file(node_id, sorted_id, elements: list):
+    bt.get_block_storage().append_to_sorted_run(node_id, sorted_id, bt.get_storage_codec().encode_buffer_elements(elements))
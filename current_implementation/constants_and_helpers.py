@@ -3,11 +3,15 @@ import current_implementation
 import time
 from pathlib import Path
 import shutil
+import threading
+from contextvars import ContextVar
 
 WORKING_DIR = os.path.dirname(current_implementation.__file__)
 RESOURCES_DIR = os.path.join(WORKING_DIR, 'resource_data')
 NODES_DIR = os.path.join(RESOURCES_DIR, 'nodes_collection')
 LEAVES_DIR = os.path.join(RESOURCES_DIR, 'leaves_collection')
+PAGE_FILE_PATH = os.path.join(RESOURCES_DIR, 'page_file')
+VALUE_LOG_PATH = os.path.join(RESOURCES_DIR, 'value_log')
 NODE_STRING = 'node_'
 NODE_INFORMATION_FILE_STRING = 'data.txt'
 BLOCK_STRING = 'block_'
@@ -21,23 +25,52 @@ FILE_EXTENSION = ''
 DUMMY_STRING = 'DUMMY'
 
 
-node_counter = 0
+class TreeResources:
+    """ Directory of all data of a tree and the counters for its ids. Each tree has its own, so several trees can coexist in one process."""
 
-sorted_counter = 0
+    def __init__(self, root_dir=RESOURCES_DIR):
+        self.root_dir = root_dir
+        self.nodes_dir = os.path.join(root_dir, 'nodes_collection')
+        self.leaves_dir = os.path.join(root_dir, 'leaves_collection')
+        self.page_file_path = os.path.join(root_dir, 'page_file')
+        self.value_log_path = os.path.join(root_dir, 'value_log')
+        self.manifest_path = os.path.join(root_dir, 'manifest.json')
+        # Versions of the files (or pages) of the last checkpoint, which have changed since
+        self.undo_dir = os.path.join(root_dir, 'checkpoint_undo')
+        self.node_counter = 0
+        self.sorted_counter = 0
+        self.leaf_counter = 0
+        # Leaf buffers might be emptied by several threads at once, which all need new sorted and leaf ids
+        self.id_counter_lock = threading.Lock()
 
-leaf_counter = 0
 
+# The tree whose method is running (set by BufferTree.activate). All node and block functions work on it and its resources
+active_tree = ContextVar('active_tree', default=None)
 
-def clean_up_and_initialize_resource_directories():
-    delete_all_tree_data()
-    Path(NODES_DIR).mkdir(parents=True, exist_ok=True)
-    Path(LEAVES_DIR).mkdir(parents=False, exist_ok=True)
+
+def get_active_tree():
+    tree = active_tree.get()
+    if tree is None:
+        raise ValueError("No tree is active, node and block functions must run in a tree method or within tree.activate()")
+    return tree
+
+
+def get_tree_resources() -> TreeResources:
+    return get_active_tree().resources
+
+
+def clean_up_and_initialize_resource_directories(root_dir=RESOURCES_DIR):
+    delete_all_tree_data(root_dir)
+    resources = TreeResources(root_dir)
+    Path(resources.nodes_dir).mkdir(parents=True, exist_ok=True)
+    Path(resources.leaves_dir).mkdir(parents=False, exist_ok=True)
 
 
 def get_new_node_id():
-    global node_counter
-    node_counter += 1
-    return str(node_counter)
+    resources = get_tree_resources()
+    with resources.id_counter_lock:
+        resources.node_counter += 1
+        return str(resources.node_counter)
 
 
 def generate_new_buffer_block_id(amount_previous_blocks):
@@ -45,15 +78,17 @@ def generate_new_buffer_block_id(amount_previous_blocks):
 
 
 def get_new_sorted_id():
-    global sorted_counter
-    sorted_counter += 1
-    return str(sorted_counter)
+    resources = get_tree_resources()
+    with resources.id_counter_lock:
+        resources.sorted_counter += 1
+        return str(resources.sorted_counter)
 
 
 def generate_new_leaf_id():
-    global leaf_counter
-    leaf_counter += 1
-    return str(leaf_counter)
+    resources = get_tree_resources()
+    with resources.id_counter_lock:
+        resources.leaf_counter += 1
+        return str(resources.leaf_counter)
 
 
 # Returns the node_id, by which the rest of file-paths can be reconstructed
@@ -71,7 +106,7 @@ def generate_node_dir_for_id(node_id):
 # Returns Node directory path
 def get_node_dir_path_from_id(node_id):
     node_dir_name = nodes_dir_name_from_id(node_id)
-    return Path(os.path.join(NODES_DIR, node_dir_name))
+    return Path(os.path.join(get_tree_resources().nodes_dir, node_dir_name))
 
 
 # Returns Node directory name
@@ -115,12 +150,12 @@ def get_sorted_file_path_from_ids(node_id, sorted_id):
 
 # Returns life file path
 def get_leaf_file_path_from_id(leaf_id):
-    return Path(os.path.join(LEAVES_DIR, leaf_file_name_from_id(leaf_id)))
+    return Path(os.path.join(get_tree_resources().leaves_dir, leaf_file_name_from_id(leaf_id)))
 
 
-def delete_all_tree_data():
-    if os.path.exists(RESOURCES_DIR):
-        shutil.rmtree(RESOURCES_DIR)
+def delete_all_tree_data(root_dir=RESOURCES_DIR):
+    if os.path.exists(root_dir):
+        shutil.rmtree(root_dir)
 
 
 def delete_several_buffer_files_with_ids(node_id, buffer_block_ids):
@@ -135,7 +170,7 @@ def delete_buffer_file_with_id(node_id, buffer_block_id):
 
 def get_file_reader_for_sorted_filepath_with_ids(node_id, sorted_id):
     sorted_filepath = get_sorted_file_path_from_ids(node_id, sorted_id)
-    return open(sorted_filepath, 'r')
+    return open(sorted_filepath, 'rb')
 
 
 def delete_sorted_files_with_ids(node_id, sorted_id):
@@ -164,13 +199,6 @@ FALSE_STRING = 'F'
 SEP = ';'
 
 
-def append_to_sorted_buffer_elements_file(node_id, sorted_id, elements: list):
-    sorted_filepath = get_sorted_file_path_from_ids(node_id, sorted_id)
-    with open(sorted_filepath, 'a') as f:
-        elements_as_str = [element.to_output_string() for element in elements]
-        f.writelines(elements_as_str)
-
-
 def delete_node_from_ext_memory(node_id):
     node_dir_path = get_node_dir_path_from_id(node_id)
     shutil.rmtree(node_dir_path)
@@ -22,6 +22,15 @@ class DoublyLinkedList:
     def is_empty(self):
         return self.num_elements == 0
 
+    def node_ids(self):
+        # In list order, from first to last
+        node_ids = []
+        current_list_element = self.first
+        while current_list_element:
+            node_ids.append(current_list_element.node_id)
+            current_list_element = current_list_element.following
+        return node_ids
+
     def append_to_custom_list(self, node_id):
         # Calling function must make sure the node_id isn't in the queue already (if it already is in there, a mistake has been made)
         if node_id in self.map:
@@ -0,0 +1,98 @@
+""" Types of the keys stored in a tree. Keys are compared natively (as str, int or bytes), the key type decides how they are checked and stored.
+Binary storage writes fixed-size keys without a length prefix, text storage (and the B+ tree's node files) uses the text representation."""
+import struct
+
+# Signed 64-bit integers, little-endian
+INT_KEY = struct.Struct('<q')
+
+
+class KeyType:
+
+    @classmethod
+    def check_key(cls, key):
+        # bool is an int as well, but never a sensible key
+        if type(key) is not cls.python_type:
+            raise ValueError(f"Tree expects keys of type {cls.name}, but got {key!r}")
+        return key
+
+
+class StrKeyType(KeyType):
+    name = 'str'
+    python_type = str
+    # Variable size, so stored with a length prefix
+    fixed_size = None
+
+    @staticmethod
+    def to_bytes(key) -> bytes:
+        return key.encode()
+
+    @staticmethod
+    def from_bytes(data):
+        return str(data, 'utf-8')
+
+    @staticmethod
+    def to_text(key) -> str:
+        return key
+
+    @staticmethod
+    def from_text(text):
+        return text
+
+
+class IntKeyType(KeyType):
+    name = 'int'
+    python_type = int
+    fixed_size = INT_KEY.size
+
+    @staticmethod
+    def to_bytes(key) -> bytes:
+        try:
+            return INT_KEY.pack(key)
+        except struct.error:
+            raise ValueError(f"Integer keys must fit into 64 bits, but got {key}")
+
+    @staticmethod
+    def from_bytes(data):
+        return INT_KEY.unpack(data)[0]
+
+    @staticmethod
+    def to_text(key) -> str:
+        return str(key)
+
+    @staticmethod
+    def from_text(text):
+        return int(text)
+
+
+class BytesKeyType(KeyType):
+    name = 'bytes'
+    python_type = bytes
+    fixed_size = None
+
+    @staticmethod
+    def to_bytes(key) -> bytes:
+        return key
+
+    @staticmethod
+    def from_bytes(data):
+        return bytes(data)
+
+    @staticmethod
+    def to_text(key) -> str:
+        return key.hex()
+
+    @staticmethod
+    def from_text(text):
+        return bytes.fromhex(text)
+
+
+KEY_TYPES = {key_type.name: key_type() for key_type in (StrKeyType, IntKeyType, BytesKeyType)}
+
+
+def get_key_type(key_type):
+    """ key_type may be given by its name ('str', 'int', 'bytes') or as the python type itself."""
+    name = getattr(key_type, '__name__', key_type)
+    if name not in KEY_TYPES:
+        raise ValueError(f"Unknown key type {key_type}, available are {list(KEY_TYPES)}")
+    return KEY_TYPES[name]
+
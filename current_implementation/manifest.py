@@ -0,0 +1,33 @@
+""" Everything needed to resume a tree from its files, written (as json) at checkpoints: the number of the checkpoint, the parameters, the root node id,
+the id counters, the emptying queues and the state of the storage, the value log and the write-ahead log.
+The manifest is replaced atomically, so after a crash it's either the old or the new one."""
+import json
+import os
+
+MANIFEST_VERSION = 1
+
+
+def write_manifest(file_path, manifest):
+    temporary_path = file_path + '.tmp'
+    with open(temporary_path, 'w') as f:
+        json.dump(dict(manifest, version=MANIFEST_VERSION), f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary_path, file_path)
+
+    # The rename is only durable once the directory is synced
+    directory = os.open(os.path.dirname(file_path), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+def read_manifest(file_path):
+    if not os.path.exists(file_path):
+        raise ValueError(f"No manifest at {file_path}, the tree has never been checkpointed")
+    with open(file_path) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"Manifest at {file_path} has version {manifest.get('version')}, but only version {MANIFEST_VERSION} is supported")
+    return manifest
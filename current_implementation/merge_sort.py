@@ -1,89 +1,135 @@
 """ Contains the functionality to do an external merge sort on an arbitrary amount of files containing BufferElement.
-Assumes that the elements within EACH file passed are sorted and no file contains the same element more than once."""
+Assumes that the elements within EACH file passed are sorted and no file contains the same element more than once,
+except for queries, which may precede the (newer) insertion/deletion of the same element, and combinations, which may precede queries."""
+import heapq
+from itertools import groupby
+from operator import attrgetter
 from current_implementation.constants_and_helpers import *
-from current_implementation.buffer_element import get_buffer_elements_from_sorted_filereader_into_deque
+from current_implementation.buffer_element import get_buffer_elements_from_sorted_filereader_into_deque, append_to_sorted_buffer_elements_file, Action, BufferElement
+import current_implementation.new_buffer_tree as bt
 
 
-def external_merge_sort_buffer_elements_many_files(node_id, sorted_ids, max_elements):
-    """ Assumes each file passed is sorted and does not contain duplicates. """
+def external_merge_sort_buffer_elements_many_files(node_id, sorted_ids, max_elements, fan_in=None):
+    """ Assumes each file passed is sorted and does not contain duplicates. Returns the reference to the merged run, with which it can be opened and deleted.
+        Merges up to fan_in files at once (default m - 1 of the tree), so usually a single pass over the buffer is enough."""
     if not sorted_ids:
         raise ValueError(f"Tried merge sort for node with node_id {node_id}, but sorted_ids is {sorted_ids}")
 
-    while len(sorted_ids) > 1:
-        new_sorted_ids = []
-        # Keep merging two files until there is only one left
-        for ind, sorted_id in enumerate(sorted_ids):
-            if ind % 2 == 0:
-                if ind + 1 < len(sorted_ids):
-                    new_sorted_id = external_merge_sort_buffer_elements_two_files(node_id, sorted_id, sorted_ids[ind + 1], max_elements)
-                    new_sorted_ids.append(new_sorted_id)
-                else:
-                    new_sorted_ids.append(sorted_id)
+    sorted_ids = merge_until_at_most_fan_in_files_are_left(node_id, sorted_ids, max_elements, 1, fan_in)
 
-        sorted_ids = new_sorted_ids
+    return bt.get_block_storage().sorted_run_reference(node_id, sorted_ids[0])
+
+
+def iterate_merged_sorted_files(node_id, sorted_ids, max_elements, fan_in=None):
+    """ Like external_merge_sort_buffer_elements_many_files, but the last merge pass is not written: Its buffer elements are yielded instead.
+        The files are deleted once everything has been yielded."""
+    if not sorted_ids:
+        raise ValueError(f"Tried merge sort for node with node_id {node_id}, but sorted_ids is {sorted_ids}")
 
-    sorted_filepath = get_sorted_file_path_from_ids(node_id, sorted_ids[0])
+    fan_in = get_fan_in(fan_in)
+    sorted_ids = merge_until_at_most_fan_in_files_are_left(node_id, sorted_ids, max_elements, fan_in, fan_in)
+    yield from iterate_k_way_merge(node_id, sorted_ids, max(1, max_elements // (len(sorted_ids) + 1)))
 
-    return sorted_filepath
 
+def merge_until_at_most_fan_in_files_are_left(node_id, sorted_ids, max_elements, max_amount_files, fan_in):
+    fan_in = get_fan_in(fan_in)
+
+    while len(sorted_ids) > max_amount_files:
+        new_sorted_ids = []
+        for start_index in range(0, len(sorted_ids), fan_in):
+            sorted_ids_to_merge = sorted_ids[start_index:start_index + fan_in]
+            if len(sorted_ids_to_merge) == 1:
+                new_sorted_ids.append(sorted_ids_to_merge[0])
+            else:
+                new_sorted_ids.append(external_merge_sort_buffer_elements_k_files(node_id, sorted_ids_to_merge, max_elements))
+
+        sorted_ids = new_sorted_ids
+
+    return sorted_ids
 
-def external_merge_sort_buffer_elements_two_files(node_id, left_sorted_id, right_sorted_id, max_elements):
-    read_size_per_file = max_elements // 2
-    left_filepath = get_sorted_file_path_from_ids(node_id, left_sorted_id)
-    right_filepath = get_sorted_file_path_from_ids(node_id, right_sorted_id)
 
-    left_filereader = open(left_filepath, 'r')
-    right_filereader = open(right_filepath, 'r')
+def get_fan_in(fan_in):
+    if fan_in is None:
+        fan_in = bt.get_tree_instance().m - 1
+    return max(2, fan_in)
 
-    new_sorted_id = get_new_sorted_id()
 
-    left_buffer_elements = get_buffer_elements_from_sorted_filereader_into_deque(left_filereader, read_size_per_file)
-    right_buffer_elements = get_buffer_elements_from_sorted_filereader_into_deque(right_filereader, read_size_per_file)
+def external_merge_sort_buffer_elements_k_files(node_id, sorted_ids, max_elements):
+    # Internal memory is shared evenly by one read-ahead buffer per file and the output buffer
+    block_size = max(1, max_elements // (len(sorted_ids) + 1))
+    new_sorted_id = bt.get_block_storage().new_sorted_id(node_id)
 
-    # Merge until one file has been completely merged. Every time a buffer of one file runs full, get the next bulk of lines
-    while left_buffer_elements is not None and right_buffer_elements is not None:
-        output_buffer_elements = merge_sort_stop_when_one_is_empty(left_buffer_elements, right_buffer_elements)
+    output_buffer_elements = []
+    for buffer_element in iterate_k_way_merge(node_id, sorted_ids, block_size):
+        output_buffer_elements.append(buffer_element)
+        if len(output_buffer_elements) >= block_size:
+            append_to_sorted_buffer_elements_file(node_id, new_sorted_id, output_buffer_elements)
+            output_buffer_elements = []
 
+    if output_buffer_elements:
         append_to_sorted_buffer_elements_file(node_id, new_sorted_id, output_buffer_elements)
-        if not left_buffer_elements:
-            left_buffer_elements = get_buffer_elements_from_sorted_filereader_into_deque(left_filereader, read_size_per_file)
-        if not right_buffer_elements:
-            right_buffer_elements = get_buffer_elements_from_sorted_filereader_into_deque(right_filereader, read_size_per_file)
-
-    # output_buffer_elements is empty now
-    while left_buffer_elements:
-        # right_buffer_elements must be empty
-        append_to_sorted_buffer_elements_file(node_id, new_sorted_id, left_buffer_elements)
-        left_buffer_elements = get_buffer_elements_from_sorted_filereader_into_deque(left_filereader, max_elements)
-
-    while right_buffer_elements:
-        # left_buffer_elements must have been empty before the prior loop already
-        append_to_sorted_buffer_elements_file(node_id, new_sorted_id, right_buffer_elements)
-        right_buffer_elements = get_buffer_elements_from_sorted_filereader_into_deque(right_filereader, max_elements)
-
-    left_filereader.close()
-    right_filereader.close()
-    delete_sorted_files_with_ids(node_id, [left_sorted_id, right_sorted_id])
+
     return new_sorted_id
 
 
-def merge_sort_stop_when_one_is_empty(deque_one, deque_two):
+def iterate_k_way_merge(node_id, sorted_ids, block_size):
+    # Reads block_size buffer elements at once from each file. Deletes the files afterwards
+    storage = bt.get_block_storage()
+    references = [storage.sorted_run_reference(node_id, sorted_id) for sorted_id in sorted_ids]
+    file_readers = [storage.open_sorted_run(reference) for reference in references]
+
+    try:
+        runs = [iterate_sorted_filereader_in_blocks(file_reader, block_size) for file_reader in file_readers]
+        for _, same_buffer_elements in groupby(heapq.merge(*runs, key=attrgetter('element')), key=attrgetter('element')):
+            yield from resolve_buffer_elements_of_same_element(list(same_buffer_elements))
+    finally:
+        for file_reader in file_readers:
+            file_reader.close()
+
+    for reference in references:
+        storage.delete_sorted_run(reference)
+
+
+def iterate_sorted_filereader_in_blocks(file_reader, block_size):
+    buffer_elements = get_buffer_elements_from_sorted_filereader_into_deque(file_reader, block_size)
+    while buffer_elements is not None:
+        yield from buffer_elements
+        buffer_elements = get_buffer_elements_from_sorted_filereader_into_deque(file_reader, block_size)
+
+
+def resolve_buffer_elements_of_same_element(buffer_elements):
+    """ Resolves any amount of buffer elements of the same element: The newest insertion/deletion wins,
+        a query is answered by the newest insertion/deletion older than the query. Queries older than every insertion/deletion are kept, in front of it.
+        Combinations are folded into the update before them. A query newer than a combination without an older insertion/deletion can't be answered
+        (the value is still unknown), so the combinations folded so far are kept in front of it."""
+    if len(buffer_elements) == 1:
+        return buffer_elements
 
     output_buffer_elements = []
-    while deque_one and deque_two:
-        left_elem = deque_one[0]
-        right_elem = deque_two[0]
-
-        if left_elem.element < right_elem.element:
-            output_buffer_elements.append(deque_one.popleft())
-        elif left_elem.element > right_elem.element:
-            output_buffer_elements.append(deque_two.popleft())
-        else:
-            deque_one.popleft()
-            deque_two.popleft()
-            if left_elem.timestamp < right_elem.timestamp:
-                output_buffer_elements.append(right_elem)
+    newest_update = None
+    for buffer_element in sorted(buffer_elements, key=attrgetter('timestamp')):
+        if buffer_element.action == Action.QUERY:
+            if newest_update is None:
+                output_buffer_elements.append(buffer_element)
+            elif newest_update.action == Action.COMBINE:
+                output_buffer_elements.extend((newest_update, buffer_element))
+                newest_update = None
             else:
-                output_buffer_elements.append(left_elem)
+                bt.answer_query(buffer_element, is_present=newest_update.action == Action.INSERT, value=newest_update.value)
+        elif buffer_element.action == Action.COMBINE and newest_update is not None:
+            newest_update = combine_buffer_elements(newest_update, buffer_element)
+        else:
+            newest_update = buffer_element
 
+    if newest_update is not None:
+        output_buffer_elements.append(newest_update)
     return output_buffer_elements
+
+
+def combine_buffer_elements(older_update, combination):
+    # Returns the single update with the same effect as older_update followed by combination
+    if older_update.action == Action.DELETE:
+        return BufferElement(combination.element, Action.INSERT, combination.timestamp, combination.value)
+    value = bt.get_tree_instance().combine_values(older_update.value, combination.value)
+    # Combining into a combination is still a combination, combining into an insertion is an insertion
+    return BufferElement(combination.element, older_update.action, combination.timestamp, value)
@@ -1,20 +1,67 @@
+import functools
 import itertools
 import math
+from bisect import bisect_left, bisect_right
 from current_implementation.buffer_element import *
 from current_implementation.constants_and_helpers import *
 from current_implementation.double_linked_list import DoublyLinkedList
-from current_implementation.merge_sort import external_merge_sort_buffer_elements_many_files
+from current_implementation.merge_sort import external_merge_sort_buffer_elements_many_files, iterate_merged_sorted_files, resolve_buffer_elements_of_same_element
+from current_implementation.storage_codec import get_storage_codec_by_name
+from current_implementation.bloom_filter import BloomFilter
+from current_implementation.block_storage import create_block_storage, DirectoryStorage, DEFAULT_PAGE_SIZE
+from current_implementation.node_cache import NodeCache
+from current_implementation.key_type import get_key_type
+from current_implementation.value_log import ValueLog, DEFAULT_VALUE_LOG_THRESHOLD
+from current_implementation.manifest import write_manifest, read_manifest
+from current_implementation.write_ahead_log import WriteAheadLog, read_checkpoint_number, check_group_commit, DEFAULT_GROUP_COMMIT_RECORDS, DEFAULT_GROUP_COMMIT_INTERVAL
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import copy_context, ContextVar
 from benchmarking.TreeTrackingHandler import TreeTrackingHandler
 
 
-class BufferTree:
+# A merge of a leaf buffer with the leaf blocks reads ahead the leaf blocks and the buffer, while writing up to MAX_PENDING_LEAF_WRITES leaf blocks
+MAX_PENDING_LEAF_WRITES = 2
+IO_THREADS_PER_LEAF_MERGE = 2 + MAX_PENDING_LEAF_WRITES
+# Parameters that decide how the tree is stored, they can't change when a tree is opened again
+LAYOUT_PARAMETERS = ('M', 'B_buffer', 'B_leaf', 'codec', 'storage', 'page_size', 'key_type', 'with_values', 'value_log_threshold', 'write_ahead_log_path',
+                     'bloom_filter_bits_per_key')
+
+END_OF_ITERATION = object()
+# While merging leaf buffers, answers are collected here instead of being passed on, since the merge (or its read-ahead) runs on other threads.
+# They are answered on the thread that started the merge once it's done, so callbacks and query results are never used by several threads at once
+collected_query_answers = ContextVar('collected_query_answers', default=None)
+
 
-    """ Static reference to the tree. Useful for when calculating something for a node requires tree properties."""
-    tree_instance = None
+def with_activated_tree(method):
+    # For the public methods of BufferTree, so several trees can be used in one process. All node and block functions work on the active tree (see get_tree_instance)
+    @functools.wraps(method)
+    def method_with_activated_tree(self, *args, **kwargs):
+        token = active_tree.set(self)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            active_tree.reset(token)
+    return method_with_activated_tree
+
+
+class BufferTree:
 
-    def __init__(self, M, B_buffer, B_leaf=None):
-        clean_up_and_initialize_resource_directories()
+    def __init__(self, M, B_buffer, B_leaf=None, codec='text', storage='directory', page_size=DEFAULT_PAGE_SIZE, node_cache_size=0, key_type='str',
+                 with_values=False, value_log_threshold=DEFAULT_VALUE_LOG_THRESHOLD, combine=None, leaf_emptying_workers=1,
+                 prefetch_io=False, resource_dir=RESOURCES_DIR, write_ahead_log_path=None, group_commit_records=DEFAULT_GROUP_COMMIT_RECORDS,
+                 group_commit_interval=DEFAULT_GROUP_COMMIT_INTERVAL, bloom_filter_bits_per_key=0, manifest=None):
+        # Every tree keeps its data in its own resource_dir (which is cleared first) and has its own ids, so several trees can coexist in one process.
+        # Only BufferTree.open passes a manifest, the tree then resumes from the files in resource_dir instead
+        self.resources = TreeResources(resource_dir)
+        if manifest is None:
+            if write_ahead_log_path is not None and read_checkpoint_number(write_ahead_log_path) != 0:
+                raise ValueError(f"Write-ahead log {write_ahead_log_path} follows checkpoint {read_checkpoint_number(write_ahead_log_path)} of a tree, "
+                                 f"which has to be resumed with BufferTree.open")
+            clean_up_and_initialize_resource_directories(resource_dir)
+        else:
+            self.resources.node_counter, self.resources.sorted_counter, self.resources.leaf_counter = manifest['counters']
         # If no two separate amount of elements per Buffer are passed, assume the same size for both
         if B_leaf is None:
             B_leaf = B_buffer
@@ -31,10 +78,59 @@ class BufferTree:
         self.a = m // 4
         self.s = BufferTree.calculate_s(self.a, self.b)
         self.t = BufferTree.calculate_t(self.a, self.b, self.s)
-
-        root_node = TreeNode(is_internal_node=False, handles=[], children=[], buffer_block_ids=[])
-        self.root_node_id = root_node.node_id
-        self.tree_buffer = TreeBuffer(max_size=self.B_buffer)
+        # Keys are str, int (64 bit) or bytes and compared natively. The binary codec stores integer keys with a fixed size of 8 bytes
+        self.key_type = get_key_type(key_type)
+        # Layout of all blocks and node records on disk. The default text codec is human-readable for debugging, the binary codec is more compact and faster
+        self.codec = get_storage_codec_by_name(codec, self.key_type)
+        # Checked before the storage is created, since the page file storage isn't thread-safe
+        if leaf_emptying_workers < 1:
+            raise ValueError(f"At least one worker is needed for emptying leaf buffers, but got {leaf_emptying_workers}")
+        if (leaf_emptying_workers > 1 or prefetch_io) and storage != DirectoryStorage.name:
+            raise ValueError(f"Emptying leaf buffers with several workers or prefetching requires the {DirectoryStorage.name} storage, but got {storage}")
+        if combine is not None and not with_values:
+            raise ValueError("A combine function requires a tree with values")
+        check_group_commit(group_commit_records, group_commit_interval)
+        if bloom_filter_bits_per_key < 0:
+            raise ValueError(f"Bloom filters need a non-negative amount of bits per key, but got {bloom_filter_bits_per_key}")
+        # Where blocks and node records are kept: A directory per node and a file per block, or pages of a single page file
+        # Number of the last checkpoint, the files of the tree are rolled back to it when the tree is opened again
+        self.checkpoint_number = 0 if manifest is None else manifest['checkpoint_number']
+        self.storage = create_block_storage(storage, page_size, self.resources, manifest and manifest['storage_state'],
+                                            None if manifest is None else self.checkpoint_number)
+        # Each cached node takes up about one block (up to b handles and children), so at most m nodes fit into internal memory. 0 disables the cache
+        if node_cache_size > self.m:
+            raise ValueError(f"Node cache of {node_cache_size} nodes exceeds internal memory, which fits m = {self.m} blocks")
+        self.node_cache = NodeCache(node_cache_size, write_back=write_node_record_to_storage)
+        # Key-value trees store a value (bytes) for each key. Values bigger than value_log_threshold bytes go to the value log right away,
+        # so the buffers only move fixed-size references to them. Trees without values (sets) have no value log
+        self.value_log = ValueLog(value_log_threshold, self.resources.value_log_path, manifest and manifest['value_log_size']) if with_values else None
+        # combine(value, delta) -> value (bytes) for blind updates via combine_into_tree, e.g. adding counters. Must be associative,
+        # since deltas for the same key are combined with each other on their way down, before the value of the key is known
+        self.combine = combine
+        # With more than one worker, the buffers of all leaf nodes in the leaf buffer emptying queue are merged with their leaf blocks by a thread pool.
+        # Leaf nodes have disjoint buffers and leaf blocks, only splits and rebalancing afterwards touch shared nodes, so those stay serial
+        self.leaf_emptying_pool = ThreadPoolExecutor(leaf_emptying_workers) if leaf_emptying_workers > 1 else None
+        # With prefetching, merging a leaf buffer with the leaf blocks reads the next leaf block and the next sorted buffer elements in the background,
+        # while the current ones are merged. Finished leaf blocks are written in the background as well
+        self.io_pool = ThreadPoolExecutor(IO_THREADS_PER_LEAF_MERGE * leaf_emptying_workers) if prefetch_io else None
+        # Insertions, deletions and combinations are logged before they enter the tree buffer, the tree files are only synced by checkpoint().
+        # The log lives outside of resource_dir and only holds the operations after the last checkpoint, a new tree with the same log replays them (see below).
+        # Without a path nothing is logged
+        self.write_ahead_log = None
+        # With bits per key, each leaf node has a Bloom filter over the keys of its leaf blocks and the keys inserted into its buffer.
+        # Deletions of and queries for keys not in the filter don't need to go to the leaf node. 0 disables the filters
+        self.bloom_filter_bits_per_key = bloom_filter_bits_per_key
+        # Everything needed to create the same tree again, written to the manifest
+        self.parameters = dict(M=M, B_buffer=B_buffer, B_leaf=B_leaf, codec=codec, storage=storage, page_size=page_size, node_cache_size=node_cache_size,
+                               key_type=self.key_type.name, with_values=with_values, value_log_threshold=value_log_threshold,
+                               leaf_emptying_workers=leaf_emptying_workers, prefetch_io=prefetch_io, write_ahead_log_path=write_ahead_log_path,
+                               group_commit_records=group_commit_records, group_commit_interval=group_commit_interval,
+                               bloom_filter_bits_per_key=bloom_filter_bits_per_key)
+        self.root_node_id = None
+        self.tree_buffer = TreeBuffer(max_size=self.B_buffer, key_type=self.key_type)
+        # (node_id, buffer_block_id, elements) of the newest root buffer block. It's only written once a newer block is pushed to the root,
+        # since it is read and deleted right away if the root buffer is full
+        self.pending_root_buffer_block = None
         self.internal_node_buffer_emptying_queue = deque()
         # TODO Do we even need the doublyLinkedList here? Unless we want to delete something from it
         self.leaf_node_buffer_emptying_queue = DoublyLinkedList()
@@ -43,11 +139,124 @@ class BufferTree:
         self.leaf_nodes_with_dummy_children = DoublyLinkedList()
         self.node_to_steal_or_merge_queue = deque()
 
+        # Answers to queries end up in query_results, unless query_batch got a callback for them.
+        # The callbacks of pending queries are kept by (key, timestamp) of the query, which identifies it in every buffer
+        self.query_callbacks = {}
+        self.query_results = deque()
+
         # Starts as disabled, must be enabled. If disabled and calls are made to the tracking Handler, the tracking Handler won't do anything
         self.tracking_handler = TreeTrackingHandler()
 
-        BufferTree.tree_instance = self
-        write_node(root_node)
+        with self.activate():
+            if manifest is None:
+                root_node = TreeNode(is_internal_node=False, node_id=self.storage.new_node_id(), handles=[], children=[], buffer_block_ids=[],
+                                     bloom_filter=self.new_bloom_filter())
+                self.root_node_id = root_node.node_id
+                write_node(root_node)
+                # Checkpoint 0 is the empty tree, so a tree stopping before its first checkpoint is opened again by replaying its whole log
+                self.flush_node_cache()
+                self.storage.sync()
+                self.write_manifest()
+                self.storage.keep_checkpoint(self.checkpoint_number)
+            else:
+                self.restore_from_manifest(manifest)
+
+        if write_ahead_log_path is not None:
+            write_ahead_log = WriteAheadLog(write_ahead_log_path, self.key_type, group_commit_records, group_commit_interval)
+            # Recovery: The operations of the log are streamed into the new tree, without logging them again.
+            # If the tree stopped before the log was replaced at its last checkpoint, the log still follows the checkpoint before and only its end is replayed
+            if write_ahead_log.checkpoint_number == self.checkpoint_number:
+                self.apply_batch(write_ahead_log.recover())
+            elif write_ahead_log.checkpoint_number == self.checkpoint_number - 1:
+                self.apply_batch(write_ahead_log.recover(manifest['write_ahead_log_size']))
+            else:
+                write_ahead_log.close()
+                raise ValueError(f"Write-ahead log {write_ahead_log_path} follows checkpoint {write_ahead_log.checkpoint_number}, "
+                                 f"but the tree was resumed at checkpoint {self.checkpoint_number}")
+            self.write_ahead_log = write_ahead_log
+
+    @classmethod
+    def open(cls, resource_dir=RESOURCES_DIR, combine=None, **kwargs):
+        """ Resumes the tree in resource_dir from the manifest of its last checkpoint, without reading any node or block.
+            Files changed after the checkpoint are rolled back to it, then the operations logged after the checkpoint are replayed.
+            The combine function isn't part of the manifest and has to be passed again. Other kwargs (e.g. leaf_emptying_workers) replace the parameters of the manifest,
+            as long as they don't change the layout of the files."""
+        manifest = read_manifest(TreeResources(resource_dir).manifest_path)
+        changed_layout = [name for name in kwargs if name in LAYOUT_PARAMETERS and kwargs[name] != manifest['parameters'][name]]
+        if changed_layout:
+            raise ValueError(f"Parameters {changed_layout} define the layout of the files of the tree and can't be changed when opening it")
+        parameters = dict(manifest['parameters'], **kwargs)
+        return cls(resource_dir=resource_dir, combine=combine, manifest=manifest, **parameters)
+
+    def restore_from_manifest(self, manifest):
+        for name, value in (('a', self.a), ('b', self.b), ('s', self.s), ('t', self.t)):
+            if manifest[name] != value:
+                raise ValueError(f"Manifest has {name} = {manifest[name]}, but the parameters of the tree result in {value}")
+
+        self.root_node_id = manifest['root_node_id']
+        queues = manifest['queues']
+        self.internal_node_buffer_emptying_queue.extend(queues['internal_node_buffer_emptying_queue'])
+        for node_id in queues['leaf_node_buffer_emptying_queue']:
+            self.leaf_node_buffer_emptying_queue.append_to_custom_list(node_id)
+        self.node_to_split_queue.extend(load_node(node_id) for node_id in queues['node_to_split_queue'])
+        for node_id in queues['leaf_nodes_with_dummy_children']:
+            self.leaf_nodes_with_dummy_children.append_to_custom_list(node_id)
+        self.node_to_steal_or_merge_queue.extend(queues['node_to_steal_or_merge_queue'])
+
+    def write_manifest(self):
+        write_manifest(self.resources.manifest_path, {
+            'checkpoint_number': self.checkpoint_number,
+            'parameters': self.parameters,
+            'a': self.a, 'b': self.b, 's': self.s, 't': self.t,
+            'root_node_id': self.root_node_id,
+            'counters': [self.resources.node_counter, self.resources.sorted_counter, self.resources.leaf_counter],
+            'queues': {
+                'internal_node_buffer_emptying_queue': list(self.internal_node_buffer_emptying_queue),
+                'leaf_node_buffer_emptying_queue': self.leaf_node_buffer_emptying_queue.node_ids(),
+                'node_to_split_queue': [node.node_id for node in self.node_to_split_queue],
+                'leaf_nodes_with_dummy_children': self.leaf_nodes_with_dummy_children.node_ids(),
+                'node_to_steal_or_merge_queue': list(self.node_to_steal_or_merge_queue),
+            },
+            'storage_state': self.storage.get_state(),
+            'value_log_size': None if self.value_log is None else self.value_log.size,
+            'write_ahead_log_size': None if self.write_ahead_log is None else self.write_ahead_log.size(),
+        })
+
+    @contextmanager
+    def activate(self):
+        """ Makes all node and block functions work on this tree (in the current thread) until the context is left."""
+        token = active_tree.set(self)
+        try:
+            yield self
+        finally:
+            active_tree.reset(token)
+
+    def iterate_activated(self, iterator):
+        # The tree has to be activated whenever the iterator runs, not only while the generator is created
+        while True:
+            with self.activate():
+                item = next(iterator, END_OF_ITERATION)
+            if item is END_OF_ITERATION:
+                return
+            yield item
+
+    @with_activated_tree
+    def close(self):
+        if self.write_ahead_log is not None:
+            self.write_ahead_log.close()
+        self.storage.close()
+        if self.value_log is not None:
+            self.value_log.close()
+        if self.leaf_emptying_pool is not None:
+            self.leaf_emptying_pool.shutdown()
+        if self.io_pool is not None:
+            self.io_pool.shutdown()
+
+    def get_io_pool(self):
+        # Returns None if prefetching is disabled. The tracking handler keeps a single stack of modes, so there is no prefetching while tracking
+        if self.tracking_handler.enabled:
+            return None
+        return self.io_pool
 
     # Must be executed from outside this script to start tracking/benchmarking
     def start_tracking_handler(self):
@@ -65,17 +274,124 @@ class BufferTree:
     def calculate_t(a, b, s):
         return (b // 2) - a + s - 1
 
-    def insert_to_tree(self, ele):
-        self.tree_buffer.insert_new_element(ele, Action.INSERT)
+    @with_activated_tree
+    def insert_to_tree(self, ele, value=None):
+        # Key-value trees require a value, which replaces the value of the key if the key is present already
+        stored_value = self.prepare_value(ele, Action.INSERT, value)
+        self.log_operation(ele, Action.INSERT, value)
+        self.tree_buffer.insert_new_element(ele, Action.INSERT, stored_value)
+        self.check_tree_buffer()
+
+    @with_activated_tree
+    def combine_into_tree(self, ele, delta):
+        """ Combines delta into the value of ele with the tree's combine function, or inserts delta as value if ele is not present.
+            The value of ele is never read for this, the delta is passed down the buffers like an insertion."""
+        stored_delta = self.prepare_value(ele, Action.COMBINE, delta)
+        self.log_operation(ele, Action.COMBINE, delta)
+        self.tree_buffer.insert_new_element(ele, Action.COMBINE, stored_delta)
         self.check_tree_buffer()
 
+    def prepare_value(self, ele, action, value):
+        # Returns what the buffer element of the action carries: the stored value/delta of insertions and combinations, None otherwise
+        if action == Action.COMBINE:
+            if self.combine is None:
+                raise ValueError("Tree was created without a combine function")
+            return self.value_log.store(value)
+        if action == Action.INSERT and self.value_log is not None:
+            return self.value_log.store(value)
+        if value is not None:
+            raise ValueError(f"Got value {value!r} for {ele!r}, but {action} carries no value in this tree")
+        return None
+
+    def log_operation(self, ele, action, value=None):
+        # Value is the one passed by the caller, the value log isn't synced before a checkpoint either
+        if self.write_ahead_log is not None:
+            self.write_ahead_log.append(self.key_type.check_key(ele), action, value)
+
+    @with_activated_tree
+    def apply_batch(self, operations):
+        """ Applies (key, action) or (key, action, value) tuples in the given order, with the same outcome as the single calls.
+            The elements get increasing timestamps based on a single clock reading and fill the tree buffer a whole block at a time,
+            so the buffer is only pushed to the root at block boundaries. Query answers are delivered as for query_batch."""
+        operations = iter(operations)
+        check_key = self.key_type.check_key
+        timestamp = get_current_timer_as_float()
+        while True:
+            elements = self.tree_buffer.get_elements()
+            block = list(itertools.islice(operations, self.tree_buffer.max_size - len(elements)))
+            if not block:
+                return
+
+            for operation in block:
+                key, action = check_key(operation[0]), Action(operation[1])
+                value = operation[2] if len(operation) > 2 else None
+                stored_value = self.prepare_value(key, action, value)
+                if action != Action.QUERY:
+                    self.log_operation(key, action, value)
+                elements.append(BufferElement(key, action, timestamp, stored_value))
+                # Adding an element takes far longer than one step to the next float, so later clock readings are still bigger
+                timestamp = math.nextafter(timestamp, math.inf)
+            self.check_tree_buffer()
+
+    @with_activated_tree
+    def insert_many(self, keys, values=None):
+        """ Inserts all keys via apply_batch. Key-value trees take the values as a parallel iterable."""
+        if values is None:
+            self.apply_batch(zip(keys, itertools.repeat(Action.INSERT)))
+        else:
+            self.apply_batch(zip(keys, itertools.repeat(Action.INSERT), values))
+
+    def combine_values(self, value, delta):
+        # Both might be references into the value log, so is the result
+        return self.value_log.store(self.combine(self.value_log.resolve(value), self.value_log.resolve(delta)))
+
+    def has_values(self):
+        return self.value_log is not None
+
+    def new_bloom_filter(self):
+        # Sized for the most keys a leaf node can hold: b leaf blocks. None if the tree has no Bloom filters
+        if not self.bloom_filter_bits_per_key:
+            return None
+        return BloomFilter.for_capacity(self.b * self.B_leaf, self.bloom_filter_bits_per_key)
+
+    @with_activated_tree
     def delete_from_tree(self, ele):
+        self.log_operation(ele, Action.DELETE)
         self.tree_buffer.insert_new_element(ele, Action.DELETE)
         self.check_tree_buffer()
 
+    @with_activated_tree
+    def query_batch(self, keys, callback=None):
+        """ Enqueues a lookup for each key. Lookups travel down the buffers together with insertions and deletions and are answered lazily:
+            Either when they meet an older insertion/deletion of the same key in some buffer, or when they reach the leaves.
+            Each answer is passed as (key, is_present) to the callback, key-value trees pass (key, is_present, value) with value None if the key is not present.
+            The callback only applies to the lookups of this batch, and is called on the thread using the tree, even if leaf buffers are emptied in parallel.
+            Without a callback, answers can be collected via pop_query_results().
+            Use flush_all_buffers() to enforce answers for all pending lookups."""
+        for key in keys:
+            query_element = self.tree_buffer.insert_new_element(key, Action.QUERY)
+            if callback is not None:
+                self.query_callbacks[(query_element.element, query_element.timestamp)] = callback
+            self.check_tree_buffer()
+
+    def answer_query(self, query_element, is_present, value=None):
+        answer = (query_element.element, is_present)
+        if self.value_log is not None:
+            answer += (self.value_log.resolve(value) if is_present else None,)
+
+        callback = self.query_callbacks.pop((query_element.element, query_element.timestamp), None)
+        if callback is None:
+            self.query_results.append(answer)
+        else:
+            callback(*answer)
+
+    def pop_query_results(self):
+        # Yields the answer of every query answered so far, in the order they were answered
+        while self.query_results:
+            yield self.query_results.popleft()
+
     def check_tree_buffer(self):
         if self.tree_buffer.is_full():
-            # TODO This could be done more efficiently, since this Block is first written then immediately read again if buffer is full
             root = self.push_internal_buffer_to_root_return_root()
 
             if root.buffer_is_full():
@@ -90,13 +406,15 @@ class BufferTree:
         self.tracking_handler.enter_initial_buffer_emptying_mode()
 
         root = load_node(self.root_node_id)
-        root.add_block_to_buffer(self.tree_buffer.get_elements())
+        self.write_pending_root_buffer_block()
+        root.add_block_to_buffer(self.tree_buffer.get_elements(), keep_in_memory=True)
         write_node(root)
         self.tree_buffer.clear_elements()
 
         self.tracking_handler.exit_initial_buffer_emptying_mode()
         return root
 
+    @with_activated_tree
     def flush_all_buffers(self):
         self.tracking_handler.enter_buffer_flush_mode()
 
@@ -104,39 +422,296 @@ class BufferTree:
         root.add_self_to_buffer_emptying_queue()
         self.clear_all_buffers_and_rebalance(enforce_buffer_emptying_enabled=True)
 
+        self.flush_node_cache()
+
         self.tracking_handler.exit_buffer_flush_mode()
 
-    def clear_all_buffers_and_rebalance(self, enforce_buffer_emptying_enabled=False):
-        self.clear_all_buffers_only(enforce_buffer_emptying_enabled)
+    def write_pending_root_buffer_block(self):
+        if self.pending_root_buffer_block is not None:
+            node_id, buffer_block_id, elements = self.pending_root_buffer_block
+            self.pending_root_buffer_block = None
+            write_buffer_block(node_id, buffer_block_id, elements)
+
+    @with_activated_tree
+    def flush_node_cache(self):
+        # Writes back all nodes only changed in the node cache so far
+        self.node_cache.flush()
+
+    @with_activated_tree
+    def checkpoint(self):
+        """ Flushes all buffers and syncs all files of the tree and the write-ahead log, so everything applied so far survives a crash.
+            Afterwards the manifest is written, so the tree can be resumed via BufferTree.open. Between checkpoints only the write-ahead log is synced (in groups).
+            The checkpoint is the only state of the tree files that can be resumed: Until the next one, the storage keeps what is needed to roll back to it.
+            Once the manifest is written, the write-ahead log is replaced by an empty one."""
+        self.flush_all_buffers()
+        self.write_pending_root_buffer_block()
+        self.storage.sync()
+        if self.value_log is not None:
+            self.value_log.sync()
+        if self.write_ahead_log is not None:
+            self.write_ahead_log.sync()
+        self.checkpoint_number += 1
+        self.write_manifest()
+        self.storage.keep_checkpoint(self.checkpoint_number)
+        if self.write_ahead_log is not None:
+            self.write_ahead_log.start_after_checkpoint(self.checkpoint_number)
+
+    @with_activated_tree
+    def bulk_load(self, iterable, presorted=False):
+        """ Loads all elements of the iterable into the (empty) tree by building it bottom-up, instead of inserting one element after another.
+            Unless presorted is set, the input is sorted externally first. Elements occurring several times are only loaded once.
+            All leaf blocks are full (except for the last one), all nodes have between a and b children.
+            The elements are not written to the write-ahead log, a checkpoint afterwards is needed to keep them."""
+        root = load_node(self.root_node_id)
+        if root.children_ids or root.has_buffer_elements() or self.tree_buffer.get_elements():
+            raise ValueError(f"Bulk loading is only possible for an empty tree, but root node is {root} and tree buffer holds {len(self.tree_buffer.get_elements())} elements")
+        if self.value_log is not None:
+            raise ValueError("Bulk loading is not supported for trees with values")
+
+        self.tracking_handler.enter_bulk_load_mode()
+
+        iterable = map(self.key_type.check_key, iterable)
+        if presorted:
+            sorted_chunks = self.sorted_chunks_from_presorted_iterable(iterable)
+        else:
+            sorted_chunks = self.sorted_chunks_from_unsorted_iterable(iterable, root.node_id)
+
+        leaf_blocks_with_biggest_keys = self.write_leaf_blocks_from_sorted_chunks(sorted_chunks)
+        new_root = self.build_nodes_bottom_up(leaf_blocks_with_biggest_keys)
+
+        if new_root is not None:
+            new_root.parent_id = None
+            write_node(new_root)
+            self.root_node_id = new_root.node_id
+            delete_node(root.node_id)
+
+        self.tracking_handler.exit_bulk_load_mode()
+
+    def sorted_chunks_from_presorted_iterable(self, iterable):
+        chunk = []
+        previous_element = None
+        for element in iterable:
+            if previous_element is not None and element <= previous_element:
+                if element == previous_element:
+                    continue
+                raise ValueError(f"Bulk load was told the input is presorted, but {previous_element} comes before {element}")
+            previous_element = element
+
+            chunk.append(element)
+            if len(chunk) == self.B_leaf:
+                yield chunk
+                chunk = []
+
+        if chunk:
+            yield chunk
+
+    def sorted_chunks_from_unsorted_iterable(self, iterable, node_id):
+        # Sorts chunks of M elements in internal memory. If there is more than one chunk, the chunks are merged with an external merge sort (in the directory of node_id)
+        def sorted_buffer_elements_from_chunk():
+            buffer_elements = [BufferElement(element, Action.INSERT, timestamp=0.0) for element in chunk]
+            buffer_elements.sort(key=lambda e: e.element)
+            return TreeNode.annihilate_insertions_deletions_with_matching_timestamps(buffer_elements)
+
+        sorted_ids = []
+        chunk = []
+        for element in iterable:
+            chunk.append(element)
+            if len(chunk) == self.M:
+                sorted_id = self.storage.new_sorted_id(node_id)
+                append_to_sorted_buffer_elements_file(node_id, sorted_id, sorted_buffer_elements_from_chunk())
+                sorted_ids.append(sorted_id)
+                chunk = []
+
+        if not sorted_ids:
+            # Everything fits into internal memory, no need to write anything
+            buffer_elements = sorted_buffer_elements_from_chunk() or []
+            for start_index in range(0, len(buffer_elements), self.B_leaf):
+                yield [buffer_element.element for buffer_element in buffer_elements[start_index:start_index + self.B_leaf]]
+            return
+
+        if chunk:
+            sorted_id = self.storage.new_sorted_id(node_id)
+            append_to_sorted_buffer_elements_file(node_id, sorted_id, sorted_buffer_elements_from_chunk())
+            sorted_ids.append(sorted_id)
+
+        sorted_filepath = external_merge_sort_buffer_elements_many_files(node_id, sorted_ids, self.M)
+        with self.storage.open_sorted_run(sorted_filepath) as sorted_file_reader:
+            buffer_elements = get_buffer_elements_from_sorted_filereader_into_deque(sorted_file_reader, self.B_leaf)
+            while buffer_elements is not None:
+                yield [buffer_element.element for buffer_element in buffer_elements]
+                buffer_elements = get_buffer_elements_from_sorted_filereader_into_deque(sorted_file_reader, self.B_leaf)
+        self.storage.delete_sorted_run(sorted_filepath)
+
+    def write_leaf_blocks_from_sorted_chunks(self, sorted_chunks):
+        # Yields (leaf_id, biggest element in leaf) for each written leaf block. Every leaf block except for the last one is full
+        leaf_block_elements = []
+        for chunk in sorted_chunks:
+            for element in chunk:
+                leaf_block_elements.append(element)
+                if len(leaf_block_elements) == self.B_leaf:
+                    leaf_id = self.storage.new_leaf_id()
+                    write_leaf_block(leaf_id, leaf_block_elements)
+                    yield leaf_id, leaf_block_elements[-1]
+                    leaf_block_elements = []
+
+        if leaf_block_elements:
+            leaf_id = self.storage.new_leaf_id()
+            write_leaf_block(leaf_id, leaf_block_elements)
+            yield leaf_id, leaf_block_elements[-1]
+
+    def build_nodes_bottom_up(self, leaf_blocks_with_biggest_keys):
+        """ Builds the leaf nodes for the leaf blocks, then each level of internal nodes on top of the previous one, until a level consists of a single node.
+            Only O(b) nodes per level are held in internal memory. Returns the new root node (not written yet), or None if there are no leaf blocks."""
+        def build_level(children_with_biggest_keys, is_internal_node):
+            for group in group_into_valid_amount_of_children(children_with_biggest_keys, self.b):
+                if is_internal_node:
+                    children_ids = [child_node.node_id for child_node, _ in group]
+                else:
+                    children_ids = [leaf_id for leaf_id, _ in group]
+                handles = [biggest_key for _, biggest_key in group[:-1]]
+                new_node = TreeNode(is_internal_node=is_internal_node, handles=handles, children=children_ids)
+
+                if is_internal_node:
+                    for child_node, _ in group:
+                        child_node.parent_id = new_node.node_id
+                        write_node(child_node)
+
+                yield new_node, group[-1][1]
+
+        level = build_level(leaf_blocks_with_biggest_keys, is_internal_node=False)
+        while True:
+            first = next(level, None)
+            if first is None:
+                return None
+            second = next(level, None)
+            if second is None:
+                return first[0]
+            level = build_level(itertools.chain([first, second], level), is_internal_node=True)
+
+    @with_activated_tree
+    def range(self, lo, hi):
+        """ Returns a generator over all elements k with lo <= k <= hi in ascending order.
+            Only the buffers on the root-to-leaf paths covering [lo, hi] are emptied (right away, not lazily), all other buffers are left as they are.
+            The tree must not be modified while the generator is used."""
+        self.flush_buffers_for_range(self.key_type.check_key(lo), self.key_type.check_key(hi))
+        return self.iterate_activated(self.iterate_leaf_elements_in_range(lo, hi))
+
+    @with_activated_tree
+    def range_items(self, lo, hi):
+        """ Same as range, but yields (key, value) pairs. Only for key-value trees."""
+        if self.value_log is None:
+            raise ValueError("Tree was created without values, use range instead")
+        self.flush_buffers_for_range(self.key_type.check_key(lo), self.key_type.check_key(hi))
+        return self.iterate_activated(self.iterate_leaf_entries_in_range(lo, hi))
+
+    def flush_buffers_for_range(self, lo, hi):
+        self.tracking_handler.enter_range_buffer_flush_mode()
+
+        if self.tree_buffer.get_elements():
+            root = self.push_internal_buffer_to_root_return_root()
+        else:
+            root = load_node(self.root_node_id)
+        root.add_self_to_buffer_emptying_queue()
+        self.clear_all_buffers_and_rebalance(enforce_buffer_emptying_enabled=True, key_range=(lo, hi))
+
+        self.tracking_handler.exit_range_buffer_flush_mode()
+
+    def iterate_leaf_elements_in_range(self, lo, hi):
+        if lo > hi:
+            return
+
+        for elements in self.read_leaf_blocks_in_range(lo, hi, read_leaf_block_elements_as_deque):
+            for element in elements:
+                if element > hi:
+                    return
+                if element >= lo:
+                    yield element
+
+    def iterate_leaf_entries_in_range(self, lo, hi):
+        if lo > hi:
+            return
+
+        for elements, values in self.read_leaf_blocks_in_range(lo, hi, read_leaf_block_entries):
+            for element, value in zip(elements, values):
+                if element > hi:
+                    return
+                if element >= lo:
+                    yield element, self.value_log.resolve(value)
+
+    def read_leaf_blocks_in_range(self, lo, hi, read_leaf_block):
+        # With prefetching, the next leaf block in the range is read in the background while the current one is yielded
+        leaf_blocks = map(read_leaf_block, self.leaf_ids_in_range(lo, hi))
+        io_pool = self.get_io_pool()
+        if io_pool is None:
+            return leaf_blocks
+        return iterate_with_read_ahead(leaf_blocks, io_pool)
+
+    def leaf_ids_in_range(self, lo, hi):
+        def leaf_ids_in_range_below(node: TreeNode):
+            first_index, last_index = node.get_child_index_range_for_key_range(lo, hi)
+            if node.is_internal_node():
+                for child_id in node.children_ids[first_index:last_index + 1]:
+                    yield from leaf_ids_in_range_below(load_node(child_id))
+            else:
+                yield from node.children_ids[first_index:last_index + 1]
+
+        return leaf_ids_in_range_below(load_node(self.root_node_id))
+
+    def clear_all_buffers_and_rebalance(self, enforce_buffer_emptying_enabled=False, key_range=None):
+        self.clear_all_buffers_only(enforce_buffer_emptying_enabled, key_range)
         self.handle_leaf_nodes_with_dummy_children()
 
-    def clear_all_buffers_only(self, enforce_buffer_emptying_enabled=False):
-        self.clear_full_internal_buffers(enforce_buffer_emptying_enabled)
+    def clear_all_buffers_only(self, enforce_buffer_emptying_enabled=False, key_range=None):
+        self.clear_full_internal_buffers(enforce_buffer_emptying_enabled, key_range)
         self.clear_full_leaf_buffers()
 
     # TODO Rename: It is not ->full<- buffers if enforce mode is enabled
-    def clear_full_internal_buffers(self, enforce_buffer_emptying_enabled):
+    def clear_full_internal_buffers(self, enforce_buffer_emptying_enabled, key_range=None):
+        # If a key_range is given, enforce mode only applies to those children whose keys can intersect with (lo, hi) = key_range
         self.tracking_handler.enter_internal_buffer_emptying_mode()
         while self.internal_node_buffer_emptying_queue:
             node_id = self.internal_node_buffer_emptying_queue.popleft()
             node = load_node(node_id)
-            node.clear_internal_buffer(enforce_buffer_emptying_enabled)
+            node.clear_internal_buffer(enforce_buffer_emptying_enabled, key_range)
             write_node(node)
         self.tracking_handler.exit_internal_buffer_emptying_mode()
 
     def clear_full_leaf_buffers(self):
         self.tracking_handler.enter_leaf_buffer_emptying_mode()
 
-        while not self.leaf_node_buffer_emptying_queue.is_empty():
-            node_id = self.leaf_node_buffer_emptying_queue.pop_first()
-            node = load_node(node_id)
+        # The tracking handler keeps a single stack of modes, so leaf buffers are emptied one after another while tracking
+        if self.leaf_emptying_pool is None or self.tracking_handler.enabled:
+            while not self.leaf_node_buffer_emptying_queue.is_empty():
+                node_id = self.leaf_node_buffer_emptying_queue.pop_first()
+                node = load_node(node_id)
 
-            node.clear_leaf_buffer()
+                node.clear_leaf_buffer()
 
-            write_node(node)
+                write_node(node)
+        else:
+            while not self.leaf_node_buffer_emptying_queue.is_empty():
+                self.clear_leaf_buffers_in_parallel()
 
         self.tracking_handler.exit_leaf_buffer_emptying_mode()
 
+    def clear_leaf_buffers_in_parallel(self):
+        nodes = []
+        while not self.leaf_node_buffer_emptying_queue.is_empty():
+            nodes.append(load_node(self.leaf_node_buffer_emptying_queue.pop_first()))
+        amounts_children_before = [len(node.children_ids) for node in nodes]
+
+        # Only reads and writes the buffer and leaf blocks of each node
+        futures = [submit_in_current_context(self.leaf_emptying_pool, collect_query_answers, node.merge_leaf_buffer_with_leaf_blocks) for node in nodes]
+        for query_answers in [future.result() for future in futures]:
+            for query_answer in query_answers:
+                self.answer_query(*query_answer)
+
+        for node, num_children_before in zip(nodes, amounts_children_before):
+            # Splitting a node before might have split the parent as well, which overwrites the parent id of the nodes on disk
+            node.parent_id = load_node(node.node_id).parent_id
+            node.handle_changed_amount_of_leaf_children(num_children_before)
+            write_node(node)
+
     def handle_leaf_nodes_with_dummy_children(self):
 
         def load_parent_neighbor_left(node: TreeNode):
@@ -184,10 +759,10 @@ class BufferTree:
 
 
 class TreeNode:
-    def __init__(self, is_internal_node, node_id=None, handles=None, children=None, buffer_block_ids=None, last_buffer_size=0, parent_id=None):
+    def __init__(self, is_internal_node, node_id=None, handles=None, children=None, buffer_block_ids=None, last_buffer_size=0, parent_id=None, bloom_filter=None):
 
         if node_id is None:
-            node_id = generate_new_node_dir()
+            node_id = get_block_storage().new_node_id()
 
         if buffer_block_ids is None:
             buffer_block_ids = []
@@ -206,6 +781,10 @@ class TreeNode:
         self.buffer_block_ids = buffer_block_ids
         self.last_buffer_size = last_buffer_size
         self.parent_id = parent_id
+        # Only leaf nodes of trees with Bloom filters have one. Leaf nodes created by bulk loading get theirs once their buffer is merged with their leaf blocks
+        self.bloom_filter = bloom_filter
+        # Elements of the leaf blocks written by the last merge, if the node has a Bloom filter and is about to be split. Never written to storage
+        self.elements_of_written_leaf_blocks = {}
 
     # Only for debugging purposes
     def __str__(self):
@@ -217,18 +796,21 @@ class TreeNode:
         return self.__str__()
 
     def get_new_buffer_block_id(self):
-        return generate_new_buffer_block_id(len(self.buffer_block_ids))
+        return get_block_storage().new_buffer_block_id(self.node_id, len(self.buffer_block_ids))
 
     def is_internal_node(self):
         return self.is_intern
 
-    def add_block_to_buffer(self, elements):
-        # Does not write itself back to ext. memory, but does write the buffer blocks to ext. memory
+    def add_block_to_buffer(self, elements, keep_in_memory=False):
+        # Does not write itself back to ext. memory, but does write the buffer blocks to ext. memory (unless it is kept in memory as the pending root buffer block)
         buffer_block_id = self.get_new_buffer_block_id()
 
         self.buffer_block_ids.append(buffer_block_id)
         self.last_buffer_size = len(elements)
-        write_buffer_block(self.node_id, buffer_block_id, elements)
+        if keep_in_memory:
+            get_tree_instance().pending_root_buffer_block = (self.node_id, buffer_block_id, list(elements))
+        else:
+            write_buffer_block(self.node_id, buffer_block_id, elements)
 
     def add_elements_to_buffer(self, elements):
         tree = get_tree_instance()
@@ -269,7 +851,7 @@ class TreeNode:
     def is_root(self):
         return get_tree_instance().root_node_id == self.node_id
 
-    def clear_internal_buffer(self, enforce_buffer_emptying_enabled):
+    def clear_internal_buffer(self, enforce_buffer_emptying_enabled, key_range=None):
         def determine_if_all_children_are_internal_nodes():
             first_child = load_node(self.children_ids[0])
             return first_child.is_internal_node()
@@ -297,7 +879,13 @@ class TreeNode:
             new_full_children_ids, all_children_are_internal_nodes = self.pass_elements_to_children(elements)
             children_ids_with_full_buffers.update(new_full_children_ids)
 
-        if enforce_buffer_emptying_enabled:
+        if enforce_buffer_emptying_enabled and key_range is not None:
+            first_index, last_index = self.get_child_index_range_for_key_range(*key_range)
+            children_ids_in_range = self.children_ids[first_index:last_index + 1]
+            children_ids_with_full_buffers.difference_update(children_ids_in_range)
+            add_children_ids_to_buffer_emptying_queue(children_ids_in_range, all_children_are_internal_nodes)
+            add_children_ids_to_buffer_emptying_queue(children_ids_with_full_buffers, all_children_are_internal_nodes)
+        elif enforce_buffer_emptying_enabled:
             add_children_ids_to_buffer_emptying_queue(self.children_ids, all_children_are_internal_nodes)
         else:
             add_children_ids_to_buffer_emptying_queue(children_ids_with_full_buffers, all_children_are_internal_nodes)
@@ -310,28 +898,33 @@ class TreeNode:
         self.buffer_block_ids = self.buffer_block_ids[read_size:]
         elements = load_buffer_blocks_sort_and_remove_duplicates(self.node_id, blocks_to_read)
 
-        delete_several_buffer_files_with_ids(self.node_id, blocks_to_read)
+        delete_buffer_blocks(self.node_id, blocks_to_read)
         return elements
 
     def clear_leaf_buffer(self):
+        # self node is written in callee
+        num_children_before = len(self.children_ids)
+        for query_answer in collect_query_answers(self.merge_leaf_buffer_with_leaf_blocks):
+            get_tree_instance().answer_query(*query_answer)
+        self.handle_changed_amount_of_leaf_children(num_children_before)
+
+    def merge_leaf_buffer_with_leaf_blocks(self):
+        # Doesn't touch any other node, so the buffers of several leaf nodes can be merged at the same time
         if self.is_internal_node():
             raise ValueError(f"Called clearing leaf buffer for node {self.node_id}, but this node is an internal node.\nChildren-Ids: {self.children_ids}\nParent-Id: {self.parent_id}")
 
         if not self.has_buffer_elements():
             return
 
-        # self node is written in callee
-        tree = get_tree_instance()
-
-        num_children_before = len(self.children_ids)
-
-        # In case we have an empty buffer, sorted_ids will be []
-
-        sorted_filepath = self.everything_for_external_merge_sort_get_file_path()
+        sorted_buffer_element_deques = self.everything_for_external_merge_sort_get_sorted_deques()
 
         self.last_buffer_size = 0
 
-        self.merge_sorted_buffer_with_leaf_blocks(sorted_filepath)
+        self.merge_sorted_buffer_deques_with_leaf_blocks(sorted_buffer_element_deques)
+
+    def handle_changed_amount_of_leaf_children(self, num_children_before):
+        # Inserts new leaf children into the parent (splitting if necessary), or fills up with dummy children if there are too few
+        tree = get_tree_instance()
 
         if len(self.children_ids) > num_children_before:
             handle_child_id_tuples = self.identify_handles_and_split_keys_to_be_inserted(num_children_before)
@@ -344,17 +937,24 @@ class TreeNode:
 
             # Else: We should be good otherwise, we don't have to re-balance since we still have a(or 0 if root) <= num_children <= b
 
-    def everything_for_external_merge_sort_get_file_path(self):
+    def everything_for_external_merge_sort_get_sorted_deques(self):
+        """ Returns an iterator over the sorted buffer in deques of up to B_leaf buffer elements. If the buffer fits into internal memory,
+            nothing is written. Otherwise the buffer is written in sorted files, whose last merge pass only happens while iterating."""
         get_tracking_handler_instance().enter_external_merge_sort_on_buffer_mode()
 
         tree = get_tree_instance()
 
-        sorted_ids = self.prepare_buffer_blocks_into_manageable_sorted_files()
-        sorted_filepath = external_merge_sort_buffer_elements_many_files(self.node_id, sorted_ids, tree.M)
+        read_size = tree.m - 1
+        elements = self.read_sort_and_remove_duplicates_from_buffer_files_with_read_size(read_size)
+        if not self.buffer_block_ids:
+            sorted_buffer_elements = elements
+        else:
+            sorted_ids = [self.write_sorted_file(elements), *self.prepare_buffer_blocks_into_manageable_sorted_files()]
+            sorted_buffer_elements = iterate_merged_sorted_files(self.node_id, sorted_ids, tree.M)
 
         get_tracking_handler_instance().exit_external_merge_sort_on_buffer_mode()
 
-        return sorted_filepath
+        return group_buffer_elements_into_deques(sorted_buffer_elements, tree.B_leaf)
 
     def create_dummy_children(self):
         if len(self.handles) + 1 != len(self.children_ids) and not len(self.children_ids) == 0:
@@ -373,11 +973,16 @@ class TreeNode:
         # self node is written in callee
 
         tree = get_tree_instance()
+        was_split = False
         for split_key, child_id in handle_child_id_tuples:
             self.handles.append(split_key)
             self.children_ids.append(child_id)
             if len(self.children_ids) > tree.b:
                 self.split_leaf_node()
+                was_split = True
+        if was_split and self.bloom_filter is not None:
+            self.bloom_filter = self.bloom_filter_of_leaf_blocks(self.children_ids)
+        self.elements_of_written_leaf_blocks = {}
 
     def split_leaf_node(self):
         # self node is written in callee
@@ -425,6 +1030,8 @@ class TreeNode:
         self.children_ids = self.children_ids[num_children_for_left_neighbor:]
 
         new_left_neighbor_node = TreeNode(is_internal_node=self.is_internal_node(), handles=handles_for_left_neighbor, children=children_ids_for_left_neighbor, parent_id=self.parent_id)
+        if self.bloom_filter is not None:
+            new_left_neighbor_node.bloom_filter = self.bloom_filter_of_leaf_blocks(children_ids_for_left_neighbor)
 
         index_in_parent = parent_node.index_for_child_id(self.node_id)
         parent_node.children_ids.insert(index_in_parent, new_left_neighbor_node.node_id)
@@ -454,9 +1061,26 @@ class TreeNode:
                 else:
                     overwrite_parent_id(passed_child_id, new_left_neighbor_node.node_id)
 
+    def bloom_filter_of_leaf_blocks(self, leaf_ids):
+        # Built from the elements the last merge wrote, so no leaf block is read. If some of the leaf blocks weren't rewritten,
+        # their elements are unknown, so the filter over the keys of the whole node is kept, which only adds false positives
+        if not all(leaf_id in self.elements_of_written_leaf_blocks for leaf_id in leaf_ids):
+            return self.bloom_filter.copy()
+        tree = get_tree_instance()
+        bloom_filter = tree.new_bloom_filter()
+        for leaf_id in leaf_ids:
+            for element in self.elements_of_written_leaf_blocks[leaf_id]:
+                bloom_filter.add(tree.key_type.to_bytes(element))
+        return bloom_filter
+
     def index_for_child_id(self, find_id):
         return self.children_ids.index(find_id)
 
+    def get_child_index_range_for_key_range(self, lo, hi):
+        # Child i holds the keys k with handles[i - 1] < k <= handles[i], so returns the first and last index of the children that can hold keys in [lo, hi]
+        # If lo > hi, the first index is bigger than the last one
+        return bisect_left(self.handles, lo), bisect_left(self.handles, hi)
+
     def identify_handles_and_split_keys_to_be_inserted(self, num_children_before):
         if num_children_before > 0:
             # num_to_be_inserted will always be > 0 when this function is called, so the list trimming will work fine
@@ -477,91 +1101,138 @@ class TreeNode:
 
         return list(zip(split_keys_to_be_inserted, children_to_be_inserted))
 
-    def merge_sorted_buffer_with_leaf_blocks(self, sorted_filepath):
+    def merge_sorted_buffer_deques_with_leaf_blocks(self, sorted_buffer_element_deques):
+        # Takes an iterator over non-empty deques of sorted buffer elements
+        # The handles are the fence keys of the leaf blocks: Leaf block i holds the elements between handles[i - 1] (exclusive) and handles[i] (inclusive).
+        # Only leaf blocks with buffer elements in their range are read and rewritten, all others keep their id and handle.
+        # Rewritten leaf blocks are packed into full new leaf blocks. If the last of them would be less than half full, the next leaf block is rewritten as well.
+        # The front of old_leaf_block_elements is the current state of the leaf for the next buffer element: Inserted elements are put in front of it
+        # and deleted ones removed from it, so several buffer elements of the same element are applied one after another.
+        # For key-value trees, the values of the elements read from leaf blocks or inserted from the buffer (and not written yet) are kept in leaf_values
 
         get_tracking_handler_instance().enter_merge_leaf_with_buffer_mode()
 
         def new_leaf():
-            new_leaf_id = generate_new_leaf_id()
-            new_split_keys.append(new_leaf_block_elements[-1])
+            new_leaf_id = get_block_storage().new_leaf_id()
+            elements = list(new_leaf_block_elements)
+            new_split_keys.append(elements[-1])
             new_leaf_ids.append(new_leaf_id)
-            write_leaf_block(new_leaf_id, new_leaf_block_elements)
+            values = [leaf_values.pop(element, None) for element in elements]
+            if written_bloom_filter is not None:
+                for element in elements:
+                    written_bloom_filter.add(tree.key_type.to_bytes(element))
+                written_leaf_block_elements[new_leaf_id] = elements
+            if io_pool is None:
+                write_leaf_block(new_leaf_id, elements, values)
+            else:
+                if len(pending_leaf_writes) == MAX_PENDING_LEAF_WRITES:
+                    pending_leaf_writes.popleft().result()
+                pending_leaf_writes.append(submit_in_current_context(io_pool, write_leaf_block, new_leaf_id, elements, values))
             del new_leaf_block_elements[:]
 
-        leaf_block_size = get_tree_instance().B_leaf
-
-        with open(sorted_filepath, 'r') as sorted_file_reader:
-            consumed_child_counter = 0
-
-            old_leaf_block_elements = self.read_leaf_block_elements_as_deque(consumed_child_counter)
-            sorted_buffer_elements = get_buffer_elements_from_sorted_filereader_into_deque(sorted_file_reader, leaf_block_size)
-
-            new_leaf_block_elements = []
-            new_split_keys = []
-            new_leaf_ids = []
-
-            while old_leaf_block_elements is not None and sorted_buffer_elements is not None:
-                while old_leaf_block_elements and sorted_buffer_elements:
-
-                    leaf_element = old_leaf_block_elements[0]
-                    buffer_element = sorted_buffer_elements[0]
+        def move_old_leaf_element_to_new_leaf():
+            new_leaf_block_elements.append(old_leaf_block_elements.popleft())
+            if len(new_leaf_block_elements) == leaf_block_size:
+                new_leaf()
 
-                    if leaf_element < buffer_element.element:
-                        new_leaf_block_elements.append(old_leaf_block_elements.popleft())
-                    elif leaf_element > buffer_element.element:
-                        if buffer_element.action == Action.INSERT:
-                            new_leaf_block_elements.append(sorted_buffer_elements.popleft().element)
-                        else:
-                            sorted_buffer_elements.popleft()
-                        # Else it's a "delete" and element should not be appended
-                    else:
+        def read_leaf_block(leaf_index):
+            # With prefetching, the next leaf block is read in the background, since it is likely to be rewritten as well
+            leaf_id = self.children_ids[leaf_index]
+            future = prefetched_leaf_blocks.pop(leaf_id, None)
+            elements, values = read_leaf_block_elements_and_values(leaf_id) if future is None else future.result()
+            if io_pool is not None and leaf_index + 1 < len(self.children_ids):
+                next_leaf_id = self.children_ids[leaf_index + 1]
+                prefetched_leaf_blocks[next_leaf_id] = submit_in_current_context(io_pool, read_leaf_block_elements_and_values, next_leaf_id)
+            if values is not None:
+                leaf_values.update(zip(elements, values))
+            rewritten_leaf_ids.append(leaf_id)
+            return deque(elements)
+
+        def merge_buffer_elements_up_to(upper_fence_key):
+            # Applies all buffer elements up to the fence key (all of them, if it is None) to old_leaf_block_elements
+            nonlocal buffer_element
+            while buffer_element is not None and (upper_fence_key is None or buffer_element.element <= upper_fence_key):
+                element = buffer_element.element
+                while old_leaf_block_elements and old_leaf_block_elements[0] < element:
+                    move_old_leaf_element_to_new_leaf()
+                is_present = bool(old_leaf_block_elements) and old_leaf_block_elements[0] == element
+
+                if buffer_element.action == Action.QUERY:
+                    # Queries don't change the leaves
+                    answer_query(buffer_element, is_present=is_present, value=leaf_values.get(element))
+                elif buffer_element.action == Action.DELETE:
+                    if is_present:
                         old_leaf_block_elements.popleft()
-                        sorted_buffer_elements.popleft()
-                        if buffer_element.action == Action.INSERT:
-                            new_leaf_block_elements.append(buffer_element.element)
-                        # Else it's a "delete" and element should not be appended
-
-                    if len(new_leaf_block_elements) == leaf_block_size:
-                        new_leaf()
-
-                if not old_leaf_block_elements:
-                    consumed_child_counter += 1
-                    old_leaf_block_elements = self.read_leaf_block_elements_as_deque(consumed_child_counter)
-
-                if not sorted_buffer_elements:
-                    sorted_buffer_elements = get_buffer_elements_from_sorted_filereader_into_deque(sorted_file_reader, leaf_block_size)
-
-            if old_leaf_block_elements:
-                while old_leaf_block_elements is not None:
-                    new_leaf_block_elements.append(old_leaf_block_elements.popleft())
-
-                    if len(new_leaf_block_elements) == leaf_block_size:
-                        new_leaf()
-
-                    if not old_leaf_block_elements:
-                        consumed_child_counter += 1
-                        old_leaf_block_elements = self.read_leaf_block_elements_as_deque(consumed_child_counter)
-
-            if sorted_buffer_elements:
-                while sorted_buffer_elements is not None:
-                    buffer_element = sorted_buffer_elements.popleft()
-                    if buffer_element.action == Action.INSERT:
-                        new_leaf_block_elements.append(buffer_element.element)
+                        leaf_values.pop(element, None)
+                else:
+                    if buffer_element.action == Action.COMBINE and is_present:
+                        leaf_values[element] = tree.combine_values(leaf_values[element], buffer_element.value)
+                    else:
+                        leaf_values[element] = buffer_element.value
+                    if not is_present:
+                        old_leaf_block_elements.appendleft(element)
 
-                    if len(new_leaf_block_elements) == leaf_block_size:
-                        new_leaf()
+                buffer_element = next(buffer_elements, None)
 
-                    if not sorted_buffer_elements:
-                        sorted_buffer_elements = get_buffer_elements_from_sorted_filereader_into_deque(sorted_file_reader, leaf_block_size)
+            while old_leaf_block_elements:
+                move_old_leaf_element_to_new_leaf()
 
-            if new_leaf_block_elements:
+        tree = get_tree_instance()
+        leaf_block_size = tree.B_leaf
+
+        io_pool = tree.get_io_pool()
+        pending_leaf_writes = deque()
+        prefetched_leaf_blocks = {}
+        if io_pool is not None:
+            sorted_buffer_element_deques = iterate_with_read_ahead(sorted_buffer_element_deques, io_pool)
+        buffer_elements = itertools.chain.from_iterable(sorted_buffer_element_deques)
+        buffer_element = next(buffer_elements, None)
+
+        leaf_values = {}
+        # Keys of all new leaf blocks. Untouched leaf blocks aren't read, so the Bloom filter can only be rebuilt from scratch if all leaf blocks are rewritten
+        written_bloom_filter = tree.new_bloom_filter()
+        written_leaf_block_elements = {}
+        old_leaf_block_elements = deque()
+        new_leaf_block_elements = []
+        new_split_keys = []
+        new_leaf_ids = []
+        rewritten_leaf_ids = []
+
+        for leaf_index, leaf_id in enumerate(self.children_ids):
+            upper_fence_key = self.handles[leaf_index] if leaf_index < len(self.handles) else None
+            is_touched = buffer_element is not None and (upper_fence_key is None or buffer_element.element <= upper_fence_key)
+            if not is_touched and len(new_leaf_block_elements) * 2 >= leaf_block_size:
+                # The elements of the previous (rewritten) leaf blocks are final, since all of them are smaller than those of this leaf block
                 new_leaf()
-
-        delete_filepath(sorted_filepath)
-        delete_old_leaves(self.children_ids)
+            if not is_touched and not new_leaf_block_elements:
+                new_split_keys.append(upper_fence_key)
+                new_leaf_ids.append(leaf_id)
+                continue
+
+            old_leaf_block_elements = read_leaf_block(leaf_index)
+            merge_buffer_elements_up_to(upper_fence_key)
+
+        # A leaf node without leaf blocks takes all buffer elements
+        merge_buffer_elements_up_to(None)
+        if new_leaf_block_elements:
+            new_leaf()
+        for pending_leaf_write in pending_leaf_writes:
+            pending_leaf_write.result()
+        for prefetched_leaf_block in prefetched_leaf_blocks.values():
+            prefetched_leaf_block.result()
+
+        delete_leaf_blocks(rewritten_leaf_ids)
         # The last split-key is not necessary, so delete it (since len(split_keys) == len(children) - 1 unless len(children==0)
         if new_split_keys:
             del new_split_keys[-1]
+        if written_bloom_filter is not None:
+            if len(rewritten_leaf_ids) == len(self.children_ids):
+                self.bloom_filter = written_bloom_filter
+            elif self.bloom_filter is not None:
+                self.bloom_filter.union(written_bloom_filter)
+            if len(new_leaf_ids) > tree.b:
+                # Kept for the Bloom filters of the halves once the node is split
+                self.elements_of_written_leaf_blocks = written_leaf_block_elements
         self.handles = new_split_keys
         self.children_ids = new_leaf_ids
 
@@ -575,54 +1246,77 @@ class TreeNode:
         sorted_ids = []
         while self.buffer_block_ids:
             elements = self.read_sort_and_remove_duplicates_from_buffer_files_with_read_size(read_size)
-            sorted_id = get_new_sorted_id()
-            append_to_sorted_buffer_elements_file(self.node_id, sorted_id, elements)
-            sorted_ids.append(sorted_id)
+            sorted_ids.append(self.write_sorted_file(elements))
 
         return sorted_ids
 
+    def write_sorted_file(self, elements):
+        sorted_id = get_block_storage().new_sorted_id(self.node_id)
+        append_to_sorted_buffer_elements_file(self.node_id, sorted_id, elements)
+        return sorted_id
+
     def pass_elements_to_children(self, elements):
         # Returns the set of ids of those children nodes, where the buffer is full now
         # Also returns a bool, indicating where the children are internal nodes. If no elements were passed (and therefore no children loaded to check), returns None in its place
+        # The elements are sorted, so the slice for each child ends at the last element not bigger than its handle (the last child takes the rest)
         if not elements:
             return set(), None
-        elements = deque(elements)
-
-        child_index = 0
-        output_to_child = []
+        elements = list(elements)
+        element_keys = [buffer_element.element for buffer_element in elements]
 
         children_are_internal_nodes = None
 
         children_with_full_buffers = set()
-        while child_index < len(self.handles):
-            while elements and elements[0].element <= self.handles[child_index]:
-                output_to_child.append(elements.popleft())
+        slice_start = 0
+        for child_index, child_node_id in enumerate(self.children_ids):
+            if child_index < len(self.handles):
+                slice_end = bisect_right(element_keys, self.handles[child_index], slice_start)
+            else:
+                slice_end = len(elements)
+            if slice_end == slice_start:
+                continue
 
+            child_node = load_node(child_node_id)
+            children_are_internal_nodes = child_node.is_internal_node()
+            output_to_child = child_node.drop_elements_of_absent_keys(elements[slice_start:slice_end])
             if output_to_child:
-                child_node_id = self.children_ids[child_index]
-                child_node = load_node(child_node_id)
-                children_are_internal_nodes = child_node.is_internal_node()
                 child_buffer_is_full = child_node.add_elements_to_buffer(output_to_child)
                 if child_buffer_is_full:
                     children_with_full_buffers.add(child_node.node_id)
                 write_node(child_node)
-
-            output_to_child = []
-            child_index += 1
-
-        # Handle the rest of the elements for the last child
-        output_to_child = list(elements)
-        if output_to_child:
-            child_node_id = self.children_ids[-1]
-            child_node = load_node(child_node_id)
-            children_are_internal_nodes = child_node.is_internal_node()
-            child_buffer_is_full = child_node.add_elements_to_buffer(output_to_child)
-            if child_buffer_is_full:
-                children_with_full_buffers.add(child_node.node_id)
-            write_node(child_node)
+            slice_start = slice_end
+            if slice_start == len(elements):
+                break
 
         return children_with_full_buffers, children_are_internal_nodes
 
+    def drop_elements_of_absent_keys(self, elements):
+        """ Filters the sorted elements passed to this leaf node by its Bloom filter: Deletions of keys which are certainly neither in the leaf blocks
+            nor inserted into the buffer are dropped, queries for them are answered right away. Keys of insertions and combinations are added to the filter.
+            Elements of the same key are sorted by timestamp, so queries are checked before the keys of newer insertions are added."""
+        if self.bloom_filter is None:
+            return elements
+
+        to_bytes = get_tree_instance().key_type.to_bytes
+        kept_elements = []
+        for buffer_element in elements:
+            key_bytes = to_bytes(buffer_element.element)
+            if buffer_element.action == Action.INSERT or buffer_element.action == Action.COMBINE:
+                self.bloom_filter.add(key_bytes)
+                kept_elements.append(buffer_element)
+            elif self.bloom_filter.might_contain(key_bytes):
+                kept_elements.append(buffer_element)
+            elif buffer_element.action == Action.QUERY:
+                answer_query(buffer_element, is_present=False)
+        return kept_elements
+
+    def unite_bloom_filter_with(self, neighbor_node):
+        # After taking over leaf blocks of the neighbor. Without a filter on either side, nothing is known about the keys any longer
+        if self.bloom_filter is not None and neighbor_node.bloom_filter is not None:
+            self.bloom_filter.union(neighbor_node.bloom_filter)
+        else:
+            self.bloom_filter = None
+
     def get_left_neighbor_id_for_child_id(self, child_id):
         child_index = self.children_ids.index(child_id)
         if child_index == 0:
@@ -639,17 +1333,16 @@ class TreeNode:
 
     @staticmethod
     def annihilate_insertions_deletions_with_matching_timestamps(elements):
-        """ Eliminates elements of the passed list if the element key exists several times. Only keeps last entry.
-            Expects list to be sorted before call."""
-        # following list will contain all indices of elements to be deleted in descending order
+        """ Eliminates elements of the passed list if the element key exists several times. Only keeps last insertion/deletion.
+            Queries with an older insertion/deletion of the same key are answered and removed, all older queries are kept.
+            Combinations are folded into older updates (see resolve_buffer_elements_of_same_element).
+            Expects list to be sorted by element and timestamp before call."""
         if not elements:
-            return
+            return []
 
         new_list = []
-        for i in range(len(elements)-1):
-            if elements[i].element != elements[i + 1].element:
-                new_list.append(elements[i])
-        new_list.append(elements[-1])
+        for _, same_elements in itertools.groupby(elements, key=lambda buffer_element: buffer_element.element):
+            new_list.extend(resolve_buffer_elements_of_same_element(list(same_elements)))
 
         del elements[:]
         return new_list
@@ -712,7 +1405,7 @@ class TreeNode:
             tree.leaf_nodes_with_dummy_children.find_and_delete_element(neighbor_node.node_id)
 
             # Delete neighbor
-            delete_node_from_ext_memory(neighbor_node.node_id)
+            delete_node(neighbor_node.node_id)
 
         else:
             # Steal neighbor can't have dummy children, we take care of that with our own invariant
@@ -748,6 +1441,8 @@ class TreeNode:
         if neighbor_node.is_internal_node():
             for child_id in neighbor_node.children_ids:
                 overwrite_parent_id(child_id, self.node_id)
+        else:
+            self.unite_bloom_filter_with(neighbor_node)
 
         if is_left_neighbor:
             left_node = neighbor_node
@@ -898,6 +1593,8 @@ class TreeNode:
             for stolen_node_id in stolen_children:
                 if stolen_node_id != DUMMY_STRING:
                     overwrite_parent_id(stolen_node_id, self.node_id)
+        else:
+            self.unite_bloom_filter_with(neighbor_node)
 
         # If we still have dummy children, calling method has to take care of that
 
@@ -948,7 +1645,7 @@ class TreeNode:
         overwrite_parent_id(self.children_ids[0], None)
 
         tree.root_node_id = self.children_ids[0]
-        delete_node_from_ext_memory(self.node_id)
+        delete_node(self.node_id)
 
         get_tracking_handler_instance().exit_root_node_deletion_mode()
 
@@ -961,14 +1658,34 @@ class TreeNode:
             tree.leaf_node_buffer_emptying_queue.append_to_custom_list(self.node_id)
 
 
+def group_into_valid_amount_of_children(children, max_children):
+    """ Groups the children iterable into lists of max_children children, except for the last two groups, which share the rest evenly.
+        So if there is more than one group, every group has at least max_children // 2 children. Holds at most 2 * max_children children at once."""
+    pending_children = []
+    for child in children:
+        pending_children.append(child)
+        if len(pending_children) == 2 * max_children:
+            yield pending_children[:max_children]
+            pending_children = pending_children[max_children:]
+
+    if len(pending_children) > max_children:
+        half = len(pending_children) // 2
+        yield pending_children[:half]
+        yield pending_children[half:]
+    elif pending_children:
+        yield pending_children
+
+
 class TreeBuffer:
-    def __init__(self, max_size):
+    def __init__(self, max_size, key_type):
         self.elements = []
         self.max_size = max_size
+        self.key_type = key_type
 
-    def insert_new_element(self, k, action):
-        new_elem = BufferElement(k, action)
+    def insert_new_element(self, k, action, value=None):
+        new_elem = BufferElement(self.key_type.check_key(k), action, value=value)
         self.elements.append(new_elem)
+        return new_elem
 
     def is_full(self):
         # Mainly for validating there's nothing wrong.
@@ -996,132 +1713,124 @@ class NodeBufferBlock:
         self.number_elements = number_elements
 
 
-# Node structure ideas:
-# is_internal_node, num_handles, *handles, num_children, *paths_to_children, num_buffer_blocks, *paths_to_buffer_blocks, size_of_last_buffer_block
-# next line: parent_id (with line break)
+# Node record: is_internal_node, handles, children ids, buffer block ids, size of last buffer block and parent_id. Layout depends on the storage codec
 def load_node(node_id) -> TreeNode:
 
     if node_id is None:
         raise ValueError("Tried loading node, but node_id was not provided (is None)")
 
-    raw_data = load_node_raw(node_id)
-    rows = raw_data.split('\n')
-
-    data = rows[0].split(SEP)
-
-    if data[0] == TRUE_STRING:
-        is_internal_node = True
-    else:
-        is_internal_node = False
-
-    index = 2
-    num_handles = int(data[1])
-    handles = data[index:index+num_handles]
-    index += num_handles
+    node_cache = get_node_cache()
+    if node_cache is None:
+        return node_from_record(node_id, get_storage_codec().decode_node(load_node_raw(node_id)))
 
-    num_children = int(data[index])
-    children_timestamps = data[index+1: index+1+num_children]
-    index += 1 + num_children
+    record = node_cache.get(node_id)
+    if record is not None:
+        get_tracking_handler_instance().enter_node_cache_hit_sub_mode()
+        get_tracking_handler_instance().exit_node_cache_hit_sub_mode(1)
+        return node_from_record(node_id, record)
 
-    num_buffer_blocks = int(data[index])
-    buffer_block_ids = data[index+1: index+1+num_buffer_blocks]
-    index += 1 + num_buffer_blocks
+    get_tracking_handler_instance().enter_node_cache_miss_sub_mode()
+    get_tracking_handler_instance().exit_node_cache_miss_sub_mode(1)
+    record = get_storage_codec().decode_node(load_node_raw(node_id))
+    node_cache.put(node_id, record, is_dirty=False)
+    return node_from_record(node_id, record)
 
-    last_buffer_size = int(data[index])
-    index += 1
 
-    parent_id = rows[1]
-    if parent_id == 'None':
-        parent_id = None
-    index += 1
+def node_from_record(node_id, record) -> TreeNode:
+    is_internal_node, handles, children_ids, buffer_block_ids, last_buffer_size, parent_id, bloom_filter = record
 
     node_instance = TreeNode(
         node_id=node_id,
         is_internal_node=is_internal_node,
         handles=handles,
-        children=children_timestamps,
+        children=children_ids,
         buffer_block_ids=buffer_block_ids,
         last_buffer_size=last_buffer_size,
-        parent_id=parent_id
+        parent_id=parent_id,
+        bloom_filter=None if bloom_filter is None else BloomFilter.from_bytes(bloom_filter)
     )
 
     return node_instance
 
 
+def record_from_node(node: TreeNode):
+    bloom_filter = None if node.bloom_filter is None else node.bloom_filter.to_bytes()
+    return node.is_internal_node(), node.handles, node.children_ids, node.buffer_block_ids, node.last_buffer_size, node.parent_id, bloom_filter
+
+
 def load_node_raw(node_id):
     get_tracking_handler_instance().enter_node_read_sub_mode()
 
-    file_path = node_information_file_path_from_id(node_id)
-    with open(file_path, 'r') as f:
-        data = f.read()
+    data = get_block_storage().read_node_record(node_id)
 
     get_tracking_handler_instance().exit_node_read_sub_mode(1)
     return data
 
 
 def write_node(node: TreeNode):
-    get_tracking_handler_instance().enter_node_write_sub_mode()
-
-    if node.is_internal_node():
-        is_internal_string = TRUE_STRING
+    node_cache = get_node_cache()
+    if node_cache is None:
+        write_node_record_to_storage(node.node_id, record_from_node(node))
     else:
-        is_internal_string = FALSE_STRING
-
-    first_line_raw = [is_internal_string, len(node.handles), *node.handles, len(node.children_ids), *node.children_ids, len(node.buffer_block_ids), *node.buffer_block_ids, node.last_buffer_size]
-    first_line_str = [str(elem) for elem in first_line_raw]
-    # Second line will just be parent_id
+        node_cache.put(node.node_id, record_from_node(node), is_dirty=True)
 
-    first_line_output_string = SEP.join(first_line_str)
 
-    file_path = node_information_file_path_from_id(node.node_id)
+def write_node_record_to_storage(node_id, record):
+    get_tracking_handler_instance().enter_node_write_sub_mode()
 
-    with open(file_path, 'w') as f:
-        f.write(first_line_output_string)
-        f.write('\n')
-        f.write(f'{node.parent_id}\n')
+    get_block_storage().write_node_record(node_id, get_storage_codec().encode_node(node_from_record(node_id, record)))
 
     get_tracking_handler_instance().exit_node_write_sub_mode(1)
 
 
-# Buffer Block Structure:
-# Each line: Element;Timestamp;Action
+def delete_node(node_id):
+    node_cache = get_node_cache()
+    if node_cache is not None:
+        node_cache.discard(node_id)
+    get_block_storage().delete_node(node_id)
+
+
+# Buffer Block Structure: Sequence of buffer elements (element, timestamp, action), layout depends on the storage codec
 def read_buffer_block_elements(node_id, buffer_block_id):
-    block_filepath = get_buffer_file_path_from_ids(node_id, buffer_block_id)
+    pending_elements = get_pending_root_buffer_block_elements(node_id, buffer_block_id)
+    if pending_elements is not None:
+        return list(pending_elements)
 
-    return read_buffer_elements_from_file_path(block_filepath)
+    get_tracking_handler_instance().enter_buffer_element_read_sub_mode()
+
+    elements = get_storage_codec().decode_buffer_elements(get_block_storage().read_buffer_block(node_id, buffer_block_id))
+
+    get_tracking_handler_instance().exit_buffer_element_read_sub_mode(len(elements))
+    return elements
 
 
 def read_buffer_elements_from_file_path(file_path):
     get_tracking_handler_instance().enter_buffer_element_read_sub_mode()
 
-    with open(file_path, 'r') as f:
-        elements = []
-        for line in f:
-            elements.append(parse_line_into_buffer_element(line))
+    with open(file_path, 'rb') as f:
+        elements = get_storage_codec().decode_buffer_elements(f.read())
 
     get_tracking_handler_instance().exit_buffer_element_read_sub_mode(len(elements))
     return elements
 
 
 def write_buffer_block(node_id, buffer_block_id, elements):
-    buffer_filepath = get_buffer_file_path_from_ids(node_id, buffer_block_id)
-
     get_tracking_handler_instance().enter_buffer_element_write_sub_mode()
 
-    with open(buffer_filepath, 'w') as f:
-        for element in elements:
-            f.write(element.to_output_string())
+    get_block_storage().write_buffer_block(node_id, buffer_block_id, get_storage_codec().encode_buffer_elements(elements))
 
     get_tracking_handler_instance().exit_buffer_element_write_sub_mode(len(elements))
 
 
 def append_to_buffer(node_id, buffer_block_id, elements):
+    pending_elements = get_pending_root_buffer_block_elements(node_id, buffer_block_id)
+    if pending_elements is not None:
+        pending_elements.extend(elements)
+        return
+
     get_tracking_handler_instance().enter_buffer_element_write_sub_mode()
 
-    buffer_filepath = get_buffer_file_path_from_ids(node_id, buffer_block_id)
-    with open(buffer_filepath, 'a') as f:
-        for element in elements:
-            f.write(element.to_output_string())
+    get_block_storage().append_to_buffer_block(node_id, buffer_block_id, get_storage_codec().encode_buffer_elements(elements))
 
     get_tracking_handler_instance().exit_buffer_element_write_sub_mode(len(elements))
 
@@ -1140,43 +1849,151 @@ def load_buffer_elements_from_buffer_blocks_with_ids(node_id, buffer_block_ids)
 
 
 def read_leaf_block_elements_as_deque(leaf_id):
+    if tree_has_values():
+        return deque(read_leaf_block_entries(leaf_id)[0])
+
     get_tracking_handler_instance().enter_leaf_element_read_sub_mode()
 
-    leaf_file_path = get_leaf_file_path_from_id(leaf_id)
-    elements = read_leaf_block_elements_as_deque_from_filepath(leaf_file_path)
+    elements = deque(get_storage_codec().decode_leaf_elements(get_block_storage().read_leaf_block(leaf_id)))
 
     get_tracking_handler_instance().exit_leaf_element_read_sub_mode(len(elements))
 
     return elements
 
 
+def read_leaf_block_elements_and_values(leaf_id):
+    # values is None unless it's a key-value tree
+    if tree_has_values():
+        return read_leaf_block_entries(leaf_id)
+    return read_leaf_block_elements_as_deque(leaf_id), None
+
+
+def read_leaf_block_entries(leaf_id):
+    # Only for key-value trees. Returns the list of elements and the list of their values
+    get_tracking_handler_instance().enter_leaf_element_read_sub_mode()
+
+    elements, values = get_storage_codec().decode_leaf_entries(get_block_storage().read_leaf_block(leaf_id))
+
+    get_tracking_handler_instance().exit_leaf_element_read_sub_mode(len(elements))
+
+    return elements, values
+
+
 def read_leaf_block_elements_as_deque_from_filepath(leaf_file_path):
-    elements = deque()
-    with open(leaf_file_path, 'r') as f:
-        for line in f:
-            # The line splitting [:-1] on action gets rid of the line break
-            elements.append(line[:-1])
+    with open(leaf_file_path, 'rb') as f:
+        return deque(get_storage_codec().decode_leaf_elements(f.read()))
+
+
+def write_leaf_block(leaf_id, elements, values=None):
+    # values are only stored for key-value trees
+    get_tracking_handler_instance().enter_leaf_element_write_sub_mode()
+
+    if tree_has_values():
+        data = get_storage_codec().encode_leaf_entries(elements, values)
+    else:
+        data = get_storage_codec().encode_leaf_elements(elements)
+    get_block_storage().write_leaf_block(leaf_id, data)
+
+    get_tracking_handler_instance().exit_leaf_element_write_sub_mode(len(elements))
+
+
+def iterate_with_read_ahead(iterator, executor):
+    """ Yields the items of the iterator (which must not yield None). The next item is always produced by the executor in the background,
+        while the current one is in use. Items are still produced one after another, never concurrently."""
+    future = submit_in_current_context(executor, next, iterator, None)
+    while True:
+        item = future.result()
+        if item is None:
+            return
+        future = submit_in_current_context(executor, next, iterator, None)
+        yield item
+
+
+def submit_in_current_context(executor, function, *args):
+    # Threads of the executor have to work on the same (activated) tree as the calling thread
+    return executor.submit(copy_context().run, function, *args)
 
-    return elements
 
+def delete_leaf_blocks(leaf_ids):
+    storage = get_block_storage()
+    for leaf_id in leaf_ids:
+        storage.delete_leaf_block(leaf_id)
 
-def write_leaf_block(leaf_id, elements):
-    leaf_file_path = get_leaf_file_path_from_id(leaf_id)
-    write_leaf_elements_to_file_path(leaf_file_path, elements)
+
+def delete_buffer_blocks(node_id, buffer_block_ids):
+    storage = get_block_storage()
+    for buffer_block_id in buffer_block_ids:
+        if get_pending_root_buffer_block_elements(node_id, buffer_block_id) is not None:
+            # Never written, so there is nothing to delete
+            get_tree_instance().pending_root_buffer_block = None
+            storage.release_unwritten_buffer_block(node_id, buffer_block_id)
+        else:
+            storage.delete_buffer_block(node_id, buffer_block_id)
+
+
+def get_pending_root_buffer_block_elements(node_id, buffer_block_id):
+    # Returns the (mutable) elements of the pending root buffer block, if it is the block asked for, else None
+    tree = get_tree_instance()
+    if tree.pending_root_buffer_block is None:
+        return None
+    pending_node_id, pending_buffer_block_id, elements = tree.pending_root_buffer_block
+    if (pending_node_id, pending_buffer_block_id) != (node_id, buffer_block_id):
+        return None
+    return elements
 
 
 def write_leaf_elements_to_file_path(leaf_file_path, elements):
     get_tracking_handler_instance().enter_leaf_element_write_sub_mode()
 
-    with open(leaf_file_path, 'w') as f:
-        for element in elements:
-            f.write(f'{element}\n')
+    with open(leaf_file_path, 'wb') as f:
+        f.write(get_storage_codec().encode_leaf_elements(elements))
 
     get_tracking_handler_instance().exit_leaf_element_write_sub_mode(len(elements))
 
 
 def get_tree_instance() -> BufferTree:
-    return BufferTree.tree_instance
+    # Raises a ValueError if no tree is active
+    return get_active_tree()
+
+
+def tree_has_values():
+    return get_tree_instance().has_values()
+
+
+def get_storage_codec():
+    return get_tree_instance().codec
+
+
+def get_node_cache():
+    # Returns None if the node cache of the tree is disabled
+    tree = get_tree_instance()
+    if not tree.node_cache.is_enabled():
+        return None
+    return tree.node_cache
+
+
+def get_block_storage():
+    return get_tree_instance().storage
+
+
+def answer_query(query_element: BufferElement, is_present, value=None):
+    # value is the value of the key, if it is present in a key-value tree
+    query_answers = collected_query_answers.get()
+    if query_answers is None:
+        get_tree_instance().answer_query(query_element, is_present, value)
+    else:
+        query_answers.append((query_element, is_present, value))
+
+
+def collect_query_answers(function, *args):
+    # Returns the (query_element, is_present, value) of each query answered by the function (or threads it submitted work to), without answering them
+    query_answers = []
+    token = collected_query_answers.set(query_answers)
+    try:
+        function(*args)
+    finally:
+        collected_query_answers.reset(token)
+    return query_answers
 
 
 def overwrite_parent_id(child_id, new_parent_id):
@@ -1191,9 +2008,4 @@ def overwrite_parent_id(child_id, new_parent_id):
 
 
 def get_tracking_handler_instance() -> TreeTrackingHandler:
-    # Kinda fails for some unit tests where no tree, but only nodes are created... So let's return a dummy TrackingHandler, without a tree, tracker isn't enabled anyways
-    tree = get_tree_instance()
-    if tree is None:
-        return TreeTrackingHandler()
-    else:
-        return get_tree_instance().tracking_handler
+    return get_tree_instance().tracking_handler
@@ -0,0 +1,57 @@
+from collections import OrderedDict
+
+
+class NodeCache:
+    """ In-memory LRU cache of node records, so nodes accessed over and over again don't have to be read and parsed each time.
+        Written records are only marked as dirty and written back (via write_back(node_id, record)) once they get evicted or the cache is flushed.
+        Records are tuples (is_internal_node, handles, children_ids, buffer_block_ids, last_buffer_size, parent_id, bloom_filter), the Bloom filter as bytes
+        or None. The lists are copied when putting and getting records, so changes to a loaded node never reach the cache without writing the node.
+        Hits and misses are counted by the tracking handler (node_cache_hit and node_cache_miss sub-modes) in load_node."""
+    def __init__(self, capacity, write_back):
+        if capacity < 0:
+            raise ValueError(f"Node cache capacity must not be negative, but is {capacity}")
+
+        self.capacity = capacity
+        self.write_back = write_back
+        # node_id -> [record, is_dirty], least recently used first
+        self.records = OrderedDict()
+
+    def is_enabled(self):
+        return self.capacity > 0
+
+    def get(self, node_id):
+        # Returns a copy of the record, or None if the node isn't cached
+        entry = self.records.get(node_id)
+        if entry is None:
+            return None
+
+        self.records.move_to_end(node_id)
+        return copy_record(entry[0])
+
+    def put(self, node_id, record, is_dirty):
+        entry = self.records.get(node_id)
+        if entry is not None:
+            # A clean put (after a read) must not lose an earlier write
+            is_dirty = is_dirty or entry[1]
+            self.records.move_to_end(node_id)
+        self.records[node_id] = [copy_record(record), is_dirty]
+
+        while len(self.records) > self.capacity:
+            evicted_node_id, (evicted_record, evicted_is_dirty) = self.records.popitem(last=False)
+            if evicted_is_dirty:
+                self.write_back(evicted_node_id, evicted_record)
+
+    def discard(self, node_id):
+        # Node got deleted, so it must never be written back
+        self.records.pop(node_id, None)
+
+    def flush(self):
+        for node_id, entry in self.records.items():
+            if entry[1]:
+                self.write_back(node_id, entry[0])
+                entry[1] = False
+
+
+def copy_record(record):
+    is_internal_node, handles, children_ids, buffer_block_ids, last_buffer_size, parent_id, bloom_filter = record
+    return is_internal_node, list(handles), list(children_ids), list(buffer_block_ids), last_buffer_size, parent_id, bloom_filter
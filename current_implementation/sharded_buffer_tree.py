@@ -0,0 +1,227 @@
+""" Front-end that partitions the keys across several BufferTrees (shards), each running in its own worker process with its own resource directory.
+Insertions, deletions, combinations and queries are collected per shard and shipped in batches, without waiting for the worker.
+Everything that returns something (flushing, ranges, query results) is sent to all shards first and then collected, so the shards work in parallel.
+A shard that fails to apply a batch applies no later batches. From then on every call raises, since the tree misses an unknown amount of operations."""
+import heapq
+import multiprocessing
+import os
+import zlib
+from bisect import bisect_left
+# The tree module has to be imported before the buffer element module (circular import)
+from current_implementation.new_buffer_tree import BufferTree
+from current_implementation.buffer_element import Action
+from current_implementation.constants_and_helpers import RESOURCES_DIR
+from current_implementation.key_type import get_key_type
+
+DEFAULT_BATCH_SIZE = 1_000
+HASH_PARTITIONING = 'hash'
+RANGE_PARTITIONING = 'range'
+
+# Commands sent to the shards. Only APPLY is not answered, its errors are answered to the next command
+APPLY = 'apply'
+FLUSH = 'flush'
+RANGE = 'range'
+RANGE_ITEMS = 'range_items'
+POP_QUERY_RESULTS = 'pop_query_results'
+CLOSE = 'close'
+
+
+class ShardedBufferTree:
+
+    def __init__(self, amount_shards, resource_dir=RESOURCES_DIR, partitioning=HASH_PARTITIONING, split_keys=None, batch_size=DEFAULT_BATCH_SIZE, **tree_kwargs):
+        """ Keys are partitioned by a (stable) hash of the key, or by range: Shard i holds the keys k with split_keys[i - 1] < k <= split_keys[i].
+            Shard i keeps its data in resource_dir/shard_i and its write-ahead log (if write_ahead_log_path is given) at write_ahead_log_path.shard_i.
+            All other keyword arguments are passed to the BufferTree of each shard, so they (like a combine function) must be picklable."""
+        if amount_shards < 1:
+            raise ValueError(f"At least one shard is needed, but got {amount_shards}")
+        self.key_type = get_key_type(tree_kwargs.get('key_type', 'str'))
+        if partitioning == HASH_PARTITIONING:
+            if split_keys is not None:
+                raise ValueError("Split keys are only used for range partitioning")
+        elif partitioning == RANGE_PARTITIONING:
+            if split_keys is None or len(split_keys) != amount_shards - 1:
+                raise ValueError(f"Range partitioning over {amount_shards} shards requires {amount_shards - 1} split keys, but got {split_keys}")
+            split_keys = [self.key_type.check_key(split_key) for split_key in split_keys]
+            if split_keys != sorted(set(split_keys)):
+                raise ValueError(f"Split keys must be strictly increasing, but are {split_keys}")
+        else:
+            raise ValueError(f"Unknown partitioning {partitioning}, available are {[HASH_PARTITIONING, RANGE_PARTITIONING]}")
+
+        self.partitioning = partitioning
+        self.split_keys = split_keys
+        self.batch_size = batch_size
+        self.batches = [[] for _ in range(amount_shards)]
+        # Set once a shard reported a failed batch, every later call raises it
+        self.failure = None
+
+        # Spawned instead of forked, since the parent process might run threads (of other trees)
+        context = multiprocessing.get_context('spawn')
+        self.connections = []
+        self.processes = []
+        for shard_index in range(amount_shards):
+            connection, shard_connection = context.Pipe()
+            shard_resource_dir = os.path.join(resource_dir, f'shard_{shard_index}')
+            shard_tree_kwargs = dict(tree_kwargs)
+            if tree_kwargs.get('write_ahead_log_path') is not None:
+                shard_tree_kwargs['write_ahead_log_path'] = f"{tree_kwargs['write_ahead_log_path']}.shard_{shard_index}"
+            process = context.Process(target=run_shard, args=(shard_connection, shard_resource_dir, shard_tree_kwargs), daemon=True)
+            process.start()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Pending batches are only shipped if the block ended normally
+        self.close(ship_pending_batches=exc_type is None)
+
+    def get_shard_index(self, key):
+        if self.partitioning == RANGE_PARTITIONING:
+            return bisect_left(self.split_keys, key)
+        return zlib.crc32(self.key_type.to_bytes(key)) % len(self.connections)
+
+    def insert_to_tree(self, key, value=None):
+        self.add_to_batch(Action.INSERT, key, value)
+
+    def delete_from_tree(self, key):
+        self.add_to_batch(Action.DELETE, key)
+
+    def combine_into_tree(self, key, delta):
+        self.add_to_batch(Action.COMBINE, key, delta)
+
+    def query_batch(self, keys):
+        """ Answers are collected via pop_query_results (after flush_all_buffers, to enforce answers for all queries)."""
+        for key in keys:
+            self.add_to_batch(Action.QUERY, key)
+
+    def add_to_batch(self, action, key, value=None):
+        self.check_failure()
+        shard_index = self.get_shard_index(self.key_type.check_key(key))
+        batch = self.batches[shard_index]
+        batch.append((key, action, value))
+        if len(batch) >= self.batch_size:
+            self.ship_batch(shard_index)
+
+    def ship_batch(self, shard_index):
+        if self.batches[shard_index]:
+            self.connections[shard_index].send((APPLY, self.batches[shard_index]))
+            self.batches[shard_index] = []
+
+    def ship_all_batches(self):
+        for shard_index in range(len(self.connections)):
+            self.ship_batch(shard_index)
+
+    def flush_all_buffers(self):
+        self.ask_shards(FLUSH, None, range(len(self.connections)))
+
+    def pop_query_results(self):
+        # Answers of all shards, grouped by shard
+        for shard_results in self.ask_shards(POP_QUERY_RESULTS, None, range(len(self.connections))):
+            yield from shard_results
+
+    def range(self, lo, hi):
+        """ Returns all keys k with lo <= k <= hi in ascending order. Each shard returns its keys as a whole."""
+        return self.range_from_shards(RANGE, lo, hi, key=None)
+
+    def range_items(self, lo, hi):
+        """ Same as range, but returns (key, value) pairs. Only for shards with values."""
+        return self.range_from_shards(RANGE_ITEMS, lo, hi, key=lambda item: item[0])
+
+    def range_from_shards(self, command, lo, hi, key):
+        lo, hi = self.key_type.check_key(lo), self.key_type.check_key(hi)
+        if self.partitioning == RANGE_PARTITIONING:
+            # Shards are ordered by their keys already, so only those intersecting [lo, hi] are asked
+            shard_indices = range(self.get_shard_index(lo), self.get_shard_index(hi) + 1)
+            return [element for shard_elements in self.ask_shards(command, (lo, hi), shard_indices) for element in shard_elements]
+        return list(heapq.merge(*self.ask_shards(command, (lo, hi), range(len(self.connections))), key=key))
+
+    def ask_shards(self, command, argument, shard_indices, ship_pending_batches=True):
+        # Sends the command to all shards at once before waiting for any answer. Pending batches are shipped first, so the command sees them
+        self.check_failure()
+        shard_indices = list(shard_indices)
+        if ship_pending_batches:
+            self.ship_all_batches()
+        for shard_index in shard_indices:
+            self.connections[shard_index].send((command, argument))
+
+        results = []
+        errors = []
+        for shard_index in shard_indices:
+            error, failed_batch, result = self.connections[shard_index].recv()
+            if failed_batch is not None and self.failure is None:
+                self.failure = ValueError(f"Shard {shard_index} failed to apply its batch {failed_batch} ({error!r}) and applied none of its later batches")
+                self.failure.__cause__ = error
+            elif error is not None:
+                errors.append(error)
+            results.append(result)
+        self.check_failure()
+        if errors:
+            raise errors[0]
+        return results
+
+    def check_failure(self):
+        if self.failure is not None:
+            raise self.failure
+
+    def close(self, ship_pending_batches=True):
+        """ Ships the pending batches, closes the trees of all shards and stops their processes.
+            Raises the failure of a shard, if one failed to apply a batch (the processes are stopped anyway)."""
+        try:
+            if self.failure is None:
+                self.ask_shards(CLOSE, None, range(len(self.connections)), ship_pending_batches)
+            else:
+                for connection in self.connections:
+                    connection.send((CLOSE, None))
+                    connection.recv()
+                self.check_failure()
+        finally:
+            for connection, process in zip(self.connections, self.processes):
+                process.join()
+                connection.close()
+            self.connections = []
+            self.processes = []
+
+
+def run_shard(connection, resource_dir, tree_kwargs):
+    # Main loop of a shard's worker process. Once applying a batch failed, no later batches are applied and every answer reports the failed batch
+    tree = BufferTree(resource_dir=resource_dir, **tree_kwargs)
+    applied_batches = 0
+    failure = None
+    while True:
+        command, argument = connection.recv()
+        if command == APPLY:
+            if failure is None:
+                try:
+                    tree.apply_batch(argument)
+                    applied_batches += 1
+                except Exception as exception:
+                    # Batches are counted from 1
+                    failure = (exception, applied_batches + 1)
+            continue
+        if failure is not None:
+            connection.send((*failure, None))
+            if command == CLOSE:
+                tree.close()
+                return
+            continue
+
+        result = None
+        error = None
+        try:
+            if command == CLOSE:
+                tree.close()
+            elif command == FLUSH:
+                tree.flush_all_buffers()
+            elif command == POP_QUERY_RESULTS:
+                result = list(tree.pop_query_results())
+            elif command == RANGE:
+                result = list(tree.range(*argument))
+            elif command == RANGE_ITEMS:
+                result = list(tree.range_items(*argument))
+        except Exception as exception:
+            error = exception
+        connection.send((error, None, result))
+        if command == CLOSE:
+            return
+
@@ -0,0 +1,367 @@
+""" Encodings of buffer blocks, leaf blocks and node records on disk. All files are read and written as bytes, the codec decides the layout.
+The text codec keeps the human-readable format (useful for debugging), the binary codec uses a compact fixed layout that is cheaper to parse.
+Decoding accepts any bytes-like object, so memoryviews on mapped pages can be decoded without copying them first.
+Each codec is created for a key type, which decides how the keys (elements and handles) are stored.
+Values of key-value trees are stored along with their buffer elements and leaf elements, either inline or as a reference into the value log."""
+import struct
+from current_implementation.buffer_element import BufferElement, Action, parse_line_into_buffer_element
+from current_implementation.constants_and_helpers import TRUE_STRING, FALSE_STRING, SEP, DUMMY_STRING
+from current_implementation.key_type import KEY_TYPES, StrKeyType
+from current_implementation.value_log import ValueReference
+
+
+# Text representation of values: 'v' followed by the hex of an inline value, or 'r' followed by 'offset:length' of a reference into the value log
+INLINE_VALUE_PREFIX = 'v'
+VALUE_REFERENCE_PREFIX = 'r'
+
+
+class TextCodec:
+    """ Buffer elements as 'element;timestamp;action' lines (followed by ';value' if they carry a value), leaf elements as lines
+        ('element;value' lines for key-value trees), node records as two ';'-joined lines."""
+    name = 'text'
+
+    def __init__(self, key_type):
+        self.key_type = key_type
+
+    def encode_buffer_elements(self, elements) -> bytes:
+        return ''.join(f'{self.key_type.to_text(element.element)}{SEP}{element.timestamp}{SEP}{element.action}{self.encode_optional_value(element.value)}\n' for element in elements).encode()
+
+    def decode_buffer_elements(self, data: bytes) -> list:
+        # Only '\n' ends a line, as in iterate_buffer_elements. Every line ends with one, so the last piece is empty
+        lines = str(data, 'utf-8').split('\n')[:-1]
+        return [self.parse_line(f'{line}\n') for line in lines]
+
+    def iterate_buffer_elements(self, file_reader):
+        # Reads line by line, so the file_reader is never advanced past the last element handed out
+        for line in file_reader:
+            yield self.parse_line(line.decode())
+
+    def parse_line(self, line):
+        value = None
+        rest, last_field = line.rstrip('\n').rsplit(SEP, 1)
+        if last_field[:1] in (INLINE_VALUE_PREFIX, VALUE_REFERENCE_PREFIX):
+            # Actions are never one of the value prefixes
+            line = f'{rest}\n'
+            value = value_from_text(last_field)
+        buffer_element = parse_line_into_buffer_element(line)
+        buffer_element.element = self.key_type.from_text(buffer_element.element)
+        buffer_element.value = value
+        return buffer_element
+
+    @staticmethod
+    def encode_optional_value(value):
+        return '' if value is None else f'{SEP}{value_to_text(value)}'
+
+    def encode_leaf_elements(self, elements) -> bytes:
+        return ''.join(f'{self.key_type.to_text(element)}\n' for element in elements).encode()
+
+    def decode_leaf_elements(self, data: bytes) -> list:
+        return [self.key_type.from_text(line) for line in str(data, 'utf-8').splitlines()]
+
+    def encode_leaf_entries(self, elements, values) -> bytes:
+        return ''.join(f'{self.key_type.to_text(element)}{SEP}{value_to_text(value)}\n' for element, value in zip(elements, values)).encode()
+
+    def decode_leaf_entries(self, data: bytes):
+        """ Returns the list of elements and the list of their values."""
+        elements, values = [], []
+        for line in str(data, 'utf-8').splitlines():
+            # Values never contain a separator, keys might
+            element, value = line.rsplit(SEP, 1)
+            elements.append(self.key_type.from_text(element))
+            values.append(value_from_text(value))
+        return elements, values
+
+    def encode_node(self, node) -> bytes:
+        is_internal_string = TRUE_STRING if node.is_internal_node() else FALSE_STRING
+        handles = [handle if handle == DUMMY_STRING else self.key_type.to_text(handle) for handle in node.handles]
+        first_line_raw = [is_internal_string, len(handles), *handles, len(node.children_ids), *node.children_ids, len(node.buffer_block_ids), *node.buffer_block_ids, node.last_buffer_size]
+        # Second line will just be parent_id, the third one the Bloom filter of a leaf node (empty if it has none)
+        first_line_output_string = SEP.join(str(elem) for elem in first_line_raw)
+        bloom_filter = '' if node.bloom_filter is None else node.bloom_filter.to_bytes().hex()
+        return f'{first_line_output_string}\n{node.parent_id}\n{bloom_filter}\n'.encode()
+
+    def decode_node(self, data: bytes):
+        """ Returns (is_internal_node, handles, children_ids, buffer_block_ids, last_buffer_size, parent_id, bloom_filter), the Bloom filter as bytes or None."""
+        rows = str(data, 'utf-8').split('\n')
+        data = rows[0].split(SEP)
+
+        is_internal_node = data[0] == TRUE_STRING
+
+        index = 2
+        num_handles = int(data[1])
+        handles = [handle if handle == DUMMY_STRING else self.key_type.from_text(handle) for handle in data[index:index + num_handles]]
+        index += num_handles
+
+        num_children = int(data[index])
+        children_ids = data[index + 1: index + 1 + num_children]
+        index += 1 + num_children
+
+        num_buffer_blocks = int(data[index])
+        buffer_block_ids = data[index + 1: index + 1 + num_buffer_blocks]
+        index += 1 + num_buffer_blocks
+
+        last_buffer_size = int(data[index])
+
+        parent_id = rows[1]
+        if parent_id == 'None':
+            parent_id = None
+
+        bloom_filter = bytes.fromhex(rows[2]) if len(rows) > 2 and rows[2] else None
+
+        return is_internal_node, handles, children_ids, buffer_block_ids, last_buffer_size, parent_id, bloom_filter
+
+
+def value_to_text(value):
+    if isinstance(value, ValueReference):
+        return f'{VALUE_REFERENCE_PREFIX}{value.offset}:{value.length}'
+    return f'{INLINE_VALUE_PREFIX}{value.hex()}'
+
+
+def value_from_text(text):
+    if text[0] == VALUE_REFERENCE_PREFIX:
+        offset, length = text[1:].split(':')
+        return ValueReference(int(offset), int(length))
+    return bytes.fromhex(text[1:])
+
+
+# Buffer element: timestamp (float64), action (1 byte), value tag (1 byte), key length (only for keys of variable size), key, value (depending on the tag)
+BUFFER_ELEMENT_HEADER = struct.Struct('<dcBH')
+FIXED_SIZE_BUFFER_ELEMENT_HEADER = struct.Struct('<dcB')
+# Value tags. An inline value is preceded by its length, a value in the value log is stored as its reference (offset, length)
+NO_VALUE, INLINE_VALUE, LOGGED_VALUE = 0, 1, 2
+VALUE_TAG = struct.Struct('<B')
+VALUE_LENGTH = struct.Struct('<I')
+VALUE_REFERENCE = struct.Struct('<QI')
+# Leaf block of a key-value tree: amount of elements, elements, then the value tag and value of each element
+AMOUNT_LEAF_ENTRIES = struct.Struct('<I')
+# Leaf elements, handles and ids of variable size: length, string
+STRING_LENGTH = struct.Struct('<H')
+# Node record: is_internal_node, has_parent, num_handles, num_children, num_buffer_blocks, last_buffer_size
+NODE_HEADER = struct.Struct('<??HHHI')
+# Precedes every handle of a node record: whether it is a dummy handle (which isn't stored), since dummies aren't keys
+IS_DUMMY_HANDLE = struct.Struct('<?')
+MAX_STRING_BYTES = 2 ** 16 - 1
+
+ACTION_TO_BYTE = {action: action.value.encode() for action in Action}
+BYTE_TO_ACTION = {action_byte: action for action, action_byte in ACTION_TO_BYTE.items()}
+
+
+class BinaryCodec:
+    """ Length-prefixed strings, packed float64 timestamps and 1-byte actions, struct-packed node headers. All little-endian.
+        Keys of fixed size (integers) are stored without a length prefix."""
+    name = 'binary'
+
+    def __init__(self, key_type):
+        self.key_type = key_type
+
+    def encode_buffer_elements(self, elements) -> bytes:
+        output = bytearray()
+        to_bytes = self.key_type.to_bytes
+        for element in elements:
+            key = to_bytes(element.element)
+            value_tag = get_value_tag(element.value)
+            if self.key_type.fixed_size is None:
+                check_string_length(key)
+                output += BUFFER_ELEMENT_HEADER.pack(element.timestamp, ACTION_TO_BYTE[element.action], value_tag, len(key))
+            else:
+                output += FIXED_SIZE_BUFFER_ELEMENT_HEADER.pack(element.timestamp, ACTION_TO_BYTE[element.action], value_tag)
+            output += key
+            if value_tag != NO_VALUE:
+                output += encode_value(element.value)
+        return bytes(output)
+
+    def decode_buffer_elements(self, data: bytes) -> list:
+        elements = []
+        offset = 0
+        from_bytes = self.key_type.from_bytes
+        key_size = self.key_type.fixed_size
+        while offset < len(data):
+            if key_size is None:
+                timestamp, action_byte, value_tag, key_length = BUFFER_ELEMENT_HEADER.unpack_from(data, offset)
+                offset += BUFFER_ELEMENT_HEADER.size
+            else:
+                timestamp, action_byte, value_tag = FIXED_SIZE_BUFFER_ELEMENT_HEADER.unpack_from(data, offset)
+                offset += FIXED_SIZE_BUFFER_ELEMENT_HEADER.size
+                key_length = key_size
+            key = from_bytes(data[offset:offset + key_length])
+            value, offset = decode_value(value_tag, data, offset + key_length)
+            elements.append(BufferElement(key, BYTE_TO_ACTION[action_byte], timestamp, value))
+        return elements
+
+    def iterate_buffer_elements(self, file_reader):
+        # Reads exactly one element at a time, so the file_reader is never advanced past the last element handed out
+        key_size = self.key_type.fixed_size
+        header = BUFFER_ELEMENT_HEADER if key_size is None else FIXED_SIZE_BUFFER_ELEMENT_HEADER
+        while True:
+            header_data = file_reader.read(header.size)
+            if not header_data:
+                return
+            if key_size is None:
+                timestamp, action_byte, value_tag, key_length = header.unpack(header_data)
+            else:
+                timestamp, action_byte, value_tag = header.unpack(header_data)
+                key_length = key_size
+            key = self.key_type.from_bytes(file_reader.read(key_length))
+            yield BufferElement(key, BYTE_TO_ACTION[action_byte], timestamp, read_value(value_tag, file_reader))
+
+    def encode_leaf_elements(self, elements) -> bytes:
+        return self.encode_keys(elements)
+
+    def decode_leaf_elements(self, data: bytes) -> list:
+        elements, _ = self.decode_keys(data, 0, None)
+        return elements
+
+    def encode_leaf_entries(self, elements, values) -> bytes:
+        output = bytearray(AMOUNT_LEAF_ENTRIES.pack(len(elements)))
+        output += self.encode_keys(elements)
+        for value in values:
+            output += VALUE_TAG.pack(get_value_tag(value))
+            output += encode_value(value)
+        return bytes(output)
+
+    def decode_leaf_entries(self, data: bytes):
+        """ Returns the list of elements and the list of their values."""
+        (amount,) = AMOUNT_LEAF_ENTRIES.unpack_from(data, 0)
+        elements, offset = self.decode_keys(data, AMOUNT_LEAF_ENTRIES.size, amount)
+        values = []
+        for _ in range(amount):
+            (value_tag,) = VALUE_TAG.unpack_from(data, offset)
+            value, offset = decode_value(value_tag, data, offset + VALUE_TAG.size)
+            values.append(value)
+        return elements, values
+
+    def encode_node(self, node) -> bytes:
+        has_parent = node.parent_id is not None
+        header = NODE_HEADER.pack(node.is_internal_node(), has_parent, len(node.handles), len(node.children_ids), len(node.buffer_block_ids), node.last_buffer_size)
+        handles = bytearray()
+        for handle in node.handles:
+            is_dummy = handle == DUMMY_STRING
+            handles += IS_DUMMY_HANDLE.pack(is_dummy)
+            if not is_dummy:
+                handles += self.encode_keys([handle])
+        parent = [node.parent_id] if has_parent else []
+        # The Bloom filter of a leaf node takes up the rest of the record
+        bloom_filter = b'' if node.bloom_filter is None else node.bloom_filter.to_bytes()
+        return header + bytes(handles) + encode_strings([*node.children_ids, *node.buffer_block_ids, *parent]) + bloom_filter
+
+    def decode_node(self, data: bytes):
+        """ Returns (is_internal_node, handles, children_ids, buffer_block_ids, last_buffer_size, parent_id, bloom_filter), the Bloom filter as bytes or None."""
+        is_internal_node, has_parent, num_handles, num_children, num_buffer_blocks, last_buffer_size = NODE_HEADER.unpack_from(data, 0)
+        offset = NODE_HEADER.size
+        handles = []
+        for _ in range(num_handles):
+            (is_dummy,) = IS_DUMMY_HANDLE.unpack_from(data, offset)
+            offset += IS_DUMMY_HANDLE.size
+            if is_dummy:
+                handles.append(DUMMY_STRING)
+            else:
+                handle, offset = self.decode_keys(data, offset, 1)
+                handles.extend(handle)
+        children_ids, offset = decode_strings(data, offset, num_children)
+        buffer_block_ids, offset = decode_strings(data, offset, num_buffer_blocks)
+        if has_parent:
+            (parent_id,), offset = decode_strings(data, offset, 1)
+        else:
+            parent_id = None
+        bloom_filter = bytes(data[offset:]) if offset < len(data) else None
+
+        return is_internal_node, handles, children_ids, buffer_block_ids, last_buffer_size, parent_id, bloom_filter
+
+    def encode_keys(self, keys) -> bytes:
+        if self.key_type.fixed_size is None:
+            return encode_length_prefixed([self.key_type.to_bytes(key) for key in keys])
+        return b''.join(self.key_type.to_bytes(key) for key in keys)
+
+    def decode_keys(self, data: bytes, offset, amount):
+        # Decodes amount keys starting at offset (or all until the end, if amount is None). Returns the keys and the offset after them
+        key_size = self.key_type.fixed_size
+        if key_size is None:
+            return decode_length_prefixed(data, offset, amount, self.key_type.from_bytes)
+
+        if amount is None:
+            amount = (len(data) - offset) // key_size
+        end = offset + amount * key_size
+        return [self.key_type.from_bytes(data[start:start + key_size]) for start in range(offset, end, key_size)], end
+
+
+def get_value_tag(value):
+    if value is None:
+        return NO_VALUE
+    if isinstance(value, ValueReference):
+        return LOGGED_VALUE
+    return INLINE_VALUE
+
+
+def encode_value(value) -> bytes:
+    # Without its tag, nothing for no value
+    if value is None:
+        return b''
+    if isinstance(value, ValueReference):
+        return VALUE_REFERENCE.pack(*value)
+    return VALUE_LENGTH.pack(len(value)) + value
+
+
+def decode_value(value_tag, data: bytes, offset):
+    # Returns the value and the offset after it
+    if value_tag == NO_VALUE:
+        return None, offset
+    if value_tag == LOGGED_VALUE:
+        return ValueReference(*VALUE_REFERENCE.unpack_from(data, offset)), offset + VALUE_REFERENCE.size
+    (length,) = VALUE_LENGTH.unpack_from(data, offset)
+    offset += VALUE_LENGTH.size
+    return bytes(data[offset:offset + length]), offset + length
+
+
+def read_value(value_tag, file_reader):
+    if value_tag == NO_VALUE:
+        return None
+    if value_tag == LOGGED_VALUE:
+        return ValueReference(*VALUE_REFERENCE.unpack(file_reader.read(VALUE_REFERENCE.size)))
+    (length,) = VALUE_LENGTH.unpack(file_reader.read(VALUE_LENGTH.size))
+    return file_reader.read(length)
+
+
+def check_string_length(encoded: bytes):
+    if len(encoded) > MAX_STRING_BYTES:
+        raise ValueError(f"Binary storage supports strings of up to {MAX_STRING_BYTES} bytes, but got one with {len(encoded)} bytes")
+
+
+def encode_strings(strings) -> bytes:
+    return encode_length_prefixed([string.encode() for string in strings])
+
+
+def encode_length_prefixed(encoded_strings) -> bytes:
+    output = bytearray()
+    for encoded in encoded_strings:
+        check_string_length(encoded)
+        output += STRING_LENGTH.pack(len(encoded))
+        output += encoded
+    return bytes(output)
+
+
+def decode_strings(data: bytes, offset, amount):
+    # Decodes amount length-prefixed strings starting at offset (or all until the end, if amount is None). Returns the strings and the offset after them
+    return decode_length_prefixed(data, offset, amount, lambda encoded: str(encoded, 'utf-8'))
+
+
+def decode_length_prefixed(data: bytes, offset, amount, decode):
+    strings = []
+    while (amount is None and offset < len(data)) or (amount is not None and len(strings) < amount):
+        (length,) = STRING_LENGTH.unpack_from(data, offset)
+        offset += STRING_LENGTH.size
+        strings.append(decode(data[offset:offset + length]))
+        offset += length
+    return strings, offset
+
+
+STORAGE_CODEC_CLASSES = {codec.name: codec for codec in (TextCodec, BinaryCodec)}
+# Codecs for string keys
+STORAGE_CODECS = {name: codec(KEY_TYPES[StrKeyType.name]) for name, codec in STORAGE_CODEC_CLASSES.items()}
+
+
+def get_storage_codec_by_name(name, key_type=KEY_TYPES[StrKeyType.name]):
+    if name not in STORAGE_CODEC_CLASSES:
+        raise ValueError(f"Unknown storage codec {name}, available are {list(STORAGE_CODEC_CLASSES)}")
+    if key_type is KEY_TYPES[StrKeyType.name]:
+        return STORAGE_CODECS[name]
+    return STORAGE_CODEC_CLASSES[name](key_type)
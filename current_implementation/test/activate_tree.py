@@ -0,0 +1,9 @@
+from unittest import TestCase
+
+
+def activate_until_end_of_test(test_class: TestCase, tree):
+    # For tests calling node and block functions directly: Keeps the tree activated (see BufferTree.activate) until the test is cleaned up
+    activated_tree = tree.activate()
+    activated_tree.__enter__()
+    test_class.addCleanup(activated_tree.__exit__, None, None, None)
+    return tree
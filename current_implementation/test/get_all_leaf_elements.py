@@ -2,10 +2,10 @@ from current_implementation.new_buffer_tree import BufferTree, TreeNode, load_no
 
 
 def get_all_leaf_elements_in_sorted_list(buffer_tree: BufferTree) -> list:
-    root_node = load_node(buffer_tree.root_node_id)
     existing_elements_list = list()
-
-    traverse_nodes_and_extend_list(root_node, existing_elements_list)
+    with buffer_tree.activate():
+        root_node = load_node(buffer_tree.root_node_id)
+        traverse_nodes_and_extend_list(root_node, existing_elements_list)
 
     return existing_elements_list
 
@@ -6,8 +6,9 @@ already_found_node_ids = set()
 
 def assert_is_proper_tree(test_class: TestCase, tree: BufferTree):
     already_found_node_ids.clear()
-    root_node = load_node(tree.root_node_id)
-    is_proper_node(test_class, root_node)
+    with tree.activate():
+        root_node = load_node(tree.root_node_id)
+        is_proper_node(test_class, root_node)
 
 
 def is_proper_node(test_class: TestCase, node: TreeNode):
@@ -80,6 +81,14 @@ def is_proper_leaf_node(test_class, node: TreeNode):
         test_class.assertLess(leaf_elements_deque[0], right_split_key, f"Leaf block {leaf_id} has elements too big for parent split-key {right_split_key}\nParent: {node}")
         is_proper_leaf_block(test_class, leaf_elements_deque, leaf_id)
 
+    # Might the Bloom filter (if any) contain all elements of the leaf blocks?
+    if node.bloom_filter is not None:
+        key_type = get_tree_instance().key_type
+        for leaf_id in node.children_ids:
+            if leaf_id != DUMMY_STRING:
+                for element in read_leaf_block_elements_as_deque(leaf_id):
+                    test_class.assertTrue(node.bloom_filter.might_contain(key_type.to_bytes(element)), f"Bloom filter of leaf node {node.node_id} is missing element {element}")
+
 
 def is_proper_leaf_block(test_class, leaf_elements_deque, leaf_id):
     leaf_elements = list(leaf_elements_deque)
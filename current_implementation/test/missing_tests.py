@@ -21,7 +21,7 @@
 
 # TODO TreeNode:    identify_handles_and_split_keys_to_be_inserted
 
-# TODO TreeNode:    merge_sorted_buffer_with_leaf_blocks        Note: 2 already existing, but more edge cases plz
+# TODO TreeNode:    merge_sorted_buffer_deques_with_leaf_blocks Note: 2 already existing, but more edge cases plz
 
 # TODO TreeNode:    pass_elements_to_children (have 1)      Idea: Don't fill the last block. Also works?
 
@@ -2,6 +2,7 @@ import unittest
 from current_implementation.new_buffer_tree import *
 from current_implementation.create_comparable_string import create_string_from_int_biggest_number
 from current_implementation.test.is_proper_tree import assert_is_proper_tree
+from current_implementation.test.activate_tree import activate_until_end_of_test
 
 
 class JustThrowBigTestsAtTree(unittest.TestCase):
@@ -58,10 +59,9 @@ class JustThrowBigTestsAtTree(unittest.TestCase):
         self.assertEqual(0, len(root_node.handles))
         self.assertFalse(root_node.is_internal_node())
 
-    @staticmethod
-    def create_dummy_tree():
+    def create_dummy_tree(self):
         M = 2 * 4096
         B = 1024
         # m = 8
 
-        return BufferTree(M=M, B_buffer=B)
+        return activate_until_end_of_test(self, BufferTree(M=M, B_buffer=B))
@@ -0,0 +1,188 @@
+import os
+import random
+import unittest
+from current_implementation.new_buffer_tree import *
+from current_implementation.block_storage import PageFileStorage, create_block_storage, PAGE_HEADER, PREALLOCATED_PAGES
+from current_implementation.storage_codec import get_storage_codec_by_name
+from current_implementation.create_comparable_string import create_string_from_int_with_byte_size
+from current_implementation.test.is_proper_tree import assert_is_proper_tree
+from current_implementation.test.get_all_leaf_elements import get_all_leaf_elements_in_sorted_list
+from current_implementation.test.activate_tree import activate_until_end_of_test
+
+byte_size = 10
+
+
+class PageFileStorageTests(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+        self.storage = PageFileStorage(page_size=PAGE_HEADER.size + 16)
+
+    def tearDown(self):
+        self.storage.close()
+
+    def test_write_and_read_chains_over_several_pages(self):
+        first_id = self.storage.new_leaf_id()
+        second_id = self.storage.new_leaf_id()
+        self.storage.write_leaf_block(first_id, b'a' * 40)
+        self.storage.write_leaf_block(second_id, b'b' * 3)
+
+        self.assertEqual(b'a' * 40, self.storage.read_leaf_block(first_id))
+        self.assertEqual(b'b' * 3, self.storage.read_leaf_block(second_id))
+
+        # Shrinking a chain keeps its id and frees the pages not needed anymore
+        self.storage.write_leaf_block(first_id, b'c' * 5)
+        self.assertEqual(b'c' * 5, self.storage.read_leaf_block(first_id))
+        self.assertEqual(2, len(self.storage.free_page_ids))
+
+    def test_append_over_several_pages(self):
+        buffer_block_id = self.storage.new_buffer_block_id('1', 0)
+        expected = b''
+        for i in range(20):
+            data = bytes([i]) * random.randint(0, 30)
+            self.storage.append_to_buffer_block('1', buffer_block_id, data)
+            expected += data
+            self.assertEqual(expected, self.storage.read_buffer_block('1', buffer_block_id))
+
+        self.storage.write_buffer_block('1', buffer_block_id, b'x')
+        self.storage.append_to_buffer_block('1', buffer_block_id, b'yz' * 10)
+        self.assertEqual(b'x' + b'yz' * 10, self.storage.read_buffer_block('1', buffer_block_id))
+
+    def test_pages_of_deleted_chains_are_reused(self):
+        leaf_ids = [self.storage.new_leaf_id() for _ in range(10)]
+        for leaf_id in leaf_ids:
+            self.storage.write_leaf_block(leaf_id, b'z' * 30)
+        used_pages = self.storage.next_unused_page_id
+
+        for leaf_id in leaf_ids:
+            self.storage.delete_leaf_block(leaf_id)
+        for _ in range(10):
+            self.storage.write_leaf_block(self.storage.new_leaf_id(), b'z' * 30)
+
+        self.assertEqual(used_pages, self.storage.next_unused_page_id)
+        self.assertEqual([], self.storage.free_page_ids)
+
+    def test_stream_sorted_run(self):
+        sorted_id = self.storage.new_sorted_id('1')
+        lines = [f'line {i}\n'.encode() for i in range(50)]
+        for line in lines:
+            self.storage.append_to_sorted_run('1', sorted_id, line)
+
+        reference = self.storage.sorted_run_reference('1', sorted_id)
+        with self.storage.open_sorted_run(reference) as reader:
+            self.assertEqual(lines[0], reader.readline())
+            self.assertEqual(b''.join(lines[1:]), reader.read())
+        self.storage.delete_sorted_run(reference)
+        self.assertEqual(os.path.getsize(PAGE_FILE_PATH), self.storage.amount_pages * self.storage.page_size)
+
+    def test_single_page_reads_are_views_on_the_mapped_file(self):
+        leaf_id = self.storage.new_leaf_id()
+        codec = get_storage_codec_by_name('binary')
+        self.storage.write_leaf_block(leaf_id, codec.encode_leaf_elements(['ab', 'cd']))
+
+        data = self.storage.read_leaf_block(leaf_id)
+        self.assertIsInstance(data, memoryview)
+        self.assertEqual(['ab', 'cd'], codec.decode_leaf_elements(data))
+
+    def test_pages_stay_readable_when_file_grows(self):
+        leaf_ids = []
+        for i in range(3 * PREALLOCATED_PAGES):
+            leaf_id = self.storage.new_leaf_id()
+            self.storage.write_leaf_block(leaf_id, str(i).encode())
+            leaf_ids.append(leaf_id)
+
+        self.assertGreater(self.storage.amount_pages, 3 * PREALLOCATED_PAGES)
+        self.assertEqual([str(i).encode() for i in range(3 * PREALLOCATED_PAGES)], [bytes(self.storage.read_leaf_block(leaf_id)) for leaf_id in leaf_ids])
+
+    def test_invalid_storage_parameters(self):
+        with self.assertRaises(ValueError):
+            create_block_storage('tape')
+        with self.assertRaises(ValueError):
+            PageFileStorage(page_size=PAGE_HEADER.size)
+
+
+class DirectoryStorageTests(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+        self.storage = activate_until_end_of_test(self, BufferTree(B_buffer=41, M=349)).storage
+        self.storage.sync()
+
+    def test_sync_only_tracks_files_written_since_last_sync(self):
+        node_id = self.storage.new_node_id()
+        self.storage.write_node_record(node_id, b'node')
+        first_block_id = self.storage.new_buffer_block_id(node_id, 0)
+        second_block_id = self.storage.new_buffer_block_id(node_id, 1)
+        self.storage.write_buffer_block(node_id, first_block_id, b'first')
+        self.storage.append_to_buffer_block(node_id, second_block_id, b'second')
+        self.storage.delete_buffer_block(node_id, first_block_id)
+        leaf_id = self.storage.new_leaf_id()
+        self.storage.write_leaf_block(leaf_id, b'leaf')
+
+        node_dir_path = os.fspath(get_node_dir_path_from_id(node_id))
+        leaf_dir_path, leaf_file_name = os.path.split(get_leaf_file_path_from_id(leaf_id))
+        self.assertEqual({NODE_INFORMATION_FILE_STRING, os.path.basename(get_buffer_file_path_from_ids(node_id, second_block_id))},
+                         self.storage.written_files[node_dir_path])
+        self.assertEqual({leaf_file_name}, self.storage.written_files[leaf_dir_path])
+        self.assertEqual({node_dir_path, os.path.dirname(node_dir_path), leaf_dir_path}, self.storage.changed_dirs)
+
+        self.storage.sync()
+        self.assertEqual({}, self.storage.written_files)
+        self.assertEqual(set(), self.storage.changed_dirs)
+
+    def test_files_of_deleted_nodes_are_not_synced(self):
+        node_id = self.storage.new_node_id()
+        self.storage.write_node_record(node_id, b'node')
+        self.storage.delete_node(node_id)
+
+        node_dir_path = os.fspath(get_node_dir_path_from_id(node_id))
+        self.assertNotIn(node_dir_path, self.storage.written_files)
+        self.assertEqual({os.path.dirname(node_dir_path)}, self.storage.changed_dirs)
+        self.storage.sync()
+
+
+class PagedBufferTreeTests(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+
+    def test_insert_delete_and_query_with_paged_storage(self):
+        tree = self.create_buffer_tree()
+        existing_ints = set()
+        for _ in range(3):
+            for _ in range(1_000):
+                i = random.randint(1, 100_000)
+                existing_ints.add(i)
+                tree.insert_to_tree(create_string_from_int_with_byte_size(i, byte_size))
+            for i in random.sample(sorted(existing_ints), 300):
+                existing_ints.remove(i)
+                tree.delete_from_tree(create_string_from_int_with_byte_size(i, byte_size))
+
+        to_query = random.sample(range(1, 100_000), 200)
+        tree.query_batch([create_string_from_int_with_byte_size(i, byte_size) for i in to_query])
+        lo, hi = 20_000, 50_000
+        expected_range = [create_string_from_int_with_byte_size(i, byte_size) for i in sorted(existing_ints) if lo <= i <= hi]
+        self.assertEqual(expected_range, list(tree.range(create_string_from_int_with_byte_size(lo, byte_size), create_string_from_int_with_byte_size(hi, byte_size))))
+
+        tree.flush_all_buffers()
+        expected_answers = [(create_string_from_int_with_byte_size(i, byte_size), i in existing_ints) for i in to_query]
+        self.assertEqual(sorted(expected_answers), sorted(tree.pop_query_results()))
+        assert_is_proper_tree(self, tree)
+        expected = [create_string_from_int_with_byte_size(i, byte_size) for i in sorted(existing_ints)]
+        self.assertEqual(expected, get_all_leaf_elements_in_sorted_list(tree))
+        self.assertFalse(os.listdir(NODES_DIR))
+
+    def test_bulk_load_with_paged_storage(self):
+        tree = self.create_buffer_tree()
+        ints = [random.randint(1, 50_000) for _ in range(5 * tree.M)]
+        tree.bulk_load(create_string_from_int_with_byte_size(i, byte_size) for i in ints)
+
+        expected = [create_string_from_int_with_byte_size(i, byte_size) for i in sorted(set(ints))]
+        assert_is_proper_tree(self, tree)
+        self.assertEqual(expected, get_all_leaf_elements_in_sorted_list(tree))
+
+    @staticmethod
+    def create_buffer_tree():
+        buffer_tree = BufferTree(B_buffer=41, M=349, storage='paged', page_size=512)
+        # -> (a, b) = (2, 8)
+        return buffer_tree
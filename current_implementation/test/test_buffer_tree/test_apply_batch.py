@@ -0,0 +1,72 @@
+import random
+import unittest
+from current_implementation.new_buffer_tree import *
+from current_implementation.create_comparable_string import create_string_from_int_biggest_number
+from current_implementation.test.is_proper_tree import assert_is_proper_tree
+from current_implementation.test.get_all_leaf_elements import get_all_leaf_elements_in_sorted_list
+
+
+class ApplyBatchTests(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+
+    def test_same_tree_as_single_calls(self):
+        biggest_int = 20_000
+        key = lambda i: create_string_from_int_biggest_number(i, biggest_int)
+        operations = []
+        for _ in range(3):
+            operations.extend((key(i), Action.INSERT, str(i).encode()) for i in random.sample(range(biggest_int), 2_000))
+            operations.extend((key(i), Action.DELETE) for i in random.sample(range(biggest_int), 1_000))
+            operations.extend((key(i), Action.QUERY) for i in random.sample(range(biggest_int), 200))
+        random.shuffle(operations)
+
+        results = []
+        for batched in [False, True]:
+            tree = BufferTree(B_buffer=41, M=349, with_values=True)
+            if batched:
+                # Batches of odd sizes, so they don't line up with the buffer blocks
+                for start in range(0, len(operations), 97):
+                    tree.apply_batch(operations[start:start + 97])
+            else:
+                for operation in operations:
+                    if operation[1] == Action.INSERT:
+                        tree.insert_to_tree(operation[0], operation[2])
+                    elif operation[1] == Action.DELETE:
+                        tree.delete_from_tree(operation[0])
+                    else:
+                        tree.query_batch([operation[0]])
+            tree.flush_all_buffers()
+
+            assert_is_proper_tree(self, tree)
+            results.append((get_all_leaf_elements_in_sorted_list(tree), list(tree.pop_query_results()), list(tree.range_items(key(0), key(biggest_int)))))
+
+        self.assertEqual(results[0], results[1])
+
+    def test_timestamps_increase(self):
+        tree = BufferTree(B_buffer=41, M=349)
+        tree.insert_to_tree('a')
+        tree.apply_batch([('b', Action.INSERT), ('b', Action.DELETE), ('b', Action.INSERT)])
+        tree.delete_from_tree('a')
+        timestamps = [element.timestamp for element in tree.tree_buffer.get_elements()]
+        self.assertEqual(sorted(set(timestamps)), timestamps)
+
+    def test_insert_many(self):
+        tree = BufferTree(B_buffer=41, M=349, key_type=int)
+        tree.insert_many(range(1_000))
+        tree.flush_all_buffers()
+        self.assertEqual(list(range(1_000)), list(tree.range(0, 1_000)))
+
+        tree = BufferTree(B_buffer=41, M=349, key_type=int, with_values=True)
+        tree.insert_many(range(100), (str(i).encode() for i in range(100)))
+        tree.flush_all_buffers()
+        self.assertEqual([(i, str(i).encode()) for i in range(100)], list(tree.range_items(0, 100)))
+
+    def test_invalid_values(self):
+        tree = BufferTree(B_buffer=41, M=349, key_type=int)
+        with self.assertRaises(ValueError):
+            tree.apply_batch([(1, Action.INSERT, b'value')])
+        with self.assertRaises(ValueError):
+            tree.apply_batch([(1, Action.COMBINE, b'delta')])
+        with self.assertRaises(ValueError):
+            tree.insert_many(['not an int'])
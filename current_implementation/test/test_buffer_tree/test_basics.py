@@ -1,6 +1,9 @@
 import unittest
 from current_implementation.new_buffer_tree import *
 from current_implementation.create_comparable_string import create_string_from_int_biggest_number
+from current_implementation.test.get_all_leaf_elements import get_all_leaf_elements_in_sorted_list
+from benchmarking.TreeTrackingHandler import TrackingModeEnum
+from current_implementation.test.activate_tree import activate_until_end_of_test
 
 
 class BasicTreeTests(unittest.TestCase):
@@ -39,10 +42,38 @@ class BasicTreeTests(unittest.TestCase):
         self.assertEqual(1, len(root.buffer_block_ids))
         self.assertEqual(biggest_int, root.last_buffer_size)
 
-    @staticmethod
-    def create_dummy_tree():
+    def test_newest_root_buffer_block_stays_in_memory(self):
+        tree = activate_until_end_of_test(self, BufferTree(B_buffer=41, M=349))
+        tree.start_tracking_handler()
+        biggest_int = 10 * tree.B_buffer
+        elements = [create_string_from_int_biggest_number(i, biggest_int) for i in range(biggest_int)]
+
+        for element in elements[:tree.B_buffer]:
+            tree.insert_to_tree(element)
+        root_node = load_node(tree.root_node_id)
+        self.assertEqual((root_node.node_id, root_node.buffer_block_ids[0]), tree.pending_root_buffer_block[:2])
+        self.assertFalse(os.path.exists(get_buffer_file_path_from_ids(root_node.node_id, root_node.buffer_block_ids[0])))
+
+        # Pushing the next block writes the pending one
+        for element in elements[tree.B_buffer:2 * tree.B_buffer]:
+            tree.insert_to_tree(element)
+        root_node = load_node(tree.root_node_id)
+        self.assertTrue(os.path.exists(get_buffer_file_path_from_ids(root_node.node_id, root_node.buffer_block_ids[0])))
+        self.assertEqual(root_node.buffer_block_ids[1], tree.pending_root_buffer_block[1])
+
+        for element in elements[2 * tree.B_buffer:]:
+            tree.insert_to_tree(element)
+        tree.flush_all_buffers()
+        self.assertIsNone(tree.pending_root_buffer_block)
+        self.assertEqual(elements, get_all_leaf_elements_in_sorted_list(tree))
+
+        # Every pushed block that was emptied right away has neither been written nor read
+        totals = tree.tracking_handler.total_benchmarks[TrackingModeEnum.TREE_BUFFER_FULL]
+        self.assertLess(totals.io_calls[TrackingModeEnum.BUFFER_ELEMENT_WRITE], biggest_int)
+
+    def create_dummy_tree(self):
         M = 2 * 4096
         B = 1024
         # m = 8
 
-        return BufferTree(M=M, B_buffer=B)
+        return activate_until_end_of_test(self, BufferTree(M=M, B_buffer=B))
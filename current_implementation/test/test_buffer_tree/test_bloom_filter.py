@@ -0,0 +1,111 @@
+import random
+import unittest
+from current_implementation.new_buffer_tree import *
+from benchmarking.TreeTrackingHandler import TrackingModeEnum
+from current_implementation.bloom_filter import BloomFilter
+from current_implementation.create_comparable_string import create_string_from_int_biggest_number
+from current_implementation.key_type import get_key_type
+from current_implementation.storage_codec import get_storage_codec_by_name, STORAGE_CODEC_CLASSES
+from current_implementation.test.is_proper_tree import assert_is_proper_tree
+from current_implementation.test.get_all_leaf_elements import get_all_leaf_elements_in_sorted_list
+
+
+def get_all_leaf_nodes(tree):
+    nodes = [load_node(tree.root_node_id)]
+    leaf_nodes = []
+    while nodes:
+        node = nodes.pop()
+        if node.is_internal_node():
+            nodes.extend(load_node(child_id) for child_id in node.children_ids)
+        else:
+            leaf_nodes.append(node)
+    return leaf_nodes
+
+
+class BloomFilterTests(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+
+    def test_bloom_filter(self):
+        bloom_filter = BloomFilter.for_capacity(1_000, 10)
+        keys = [str(i).encode() for i in range(1_000)]
+        for key in keys[::2]:
+            bloom_filter.add(key)
+        self.assertTrue(all(bloom_filter.might_contain(key) for key in keys[::2]))
+        # About 1% false positives with 10 bits per key
+        self.assertLess(sum(bloom_filter.might_contain(key) for key in keys[1::2]), 50)
+
+        other_filter = BloomFilter.from_bytes(BloomFilter.for_capacity(1_000, 10).to_bytes())
+        other_filter.add(keys[1])
+        other_filter.union(bloom_filter)
+        self.assertTrue(all(other_filter.might_contain(key) for key in keys[:1] + keys[::2]))
+        with self.assertRaises(ValueError):
+            other_filter.union(BloomFilter.for_capacity(10, 10))
+
+    def test_bloom_filter_in_node_record(self):
+        bloom_filter = BloomFilter.for_capacity(100, 10)
+        bloom_filter.add(b'key')
+        node = TreeNode(is_internal_node=False, node_id='1', handles=['a'], children=['2', '3'], bloom_filter=bloom_filter)
+        for codec_name in STORAGE_CODEC_CLASSES:
+            codec = get_storage_codec_by_name(codec_name, get_key_type(str))
+            self.assertEqual(bloom_filter.to_bytes(), codec.decode_node(codec.encode_node(node))[-1])
+
+    def test_same_tree_as_without_filters(self):
+        biggest_int = 20_000
+        key = lambda i: create_string_from_int_biggest_number(i, biggest_int)
+        operations = []
+        for _ in range(3):
+            operations.extend((key(i), Action.INSERT, str(i).encode()) for i in random.sample(range(biggest_int), 3_000))
+            operations.extend((key(i), Action.DELETE) for i in random.sample(range(biggest_int), 2_000))
+            operations.extend((key(i), Action.QUERY) for i in random.sample(range(biggest_int), 500))
+        random.shuffle(operations)
+
+        results = []
+        for bits_per_key, codec, node_cache_size in [(0, 'binary', 0), (10, 'binary', 0), (2, 'text', 4)]:
+            tree = BufferTree(B_buffer=41, M=349, with_values=True, codec=codec, node_cache_size=node_cache_size, bloom_filter_bits_per_key=bits_per_key)
+            for start in range(0, len(operations), 100):
+                tree.apply_batch(operations[start:start + 100])
+            tree.flush_all_buffers()
+
+            assert_is_proper_tree(self, tree)
+            results.append((get_all_leaf_elements_in_sorted_list(tree), sorted(tree.pop_query_results()), list(tree.range_items(key(0), key(biggest_int)))))
+
+        for result in results[1:]:
+            self.assertEqual(results[0], result)
+
+    def test_absent_keys_stop_above_leaf_nodes(self):
+        buffered_elements = []
+        for bits_per_key in [0, 10]:
+            tree = BufferTree(B_buffer=41, M=349, key_type=int, bloom_filter_bits_per_key=bits_per_key)
+            tree.insert_many(range(0, 2_400, 2))
+            tree.flush_all_buffers()
+            # Fills the root buffer once, so it's emptied into the leaf nodes
+            tree.apply_batch((i, Action.DELETE) for i in range(1, 600, 2))
+            tree.query_batch(range(601, 690, 2))
+
+            with tree.activate():
+                leaf_nodes = get_all_leaf_nodes(tree)
+                self.assertGreater(len(leaf_nodes), 1)
+                buffered_elements.append(sum(len(read_buffer_block_elements(node.node_id, block_id)) for node in leaf_nodes for block_id in node.buffer_block_ids))
+            if bits_per_key:
+                self.assertGreater(len(list(tree.pop_query_results())), 20)
+            tree.flush_all_buffers()
+            self.assertEqual(list(range(0, 2_400, 2)), list(tree.range(0, 2_400)))
+
+        # Only false positives reach the leaf nodes. Halves of split leaf nodes with untouched leaf blocks keep the filter of the whole node, so there are a few more
+        self.assertGreater(buffered_elements[0], 300)
+        self.assertLess(buffered_elements[1], 50)
+
+    def test_splits_read_no_leaf_blocks(self):
+        tree = BufferTree(B_buffer=41, M=349, key_type=int, bloom_filter_bits_per_key=10)
+        tree.start_tracking_handler()
+        keys = random.sample(range(100_000), 5_000)
+        tree.insert_many(keys)
+        tree.flush_all_buffers()
+
+        totals = tree.tracking_handler.total_benchmarks
+        self.assertGreater(totals[TrackingModeEnum.NODE_SPLITTING].io_calls[TrackingModeEnum.NODE_WRITE], 0)
+        self.assertEqual(0, totals[TrackingModeEnum.NODE_SPLITTING].io_calls[TrackingModeEnum.LEAF_ELEMENT_READ])
+        assert_is_proper_tree(self, tree)
+        self.assertEqual(sorted(keys), list(tree.range(0, 100_000)))
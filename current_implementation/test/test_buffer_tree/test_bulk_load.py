@@ -0,0 +1,79 @@
+import random
+import unittest
+from current_implementation.new_buffer_tree import *
+from current_implementation.create_comparable_string import create_string_from_int_with_byte_size
+from current_implementation.test.is_proper_tree import assert_is_proper_tree
+from current_implementation.test.get_all_leaf_elements import get_all_leaf_elements_in_sorted_list
+
+byte_size = 10
+
+
+class BulkLoadTests(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+
+    def test_bulk_load_nothing(self):
+        tree = self.create_buffer_tree()
+        tree.bulk_load([])
+
+        assert_is_proper_tree(self, tree)
+        self.assertEqual([], get_all_leaf_elements_in_sorted_list(tree))
+
+    def test_bulk_load_into_single_leaf_node(self):
+        tree = self.create_buffer_tree()
+        elements = [create_string_from_int_with_byte_size(i, byte_size) for i in range(3 * tree.B_leaf + 5)]
+        tree.bulk_load(reversed(elements))
+
+        with tree.activate():
+            root_node = load_node(tree.root_node_id)
+        self.assertFalse(root_node.is_internal_node())
+        self.assertEqual(4, len(root_node.children_ids))
+        assert_is_proper_tree(self, tree)
+        self.assertEqual(elements, get_all_leaf_elements_in_sorted_list(tree))
+
+    def test_bulk_load_unsorted_with_duplicates(self):
+        tree = self.create_buffer_tree()
+        ints = [random.randint(1, 5_000) for _ in range(10 * tree.M)]
+        tree.bulk_load(create_string_from_int_with_byte_size(i, byte_size) for i in ints)
+
+        expected = [create_string_from_int_with_byte_size(i, byte_size) for i in sorted(set(ints))]
+        assert_is_proper_tree(self, tree)
+        self.assertEqual(expected, get_all_leaf_elements_in_sorted_list(tree))
+
+    def test_bulk_load_presorted_and_keep_using_tree(self):
+        tree = self.create_buffer_tree()
+        ints = list(range(0, 20_000, 2))
+        tree.bulk_load((create_string_from_int_with_byte_size(i, byte_size) for i in ints), presorted=True)
+        assert_is_proper_tree(self, tree)
+
+        existing_ints = set(ints)
+        for i in random.sample(range(20_000), 3_000):
+            if i in existing_ints:
+                tree.delete_from_tree(create_string_from_int_with_byte_size(i, byte_size))
+                existing_ints.remove(i)
+            else:
+                tree.insert_to_tree(create_string_from_int_with_byte_size(i, byte_size))
+                existing_ints.add(i)
+
+        tree.flush_all_buffers()
+        expected = [create_string_from_int_with_byte_size(i, byte_size) for i in sorted(existing_ints)]
+        assert_is_proper_tree(self, tree)
+        self.assertEqual(expected, get_all_leaf_elements_in_sorted_list(tree))
+
+    def test_bulk_load_presorted_input_that_is_not_sorted(self):
+        tree = self.create_buffer_tree()
+        with self.assertRaises(ValueError):
+            tree.bulk_load(['a', 'c', 'b'], presorted=True)
+
+    def test_bulk_load_into_non_empty_tree(self):
+        tree = self.create_buffer_tree()
+        tree.insert_to_tree('a')
+        with self.assertRaises(ValueError):
+            tree.bulk_load(['b'])
+
+    @staticmethod
+    def create_buffer_tree():
+        buffer_tree = BufferTree(B_buffer=41, M=349)
+        # -> (a, b) = (2, 8)
+        return buffer_tree
@@ -0,0 +1,59 @@
+import random
+import unittest
+from current_implementation.new_buffer_tree import *
+from current_implementation.test.is_proper_tree import assert_is_proper_tree
+from current_implementation.test.get_all_leaf_elements import get_all_leaf_elements_in_sorted_list
+
+
+def get_all_leaf_ids(tree):
+    nodes = [load_node(tree.root_node_id)]
+    leaf_ids = set()
+    while nodes:
+        node = nodes.pop()
+        if node.is_internal_node():
+            nodes.extend(load_node(child_id) for child_id in node.children_ids)
+        else:
+            leaf_ids.update(node.children_ids)
+    return leaf_ids
+
+
+class FenceKeyTests(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+
+    def test_untouched_leaf_blocks_are_kept(self):
+        tree = BufferTree(B_buffer=41, M=349, key_type=int)
+        tree.insert_many(range(0, 2_000))
+        tree.flush_all_buffers()
+        with tree.activate():
+            old_leaf_ids = get_all_leaf_ids(tree)
+
+        # Only appended keys, so just the last leaf blocks are rewritten
+        tree.insert_many(range(2_000, 2_100))
+        tree.flush_all_buffers()
+        assert_is_proper_tree(self, tree)
+        with tree.activate():
+            new_leaf_ids = get_all_leaf_ids(tree)
+        self.assertGreater(len(old_leaf_ids & new_leaf_ids), len(old_leaf_ids) // 2)
+        self.assertEqual(list(range(2_100)), list(tree.range(0, 3_000)))
+
+    def test_same_elements_as_rewriting_all_leaf_blocks(self):
+        biggest_int = 10_000
+        tree = BufferTree(B_buffer=41, M=349, key_type=int, with_values=True, bloom_filter_bits_per_key=4)
+        present = {}
+        for _ in range(4):
+            inserted = random.sample(range(biggest_int), 1_500)
+            deleted = random.sample(range(biggest_int), 800)
+            operations = [(i, Action.INSERT, str(i).encode()) for i in inserted] + [(i, Action.DELETE) for i in deleted]
+            tree.apply_batch(operations)
+            tree.flush_all_buffers()
+            for operation in operations:
+                if operation[1] == Action.INSERT:
+                    present[operation[0]] = operation[2]
+                else:
+                    present.pop(operation[0], None)
+
+            assert_is_proper_tree(self, tree)
+            self.assertEqual(sorted(present), get_all_leaf_elements_in_sorted_list(tree))
+            self.assertEqual(sorted(present.items()), list(tree.range_items(0, biggest_int)))
@@ -0,0 +1,119 @@
+import io
+import random
+import struct
+import unittest
+from current_implementation.new_buffer_tree import *
+from current_implementation.storage_codec import STORAGE_CODECS
+from current_implementation.value_log import ValueReference
+from current_implementation.create_comparable_string import create_string_from_int_biggest_number
+from current_implementation.test.is_proper_tree import assert_is_proper_tree
+from current_implementation.test.get_all_leaf_elements import get_all_leaf_elements_in_sorted_list
+from current_implementation.test.activate_tree import activate_until_end_of_test
+
+COUNTER = struct.Struct('<q')
+
+
+def add_counters(value, delta):
+    return COUNTER.pack(COUNTER.unpack(value)[0] + COUNTER.unpack(delta)[0])
+
+
+class KeyValueTests(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+
+    def test_values_round_trip(self):
+        elements = [BufferElement('a', Action.INSERT, value=b'v;\n'), BufferElement('b', Action.INSERT, value=b''),
+                    BufferElement('c', Action.INSERT, value=ValueReference(12, 300)), BufferElement('d', Action.DELETE)]
+        for codec in STORAGE_CODECS.values():
+            data = codec.encode_buffer_elements(elements)
+            self.assertEqual(elements, codec.decode_buffer_elements(data))
+            self.assertEqual(elements, list(codec.iterate_buffer_elements(io.BytesIO(data))))
+
+            keys, values = ['a', 'b', 'c'], [b'v;\n', b'', ValueReference(12, 300)]
+            self.assertEqual((keys, values), codec.decode_leaf_entries(codec.encode_leaf_entries(keys, values)))
+
+    def test_insert_overwrite_delete_and_query(self):
+        for codec in STORAGE_CODECS:
+            tree = BufferTree(B_buffer=41, M=349, codec=codec, with_values=True, value_log_threshold=16)
+            biggest_int = 20_000
+            key = lambda i: create_string_from_int_biggest_number(i, biggest_int)
+            # Every other value is too big to be stored inline
+            value = lambda i, version: f'{i}-{version}'.encode() * (1 + 10 * (i % 2))
+
+            expected = {}
+            for version in range(3):
+                for i in random.sample(range(biggest_int), 1_500):
+                    tree.insert_to_tree(key(i), value(i, version))
+                    expected[key(i)] = value(i, version)
+                for i in random.sample(range(biggest_int), 300):
+                    tree.delete_from_tree(key(i))
+                    expected.pop(key(i), None)
+            queried_ints = random.sample(range(biggest_int), 200)
+            tree.query_batch([key(i) for i in queried_ints])
+            tree.flush_all_buffers()
+
+            assert_is_proper_tree(self, tree)
+            self.assertEqual(sorted(expected), get_all_leaf_elements_in_sorted_list(tree))
+            expected_answers = [(key(i), key(i) in expected, expected.get(key(i))) for i in queried_ints]
+            self.assertEqual(sorted(expected_answers), sorted(tree.pop_query_results()))
+            self.assertEqual(sorted((k, v) for k, v in expected.items() if key(100) <= k <= key(5_000)), list(tree.range_items(key(100), key(5_000))))
+            self.assertGreater(tree.value_log.size, 0)
+
+    def test_values_only_with_value_trees(self):
+        tree = BufferTree(B_buffer=41, M=349)
+        with self.assertRaises(ValueError):
+            tree.insert_to_tree('a', b'value')
+        with self.assertRaises(ValueError):
+            tree.range_items('a', 'b')
+
+        tree = BufferTree(B_buffer=41, M=349, with_values=True)
+        with self.assertRaises(ValueError):
+            tree.insert_to_tree('a')
+        with self.assertRaises(ValueError):
+            tree.bulk_load(['a'])
+
+    def test_combine_counters(self):
+        for codec in STORAGE_CODECS:
+            tree = BufferTree(B_buffer=41, M=349, codec=codec, with_values=True, combine=add_counters)
+            biggest_int = 500
+            key = lambda i: create_string_from_int_biggest_number(i, biggest_int)
+
+            counters = {}
+            expected_answers = []
+            for _ in range(6_000):
+                i = random.randint(0, biggest_int)
+                operation = random.random()
+                if operation < 0.8:
+                    tree.combine_into_tree(key(i), COUNTER.pack(1))
+                    counters[i] = counters.get(i, 0) + 1
+                elif operation < 0.85:
+                    tree.insert_to_tree(key(i), COUNTER.pack(100))
+                    counters[i] = 100
+                elif operation < 0.9:
+                    tree.delete_from_tree(key(i))
+                    counters.pop(i, None)
+                else:
+                    tree.query_batch([key(i)])
+                    expected_answers.append((key(i), i in counters, COUNTER.pack(counters[i]) if i in counters else None))
+            tree.flush_all_buffers()
+
+            assert_is_proper_tree(self, tree)
+            self.assertEqual(sorted(expected_answers), sorted(tree.pop_query_results()))
+            self.assertEqual([(key(i), COUNTER.pack(counters[i])) for i in sorted(counters)], list(tree.range_items(key(0), key(biggest_int))))
+
+    def test_combinations_are_folded(self):
+        tree = activate_until_end_of_test(self, BufferTree(B_buffer=41, M=349, with_values=True, combine=add_counters))
+        query = BufferElement('a', Action.QUERY, timestamp=2.0)
+        elements = [BufferElement('a', Action.COMBINE, timestamp=0.0, value=COUNTER.pack(1)), BufferElement('a', Action.COMBINE, timestamp=1.0, value=COUNTER.pack(2)),
+                    query, BufferElement('a', Action.COMBINE, timestamp=3.0, value=COUNTER.pack(3))]
+        # The query can't be answered without the value before the first combination, so it stays between the folded combinations
+        expected = [BufferElement('a', Action.COMBINE, timestamp=1.0, value=COUNTER.pack(3)), query, BufferElement('a', Action.COMBINE, timestamp=3.0, value=COUNTER.pack(3))]
+        self.assertEqual(expected, TreeNode.annihilate_insertions_deletions_with_matching_timestamps(elements))
+
+        elements = [BufferElement('a', Action.INSERT, timestamp=0.0, value=COUNTER.pack(5)), BufferElement('a', Action.COMBINE, timestamp=1.0, value=COUNTER.pack(2)), query]
+        self.assertEqual([BufferElement('a', Action.INSERT, timestamp=1.0, value=COUNTER.pack(7))], TreeNode.annihilate_insertions_deletions_with_matching_timestamps(elements))
+        self.assertEqual([('a', True, COUNTER.pack(7))], list(tree.pop_query_results()))
+
+        with self.assertRaises(ValueError):
+            BufferTree(B_buffer=41, M=349, combine=add_counters)
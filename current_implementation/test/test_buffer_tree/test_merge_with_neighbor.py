@@ -1,6 +1,7 @@
 import unittest
 from current_implementation.new_buffer_tree import *
 from current_implementation.create_comparable_string import create_string_from_int_biggest_number, create_string_from_int_with_byte_size
+from current_implementation.test.activate_tree import activate_until_end_of_test
 
 
 class BasicTreeTests(unittest.TestCase):
@@ -187,10 +188,9 @@ class BasicTreeTests(unittest.TestCase):
         self.assertEqual(['X_Handle'], parent_node.handles)
 
 
-    @staticmethod
-    def create_dummy_tree():
+    def create_dummy_tree(self):
         M = 4 * 4096
         B = 1024
         # m = 16 -> (a, b) = (4, 16)
         # (s, t) = (3, 6)
-        return BufferTree(M=M, B_buffer=B)
+        return activate_until_end_of_test(self, BufferTree(M=M, B_buffer=B))
@@ -0,0 +1,82 @@
+import random
+import unittest
+from current_implementation.new_buffer_tree import *
+from current_implementation.node_cache import NodeCache
+from current_implementation.create_comparable_string import create_string_from_int_with_byte_size
+from current_implementation.test.is_proper_tree import assert_is_proper_tree
+from current_implementation.test.get_all_leaf_elements import get_all_leaf_elements_in_sorted_list
+from benchmarking.TreeTrackingHandler import TrackingModeEnum
+
+byte_size = 10
+
+
+class NodeCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+
+    def test_only_dirty_records_are_written_back_on_eviction(self):
+        written_back = []
+        cache = NodeCache(2, write_back=lambda node_id, record: written_back.append(node_id))
+        cache.put('1', (False, [], [], [], 0, None, None), is_dirty=True)
+        cache.put('2', (False, [], [], [], 0, None, None), is_dirty=False)
+        self.assertIsNotNone(cache.get('1'))
+        cache.put('3', (False, [], [], [], 0, None, None), is_dirty=False)
+        self.assertEqual([], written_back)
+
+        cache.put('4', (False, [], [], [], 0, None, None), is_dirty=False)
+        self.assertEqual(['1'], written_back)
+        self.assertIsNone(cache.get('1'))
+
+    def test_records_are_copied(self):
+        cache = NodeCache(2, write_back=lambda node_id, record: None)
+        handles = ['a']
+        cache.put('1', (True, handles, ['2', '3'], [], 0, None, None), is_dirty=True)
+        handles.append('b')
+        record = cache.get('1')
+        record[2].append('4')
+
+        self.assertEqual((True, ['a'], ['2', '3'], [], 0, None, None), cache.get('1'))
+
+    def test_discarded_and_flushed_records_are_not_written_again(self):
+        written_back = []
+        cache = NodeCache(2, write_back=lambda node_id, record: written_back.append(node_id))
+        cache.put('1', (False, [], [], [], 0, None, None), is_dirty=True)
+        cache.put('2', (False, [], [], [], 0, None, None), is_dirty=True)
+        cache.discard('1')
+        cache.flush()
+        cache.flush()
+        self.assertEqual(['2'], written_back)
+
+    def test_tree_with_node_cache(self):
+        tree = BufferTree(B_buffer=41, M=349, node_cache_size=8)
+        tree.start_tracking_handler()
+        existing_ints = set()
+        for _ in range(3):
+            for _ in range(1_000):
+                i = random.randint(1, 100_000)
+                existing_ints.add(i)
+                tree.insert_to_tree(create_string_from_int_with_byte_size(i, byte_size))
+            for i in random.sample(sorted(existing_ints), 300):
+                existing_ints.remove(i)
+                tree.delete_from_tree(create_string_from_int_with_byte_size(i, byte_size))
+        tree.flush_all_buffers()
+
+        assert_is_proper_tree(self, tree)
+        expected = [create_string_from_int_with_byte_size(i, byte_size) for i in sorted(existing_ints)]
+        self.assertEqual(expected, get_all_leaf_elements_in_sorted_list(tree))
+
+        totals = tree.tracking_handler.total_benchmarks
+        self.assertGreater(totals[TrackingModeEnum.NODE_CACHE_HIT].io_calls[TrackingModeEnum.NODE_CACHE_HIT], 0)
+        # Only misses read the node
+        self.assertEqual(totals[TrackingModeEnum.NODE_CACHE_MISS].io_calls[TrackingModeEnum.NODE_CACHE_MISS], totals[TrackingModeEnum.NODE_READ].io_calls[TrackingModeEnum.NODE_READ])
+
+        # After flushing, the records on disk are the same as the cached ones
+        with tree.activate():
+            for node_id, (record, is_dirty) in tree.node_cache.records.items():
+                self.assertFalse(is_dirty)
+                self.assertEqual(record, tree.codec.decode_node(tree.storage.read_node_record(node_id)))
+
+    def test_node_cache_bigger_than_internal_memory(self):
+        with self.assertRaises(ValueError):
+            BufferTree(B_buffer=41, M=349, node_cache_size=9)
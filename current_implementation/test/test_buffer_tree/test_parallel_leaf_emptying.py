@@ -0,0 +1,88 @@
+import random
+import threading
+import unittest
+from current_implementation.new_buffer_tree import *
+from current_implementation.create_comparable_string import create_string_from_int_biggest_number
+from current_implementation.test.is_proper_tree import assert_is_proper_tree
+from current_implementation.test.get_all_leaf_elements import get_all_leaf_elements_in_sorted_list
+
+
+class ParallelLeafEmptyingTests(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+
+    def test_same_tree_as_serial_emptying(self):
+        biggest_int = 30_000
+        key = lambda i: create_string_from_int_biggest_number(i, biggest_int)
+        operations = []
+        for _ in range(4):
+            operations.extend((Action.INSERT, i) for i in random.sample(range(biggest_int), 3_000))
+            operations.extend((Action.DELETE, i) for i in random.sample(range(biggest_int), 2_000))
+            operations.extend((Action.QUERY, i) for i in random.sample(range(biggest_int), 200))
+
+        results = []
+        for workers, prefetch_io in [(1, False), (4, False), (1, True), (4, True)]:
+            tree = BufferTree(B_buffer=41, M=349, with_values=True, leaf_emptying_workers=workers, prefetch_io=prefetch_io)
+            for action, i in operations:
+                if action == Action.INSERT:
+                    tree.insert_to_tree(key(i), str(i).encode())
+                elif action == Action.DELETE:
+                    tree.delete_from_tree(key(i))
+                else:
+                    tree.query_batch([key(i)])
+            tree.flush_all_buffers()
+
+            assert_is_proper_tree(self, tree)
+            results.append((get_all_leaf_elements_in_sorted_list(tree), sorted(tree.pop_query_results()), list(tree.range_items(key(0), key(biggest_int)))))
+
+        for result in results[1:]:
+            self.assertEqual(results[0], result)
+
+    def test_invalid_amount_of_workers(self):
+        with self.assertRaises(ValueError):
+            BufferTree(B_buffer=41, M=349, leaf_emptying_workers=0)
+        with self.assertRaises(ValueError):
+            BufferTree(B_buffer=41, M=349, storage='paged', leaf_emptying_workers=2)
+        with self.assertRaises(ValueError):
+            BufferTree(B_buffer=41, M=349, storage='paged', prefetch_io=True)
+
+    def test_read_ahead(self):
+        tree = BufferTree(B_buffer=41, M=349, prefetch_io=True)
+        self.assertEqual([1, 2, 3], list(iterate_with_read_ahead(iter([1, 2, 3]), tree.io_pool)))
+        self.assertEqual([], list(iterate_with_read_ahead(iter([]), tree.io_pool)))
+
+    def test_range_with_read_ahead(self):
+        biggest_int = 30_000
+        key = lambda i: create_string_from_int_biggest_number(i, biggest_int)
+        existing_ints = sorted(random.sample(range(biggest_int), 5_000))
+        tree = BufferTree(B_buffer=41, M=349, prefetch_io=True)
+        for i in existing_ints:
+            tree.insert_to_tree(key(i))
+
+        for _ in range(5):
+            lo, hi = sorted(random.sample(range(biggest_int), 2))
+            self.assertEqual([key(i) for i in existing_ints if lo <= i <= hi], list(tree.range(key(lo), key(hi))))
+        self.assertEqual([key(i) for i in existing_ints], list(tree.range(key(0), key(biggest_int))))
+
+    def test_queries_are_answered_on_the_calling_thread(self):
+        biggest_int = 30_000
+        key = lambda i: create_string_from_int_biggest_number(i, biggest_int)
+        for workers, prefetch_io in [(1, True), (4, False), (4, True)]:
+            tree = BufferTree(B_buffer=41, M=349, leaf_emptying_workers=workers, prefetch_io=prefetch_io)
+            existing_ints = set(random.sample(range(biggest_int), 3_000))
+            answering_threads = set()
+            answers = []
+
+            def callback(k, is_present):
+                answering_threads.add(threading.get_ident())
+                answers.append((k, is_present))
+
+            tree.insert_many(key(i) for i in existing_ints)
+            queried_ints = random.sample(range(biggest_int), 2_000)
+            tree.query_batch((key(i) for i in queried_ints), callback=callback)
+            tree.insert_many(key(i) for i in random.sample(range(biggest_int), 2_000))
+            tree.flush_all_buffers()
+
+            self.assertEqual({threading.get_ident()}, answering_threads)
+            self.assertEqual(sorted((key(i), i in existing_ints) for i in queried_ints), sorted(answers))
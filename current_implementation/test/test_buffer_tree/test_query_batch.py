@@ -0,0 +1,103 @@
+import random
+import unittest
+from current_implementation.new_buffer_tree import *
+from current_implementation.merge_sort import resolve_buffer_elements_of_same_element
+from current_implementation.create_comparable_string import create_string_from_int_with_byte_size
+from current_implementation.test.activate_tree import activate_until_end_of_test
+
+
+class QueryBatchTests(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+
+    def test_query_on_empty_tree(self):
+        tree = self.create_dummy_tree()
+        tree.query_batch(['some_key'])
+        self.assertEqual([], list(tree.pop_query_results()))
+
+        tree.flush_all_buffers()
+        self.assertEqual([('some_key', False)], list(tree.pop_query_results()))
+
+    def test_query_is_answered_by_older_update_in_same_buffer(self):
+        tree = self.create_dummy_tree()
+        tree.insert_to_tree('a')
+        tree.insert_to_tree('b')
+        tree.delete_from_tree('b')
+        tree.query_batch(['a', 'b'])
+        tree.flush_all_buffers()
+
+        self.assertEqual({('a', True), ('b', False)}, set(tree.pop_query_results()))
+
+    def test_query_does_not_see_newer_update(self):
+        tree = self.create_dummy_tree()
+        tree.query_batch(['a'])
+        tree.insert_to_tree('a')
+        tree.flush_all_buffers()
+
+        self.assertEqual([('a', False)], list(tree.pop_query_results()))
+        tree.query_batch(['a'])
+        tree.flush_all_buffers()
+        self.assertEqual([('a', True)], list(tree.pop_query_results()))
+
+    def test_queries_with_callback(self):
+        tree = self.create_dummy_tree()
+        answers = []
+        tree.insert_to_tree('x')
+        tree.query_batch(['x', 'y'], callback=lambda key, is_present: answers.append((key, is_present)))
+        tree.flush_all_buffers()
+
+        self.assertEqual({('x', True), ('y', False)}, set(answers))
+        self.assertEqual([], list(tree.pop_query_results()))
+
+    def test_callback_only_applies_to_its_batch(self):
+        tree = self.create_dummy_tree()
+        answers = []
+        tree.insert_to_tree('x')
+        tree.query_batch(['x'], callback=lambda key, is_present: answers.append((key, is_present)))
+        tree.query_batch(['x', 'z'])
+        tree.flush_all_buffers()
+
+        self.assertEqual([('x', True)], answers)
+        self.assertEqual({('x', True), ('z', False)}, set(tree.pop_query_results()))
+
+    def test_merge_answers_newer_query_with_older_update(self):
+        tree = self.create_dummy_tree()
+        older_insert = BufferElement('k', Action.INSERT, timestamp=1.0)
+        newer_query = BufferElement('k', Action.QUERY, timestamp=2.0)
+        oldest_query = BufferElement('k', Action.QUERY, timestamp=0.5)
+
+        output = resolve_buffer_elements_of_same_element([newer_query, oldest_query, older_insert])
+
+        self.assertEqual([oldest_query, older_insert], output)
+        self.assertEqual([('k', True)], list(tree.pop_query_results()))
+
+    def test_randomised_queries_in_bigger_tree(self):
+        tree = BufferTree(B_buffer=41, M=349)
+        byte_size = 10
+        present = set()
+        expected_answers = []
+        for _ in range(3):
+            to_insert = [random.randint(1, 5_000) for _ in range(1_000)]
+            for i in to_insert:
+                tree.insert_to_tree(create_string_from_int_with_byte_size(i, byte_size))
+                present.add(i)
+
+            to_delete = random.sample(sorted(present), 200)
+            for i in to_delete:
+                tree.delete_from_tree(create_string_from_int_with_byte_size(i, byte_size))
+                present.remove(i)
+
+            to_query = [random.randint(1, 5_000) for _ in range(300)]
+            tree.query_batch([create_string_from_int_with_byte_size(i, byte_size) for i in to_query])
+            expected_answers.extend((create_string_from_int_with_byte_size(i, byte_size), i in present) for i in to_query)
+
+        tree.flush_all_buffers()
+        self.assertEqual(sorted(expected_answers), sorted(tree.pop_query_results()))
+
+    def create_dummy_tree(self):
+        M = 2 * 4096
+        B = 1024
+        # m = 8
+
+        return activate_until_end_of_test(self, BufferTree(M=M, B_buffer=B))
@@ -0,0 +1,78 @@
+import random
+import unittest
+from current_implementation.new_buffer_tree import *
+from current_implementation.create_comparable_string import create_string_from_int_with_byte_size
+from current_implementation.test.is_proper_tree import assert_is_proper_tree
+from current_implementation.test.get_all_leaf_elements import get_all_leaf_elements_in_sorted_list
+
+byte_size = 10
+
+
+class RangeTests(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+
+    def test_range_on_empty_tree(self):
+        tree = self.create_buffer_tree()
+        self.assertEqual([], list(tree.range('a', 'z')))
+
+    def test_range_only_in_tree_buffer(self):
+        tree = self.create_buffer_tree()
+        for element in ['d', 'a', 'c', 'b', 'e']:
+            tree.insert_to_tree(element)
+        tree.delete_from_tree('c')
+
+        self.assertEqual(['b', 'd'], list(tree.range('b', 'd')))
+        self.assertEqual([], list(tree.range('d', 'b')))
+
+    def test_range_is_equal_to_filtered_tree_contents(self):
+        tree = self.create_buffer_tree()
+        existing_ints = set()
+        for _ in range(3):
+            for _ in range(1_000):
+                i = random.randint(1, 1_000_000)
+                existing_ints.add(i)
+                tree.insert_to_tree(create_string_from_int_with_byte_size(i, byte_size))
+            for i in random.sample(sorted(existing_ints), 200):
+                existing_ints.remove(i)
+                tree.delete_from_tree(create_string_from_int_with_byte_size(i, byte_size))
+
+        for _ in range(5):
+            lo, hi = sorted(random.sample(range(1, 1_000_000), 2))
+            expected = [create_string_from_int_with_byte_size(i, byte_size) for i in sorted(existing_ints) if lo <= i <= hi]
+            found = list(tree.range(create_string_from_int_with_byte_size(lo, byte_size), create_string_from_int_with_byte_size(hi, byte_size)))
+            self.assertEqual(expected, found)
+
+        assert_is_proper_tree(self, tree)
+        tree.flush_all_buffers()
+        expected_all = [create_string_from_int_with_byte_size(i, byte_size) for i in sorted(existing_ints)]
+        self.assertEqual(expected_all, get_all_leaf_elements_in_sorted_list(tree))
+
+    def test_range_leaves_other_buffers_alone(self):
+        tree = self.create_buffer_tree()
+        existing_ints = set()
+        for _ in range(3_000):
+            i = random.randint(1, 1_000_000)
+            existing_ints.add(i)
+            tree.insert_to_tree(create_string_from_int_with_byte_size(i, byte_size))
+
+        lo, hi = 1, 100_000
+        expected = [create_string_from_int_with_byte_size(i, byte_size) for i in sorted(existing_ints) if lo <= i <= hi]
+        found = list(tree.range(create_string_from_int_with_byte_size(lo, byte_size), create_string_from_int_with_byte_size(hi, byte_size)))
+        self.assertEqual(expected, found)
+        with tree.activate():
+            self.assertTrue(self.some_node_has_buffer_elements(load_node(tree.root_node_id)))
+
+    def some_node_has_buffer_elements(self, node):
+        if node.has_buffer_elements():
+            return True
+        if node.is_internal_node():
+            return any(self.some_node_has_buffer_elements(load_node(child_id)) for child_id in node.children_ids)
+        return False
+
+    @staticmethod
+    def create_buffer_tree():
+        buffer_tree = BufferTree(B_buffer=41, M=349)
+        # -> (a, b) = (2, 8)
+        return buffer_tree
@@ -0,0 +1,159 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from current_implementation.new_buffer_tree import *
+from current_implementation.write_ahead_log import LOG_HEADER
+from current_implementation.create_comparable_string import create_string_from_int_biggest_number
+from current_implementation.test.is_proper_tree import assert_is_proper_tree
+
+
+class ReopenTests(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+        self.log_dir = tempfile.mkdtemp()
+        self.log_path = os.path.join(self.log_dir, 'write_ahead_log')
+
+    def tearDown(self):
+        shutil.rmtree(self.log_dir, ignore_errors=True)
+
+    def test_reopen_after_checkpoint(self):
+        biggest_int = 10_000
+        key = lambda i: create_string_from_int_biggest_number(i, biggest_int)
+        for storage in ['directory', 'paged']:
+            ints = random.sample(range(biggest_int), 3_000)
+            tree = BufferTree(B_buffer=41, M=349, storage=storage, with_values=True, value_log_threshold=4)
+            for i in ints:
+                tree.insert_to_tree(key(i), str(i).encode())
+            tree.checkpoint()
+            tree.close()
+
+            tree = BufferTree.open()
+            self.assertEqual(storage, tree.parameters['storage'])
+            assert_is_proper_tree(self, tree)
+            self.assertEqual([(key(i), str(i).encode()) for i in sorted(ints)], list(tree.range_items(key(0), key(biggest_int))))
+
+            # The reopened tree keeps working like the original one
+            more_ints = random.sample(range(biggest_int), 1_000)
+            for i in more_ints:
+                tree.insert_to_tree(key(i), str(i).encode())
+            tree.flush_all_buffers()
+            assert_is_proper_tree(self, tree)
+            self.assertEqual([key(i) for i in sorted(set(ints) | set(more_ints))], list(tree.range(key(0), key(biggest_int))))
+            tree.close()
+
+    def test_operations_after_checkpoint_are_replayed(self):
+        tree = BufferTree(B_buffer=41, M=349, key_type=int, write_ahead_log_path=self.log_path)
+        tree.insert_many(range(1_000))
+        tree.checkpoint()
+        # Fewer elements than fit into the tree buffer, so the tree files don't change
+        tree.insert_many(range(1_000, 1_010))
+        tree.delete_from_tree(0)
+        tree.close()
+
+        tree = BufferTree.open()
+        tree.flush_all_buffers()
+        self.assertEqual(list(range(1, 1_010)), list(tree.range(0, 2_000)))
+
+    def test_changed_tree_is_recovered_from_checkpoint_and_log(self):
+        for storage in ['directory', 'paged']:
+            tree = BufferTree(B_buffer=41, M=349, key_type=int, storage=storage, write_ahead_log_path=self.log_path)
+            tree.insert_many(range(1_000))
+            tree.checkpoint()
+            # Only the operations after the checkpoint are left in the log
+            self.assertEqual(LOG_HEADER.size, tree.write_ahead_log.size())
+            tree.apply_batch((i, Action.DELETE) for i in range(0, 1_000, 2))
+            tree.insert_many(range(1_000, 2_000))
+            tree.flush_all_buffers()
+            tree.close()
+
+            tree = BufferTree.open()
+            assert_is_proper_tree(self, tree)
+            tree.flush_all_buffers()
+            self.assertEqual(list(range(1, 1_000, 2)) + list(range(1_000, 2_000)), list(tree.range(0, 2_000)))
+            tree.close()
+            os.remove(self.log_path)
+
+    def test_changed_tree_is_rolled_back_to_checkpoint(self):
+        for storage in ['directory', 'paged']:
+            tree = BufferTree(B_buffer=41, M=349, key_type=int, storage=storage, with_values=True)
+            tree.insert_many(range(1_000), (str(i).encode() for i in range(1_000)))
+            tree.checkpoint()
+            tree.insert_many(range(500, 2_000), (b'changed' for _ in range(1_500)))
+            tree.apply_batch((i, Action.DELETE) for i in range(0, 500, 2))
+            tree.flush_all_buffers()
+            tree.close()
+
+            # Without a write-ahead log, everything after the checkpoint is lost. The tree keeps working from the checkpoint on
+            for _ in range(2):
+                tree = BufferTree.open()
+                assert_is_proper_tree(self, tree)
+                self.assertEqual([(i, str(i).encode()) for i in range(1_000)], list(tree.range_items(0, 2_000)))
+                tree.insert_many(range(3_000, 4_000), (b'again' for _ in range(1_000)))
+                tree.flush_all_buffers()
+                assert_is_proper_tree(self, tree)
+                tree.close()
+
+            tree = BufferTree.open()
+            tree.insert_many(range(3_000, 4_000), (b'again' for _ in range(1_000)))
+            tree.checkpoint()
+            tree.close()
+            tree = BufferTree.open()
+            self.assertEqual([(i, str(i).encode()) for i in range(1_000)] + [(i, b'again') for i in range(3_000, 4_000)], list(tree.range_items(0, 5_000)))
+            tree.close()
+
+    def test_log_of_checkpoint_before_is_replayed_from_checkpoint(self):
+        # The tree stopped after writing the manifest of the checkpoint, but before the log was replaced
+        tree = BufferTree(B_buffer=41, M=349, key_type=int, write_ahead_log_path=self.log_path)
+        tree.insert_many(range(100))
+        tree.write_ahead_log.start_after_checkpoint = lambda checkpoint_number: None
+        tree.checkpoint()
+        tree.insert_many(range(100, 110))
+        tree.close()
+
+        tree = BufferTree.open()
+        tree.flush_all_buffers()
+        self.assertEqual(list(range(110)), list(tree.range(0, 200)))
+
+    def test_tree_stopping_before_first_checkpoint_is_recovered(self):
+        tree = BufferTree(B_buffer=41, M=349, key_type=int, write_ahead_log_path=self.log_path)
+        tree.insert_many(range(1_000))
+        tree.write_ahead_log.sync()
+        # The tree stops without closing it
+        tree = BufferTree.open()
+        assert_is_proper_tree(self, tree)
+        tree.flush_all_buffers()
+        self.assertEqual(list(range(1_000)), list(tree.range(0, 2_000)))
+        tree.close()
+
+    def test_new_tree_on_log_after_checkpoint_is_refused(self):
+        tree = BufferTree(B_buffer=41, M=349, key_type=int, write_ahead_log_path=self.log_path)
+        tree.insert_many(range(100))
+        tree.checkpoint()
+        tree.insert_many(range(100, 110))
+        tree.close()
+
+        with self.assertRaises(ValueError):
+            BufferTree(B_buffer=41, M=349, key_type=int, write_ahead_log_path=self.log_path)
+        # The files of the tree are left as they are
+        tree = BufferTree.open()
+        tree.flush_all_buffers()
+        self.assertEqual(list(range(110)), list(tree.range(0, 200)))
+        tree.close()
+
+    def test_invalid_reopening(self):
+        with self.assertRaises(ValueError):
+            BufferTree.open()
+
+        tree = BufferTree(B_buffer=41, M=349, key_type=int)
+        tree.checkpoint()
+        with self.assertRaises(ValueError):
+            BufferTree.open(key_type='str')
+
+        tree = BufferTree.open(node_cache_size=4)
+        tree.insert_many(range(1_000))
+        tree.close()
+        # The tree changed after the checkpoint, but still opens at the checkpoint
+        self.assertEqual([], list(BufferTree.open().range(0, 1_000)))
@@ -0,0 +1,65 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from current_implementation.new_buffer_tree import *
+from current_implementation.create_comparable_string import create_string_from_int_biggest_number
+from current_implementation.test.is_proper_tree import assert_is_proper_tree
+from current_implementation.test.get_all_leaf_elements import get_all_leaf_elements_in_sorted_list
+
+
+class SeveralTreesTests(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+        self.resource_dirs = [tempfile.mkdtemp() for _ in range(3)]
+        self.trees = []
+
+    def tearDown(self):
+        for tree in self.trees:
+            tree.close()
+        for resource_dir in self.resource_dirs:
+            shutil.rmtree(resource_dir, ignore_errors=True)
+
+    def test_interleaved_trees(self):
+        biggest_int = 10_000
+        key = lambda i: create_string_from_int_biggest_number(i, biggest_int)
+        trees = self.trees = [BufferTree(B_buffer=41, M=349, resource_dir=resource_dir) for resource_dir in self.resource_dirs]
+        expected = [set() for _ in trees]
+        for _ in range(6_000):
+            index = random.randrange(len(trees))
+            i = random.randint(0, biggest_int)
+            if random.random() < 0.8:
+                trees[index].insert_to_tree(key(i))
+                expected[index].add(i)
+            else:
+                trees[index].delete_from_tree(key(i))
+                expected[index].discard(i)
+
+        for tree, expected_ints, resource_dir in zip(trees, expected, self.resource_dirs):
+            tree.flush_all_buffers()
+            self.assertEqual([key(i) for i in sorted(expected_ints)], list(tree.range(key(0), key(biggest_int))))
+            with tree.activate():
+                assert_is_proper_tree(self, tree)
+                self.assertEqual([key(i) for i in sorted(expected_ints)], get_all_leaf_elements_in_sorted_list(tree))
+            self.assertTrue(os.listdir(os.path.join(resource_dir, 'leaves_collection')))
+
+    def test_trees_in_threads(self):
+        biggest_int = 10_000
+        key = lambda i: create_string_from_int_biggest_number(i, biggest_int)
+        trees = self.trees = [BufferTree(B_buffer=41, M=349, resource_dir=resource_dir, storage='paged') for resource_dir in self.resource_dirs]
+        ints = [random.sample(range(biggest_int), 2_000) for _ in trees]
+
+        def fill(tree, tree_ints):
+            for i in tree_ints:
+                tree.insert_to_tree(key(i))
+            tree.flush_all_buffers()
+
+        with ThreadPoolExecutor(len(trees)) as executor:
+            for future in [executor.submit(fill, tree, tree_ints) for tree, tree_ints in zip(trees, ints)]:
+                future.result()
+
+        for tree, tree_ints in zip(trees, ints):
+            self.assertEqual([key(i) for i in sorted(tree_ints)], list(tree.range(key(0), key(biggest_int))))
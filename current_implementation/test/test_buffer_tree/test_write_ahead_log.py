@@ -0,0 +1,112 @@
+import os
+import random
+import shutil
+import struct
+import tempfile
+import time
+import unittest
+from current_implementation.new_buffer_tree import *
+from current_implementation.create_comparable_string import create_string_from_int_biggest_number
+
+COUNTER = struct.Struct('<q')
+
+
+def add_counters(value, delta):
+    return COUNTER.pack(COUNTER.unpack(value)[0] + COUNTER.unpack(delta)[0])
+
+
+class WriteAheadLogTests(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+        self.log_dir = tempfile.mkdtemp()
+        self.log_path = os.path.join(self.log_dir, 'write_ahead_log')
+
+    def tearDown(self):
+        shutil.rmtree(self.log_dir, ignore_errors=True)
+
+    def test_recovery_replays_log(self):
+        biggest_int = 10_000
+        key = lambda i: create_string_from_int_biggest_number(i, biggest_int)
+        ints = random.sample(range(biggest_int), 2_000)
+        to_delete = set(random.sample(ints, 500))
+
+        tree = BufferTree(B_buffer=41, M=349, write_ahead_log_path=self.log_path, group_commit_records=1)
+        for i in ints:
+            tree.insert_to_tree(key(i))
+        tree.apply_batch((key(i), Action.DELETE) for i in to_delete)
+        tree.query_batch([key(0)])
+
+        # The tree files get deleted by the new tree, only the log is left
+        recovered_tree = BufferTree(B_buffer=41, M=349, write_ahead_log_path=self.log_path)
+        recovered_tree.flush_all_buffers()
+        self.assertEqual([key(i) for i in sorted(set(ints) - to_delete)], list(recovered_tree.range(key(0), key(biggest_int))))
+
+    def test_recovery_with_values(self):
+        tree = BufferTree(B_buffer=41, M=349, key_type=int, with_values=True, combine=add_counters, value_log_threshold=4, write_ahead_log_path=self.log_path)
+        for i in range(300):
+            tree.combine_into_tree(i % 30, COUNTER.pack(1))
+        tree.insert_to_tree(0, b'inserted value')
+        tree.close()
+
+        recovered_tree = BufferTree(B_buffer=41, M=349, key_type=int, with_values=True, combine=add_counters, value_log_threshold=4, write_ahead_log_path=self.log_path)
+        recovered_tree.flush_all_buffers()
+        self.assertEqual([(0, b'inserted value')] + [(i, COUNTER.pack(10)) for i in range(1, 30)], list(recovered_tree.range_items(0, 30)))
+
+    def test_torn_record_is_dropped(self):
+        tree = BufferTree(B_buffer=41, M=349, key_type=int, write_ahead_log_path=self.log_path)
+        tree.insert_many(range(10))
+        tree.close()
+        with open(self.log_path, 'ab') as f:
+            f.write(b'\x20\x00\x00\x00torn')
+
+        tree = BufferTree(B_buffer=41, M=349, key_type=int, write_ahead_log_path=self.log_path)
+        tree.insert_to_tree(10)
+        tree.close()
+
+        recovered_tree = BufferTree(B_buffer=41, M=349, key_type=int, write_ahead_log_path=self.log_path)
+        recovered_tree.flush_all_buffers()
+        self.assertEqual(list(range(11)), list(recovered_tree.range(0, 100)))
+
+    def test_recovery_streams_records(self):
+        log = WriteAheadLog(self.log_path, get_key_type(int))
+        for i in range(10):
+            log.append(i, Action.INSERT)
+        log.close()
+
+        log = WriteAheadLog(self.log_path, get_key_type(int))
+        records = log.recover()
+        self.assertEqual((0, Action.INSERT, None), next(records))
+        self.assertEqual([(i, Action.INSERT, None) for i in range(1, 10)], list(records))
+        log.close()
+
+    def test_group_commit(self):
+        tree = BufferTree(B_buffer=41, M=349, key_type=int, write_ahead_log_path=self.log_path, group_commit_records=5, group_commit_interval=60)
+        for i in range(4):
+            tree.insert_to_tree(i)
+        self.assertEqual(4, tree.write_ahead_log.pending_records)
+        tree.delete_from_tree(0)
+        self.assertEqual(0, tree.write_ahead_log.pending_records)
+        tree.query_batch([1])
+        self.assertEqual(0, tree.write_ahead_log.pending_records)
+
+        with self.assertRaises(ValueError):
+            BufferTree(B_buffer=41, M=349, write_ahead_log_path=self.log_path, group_commit_records=0)
+
+    def test_group_commit_after_interval(self):
+        tree = BufferTree(B_buffer=41, M=349, key_type=int, write_ahead_log_path=self.log_path, group_commit_interval=0.05)
+        # Synced by the flusher thread, without any further record
+        tree.insert_to_tree(0)
+        time.sleep(0.5)
+        self.assertEqual(0, tree.write_ahead_log.pending_records)
+        tree.close()
+
+    def test_checkpoint(self):
+        for storage in ['directory', 'paged']:
+            tree = BufferTree(B_buffer=41, M=349, key_type=int, storage=storage, with_values=True, write_ahead_log_path=self.log_path)
+            tree.insert_many(range(500), (bytes(100) for _ in range(500)))
+            tree.checkpoint()
+            self.assertEqual(0, tree.write_ahead_log.pending_records)
+            self.assertEqual([(i, bytes(100)) for i in range(500)], list(tree.range_items(0, 500)))
+            tree.close()
+            os.remove(self.log_path)
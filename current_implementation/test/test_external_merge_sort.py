@@ -1,8 +1,8 @@
 from current_implementation.new_buffer_tree import *
 from current_implementation.merge_sort import *
-from collections import deque
 from current_implementation.create_comparable_string import create_string_from_int_biggest_number
 import unittest
+from current_implementation.test.activate_tree import activate_until_end_of_test
 
 
 class TestExternalMergeSort(unittest.TestCase):
@@ -22,23 +22,29 @@ class TestExternalMergeSort(unittest.TestCase):
         second = BufferElement(element, action, timestamp)
         self.assertEqual(first, second, "Buffer Elements are not comparable apparently")
 
-    def test_merge_two_deques_stop_when_one_is_empty_no_duplicates(self):
-        left_deque = deque()
-        right_deque = deque()
+    def test_iterate_k_way_merge_no_duplicates(self):
+        node_id = self.leaf_node.node_id
+        left_elements = []
+        right_elements = []
 
         for i in range(self.max_elem_in_memory):
             new_buffer_element = BufferElement(create_string_from_int_biggest_number(i, self.max_elem_in_memory), Action.INSERT)
             if i % 2 == 0:
-                left_deque.append(new_buffer_element)
+                left_elements.append(new_buffer_element)
             else:
-                right_deque.append(new_buffer_element)
+                right_elements.append(new_buffer_element)
 
-        self.assert_ascending_buffer_elements(left_deque)
-        self.assert_ascending_buffer_elements(right_deque)
+        self.assert_ascending_buffer_elements(left_elements)
+        self.assert_ascending_buffer_elements(right_elements)
 
-        merged_until_one_is_empty = merge_sort_stop_when_one_is_empty(left_deque, right_deque)
-        self.assertTrue(not left_deque or not right_deque)
-        self.assert_ascending_buffer_elements(merged_until_one_is_empty)
+        sorted_ids = [get_new_sorted_id(), get_new_sorted_id()]
+        append_to_sorted_buffer_elements_file(node_id, sorted_ids[0], left_elements)
+        append_to_sorted_buffer_elements_file(node_id, sorted_ids[1], right_elements)
+        # Small blocks, so each file is read several times
+        merged = list(iterate_k_way_merge(node_id, sorted_ids, self.max_elem_in_memory // 16))
+        self.assert_ascending_buffer_elements(merged)
+        self.assertEqual(sorted(left_elements + right_elements, key=lambda buffer_element: buffer_element.element), merged)
+        self.assertFalse(any(os.path.exists(get_sorted_file_path_from_ids(node_id, sorted_id)) for sorted_id in sorted_ids))
 
     def test_append_to_empty_sorted_file(self):
         sorted_file_elements = []
@@ -69,8 +75,7 @@ class TestExternalMergeSort(unittest.TestCase):
         first_sorted_id, second_sorted_id = get_new_sorted_id(), get_new_sorted_id()
         append_to_sorted_buffer_elements_file(node_id, first_sorted_id, first_file_elements)
         append_to_sorted_buffer_elements_file(node_id, second_sorted_id, second_file_elements)
-        new_sorted_id = external_merge_sort_buffer_elements_two_files(node_id, first_sorted_id, second_sorted_id, self.max_elem_in_memory)
-        sorted_file_path = get_sorted_file_path_from_ids(node_id, new_sorted_id)
+        sorted_file_path = external_merge_sort_buffer_elements_many_files(node_id, [first_sorted_id, second_sorted_id], self.max_elem_in_memory)
         reloaded_elements = read_buffer_elements_from_file_path(sorted_file_path)
         self.assertEqual(combined, reloaded_elements)
 
@@ -108,16 +113,47 @@ class TestExternalMergeSort(unittest.TestCase):
         reloaded_elements = read_buffer_elements_from_file_path(new_sorted_file_path)
         self.assertEqual(reloaded_elements, all_elements)
 
-    # TODO Write tests with duplicates once BufferElement-timestamps are fixed
+    def test_external_merge_sort_many_files_in_one_pass(self):
+        node_id = self.leaf_node.node_id
+        amount_files = 7
+        biggest_int = 3000
+
+        sorted_ids = [get_new_sorted_id() for _ in range(amount_files)]
+        all_elements = []
+        for file_index, sorted_id in enumerate(sorted_ids):
+            file_elements = [BufferElement(create_string_from_int_biggest_number(i, biggest_int), Action.INSERT) for i in range(file_index, biggest_int, amount_files)]
+            all_elements.extend(file_elements)
+            append_to_sorted_buffer_elements_file(node_id, sorted_id, file_elements)
+
+        merged_file_path = external_merge_sort_buffer_elements_many_files(node_id, sorted_ids, self.max_elem_in_memory, fan_in=amount_files)
+        self.assertEqual(sorted(all_elements, key=lambda buffer_element: buffer_element.element), read_buffer_elements_from_file_path(merged_file_path))
+        # Only the merged run is left
+        self.assertEqual([os.path.basename(merged_file_path)], [file_name for file_name in os.listdir(os.path.dirname(merged_file_path)) if file_name.startswith(SORTED_STRING)])
+
+    def test_external_merge_sort_duplicates_newest_wins_and_queries_are_answered(self):
+        node_id = self.leaf_node.node_id
+        runs = [
+            [BufferElement('a', Action.INSERT, 1.0), BufferElement('b', Action.QUERY, 1.0), BufferElement('c', Action.DELETE, 3.0)],
+            [BufferElement('a', Action.DELETE, 2.0), BufferElement('b', Action.QUERY, 2.0), BufferElement('b', Action.INSERT, 4.0), BufferElement('c', Action.QUERY, 4.0)],
+            [BufferElement('a', Action.QUERY, 3.0), BufferElement('b', Action.QUERY, 5.0), BufferElement('c', Action.INSERT, 2.0)],
+        ]
+        sorted_ids = [get_new_sorted_id() for _ in runs]
+        for sorted_id, run in zip(sorted_ids, runs):
+            append_to_sorted_buffer_elements_file(node_id, sorted_id, run)
+
+        merged_file_path = external_merge_sort_buffer_elements_many_files(node_id, sorted_ids, self.max_elem_in_memory, fan_in=2)
+
+        expected = [BufferElement('a', Action.DELETE, 2.0), BufferElement('b', Action.QUERY, 1.0), BufferElement('b', Action.QUERY, 2.0), BufferElement('b', Action.INSERT, 4.0), BufferElement('c', Action.DELETE, 3.0)]
+        self.assertEqual(expected, read_buffer_elements_from_file_path(merged_file_path))
+        self.assertEqual({('a', False), ('b', True), ('c', False)}, set(self.tree.pop_query_results()))
 
 
 
-    @staticmethod
-    def create_dummy_tree():
+    def create_dummy_tree(self):
         M = 2 * 4096
         B = 1024
 
-        return BufferTree(M=M, B_buffer=B)
+        return activate_until_end_of_test(self, BufferTree(M=M, B_buffer=B))
 
     def assert_ascending_buffer_elements(self, buffer_elements):
         last_element = None
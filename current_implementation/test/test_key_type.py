@@ -0,0 +1,77 @@
+import io
+import random
+import unittest
+from current_implementation.new_buffer_tree import *
+from current_implementation.key_type import KEY_TYPES, get_key_type
+from current_implementation.storage_codec import STORAGE_CODEC_CLASSES, get_storage_codec_by_name
+from current_implementation.create_comparable_string import create_string_from_int_with_byte_size
+from current_implementation.test.is_proper_tree import assert_is_proper_tree
+from current_implementation.test.get_all_leaf_elements import get_all_leaf_elements_in_sorted_list
+
+KEYS_OF_TYPE = {
+    'str': ['a', 'bä', 'c'],
+    'int': [-2 ** 63, 0, 2 ** 63 - 1],
+    'bytes': [b'', b'\x00;\n', b'\xff'],
+}
+
+
+class KeyTypeTests(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+
+    def test_round_trips_for_all_key_types_and_codecs(self):
+        for key_type_name, keys in KEYS_OF_TYPE.items():
+            for codec_name in STORAGE_CODEC_CLASSES:
+                codec = get_storage_codec_by_name(codec_name, get_key_type(key_type_name))
+
+                elements = [BufferElement(key, action, timestamp=1.5) for key, action in zip(keys, [Action.INSERT, Action.DELETE, Action.QUERY])]
+                data = codec.encode_buffer_elements(elements)
+                self.assertEqual(elements, codec.decode_buffer_elements(data))
+                self.assertEqual(elements, list(codec.iterate_buffer_elements(io.BytesIO(data))))
+
+                self.assertEqual(keys, codec.decode_leaf_elements(codec.encode_leaf_elements(keys)))
+
+                node = TreeNode(is_internal_node=False, node_id='1', handles=[keys[0], keys[2], DUMMY_STRING], children=['2', '3', '4', DUMMY_STRING], buffer_block_ids=['1'], last_buffer_size=3, parent_id='5')
+                self.assertEqual((False, node.handles, node.children_ids, ['1'], 3, '5', None), codec.decode_node(codec.encode_node(node)))
+
+    def test_integer_keys_are_stored_with_fixed_size(self):
+        codec = get_storage_codec_by_name('binary', get_key_type(int))
+        self.assertEqual(8 * 100, len(codec.encode_leaf_elements(range(100))))
+        with self.assertRaises(ValueError):
+            codec.encode_leaf_elements([2 ** 63])
+
+    def test_wrong_keys_are_rejected(self):
+        tree = BufferTree(B_buffer=41, M=349, key_type=int)
+        for key in ['1', 1.0, True, b'1']:
+            with self.assertRaises(ValueError):
+                tree.insert_to_tree(key)
+        with self.assertRaises(ValueError):
+            BufferTree(B_buffer=41, M=349, key_type='float')
+
+    def test_trees_with_typed_keys(self):
+        ints = [random.randint(-50_000, 50_000) for _ in range(3_000)]
+        to_delete = set(random.sample(ints, 500))
+        expected_ints = sorted(set(ints) - to_delete)
+        to_key = {
+            'int': lambda i: i,
+            'bytes': lambda i: (i + 2 ** 31).to_bytes(4, 'big'),
+            'str': lambda i: create_string_from_int_with_byte_size(i + 50_000, 10),
+        }
+
+        for key_type_name in KEY_TYPES:
+            for codec_name in STORAGE_CODEC_CLASSES:
+                clean_up_and_initialize_resource_directories()
+                tree = BufferTree(B_buffer=41, M=349, codec=codec_name, key_type=key_type_name)
+                key = to_key[key_type_name]
+                for i in ints:
+                    tree.insert_to_tree(key(i))
+                for i in to_delete:
+                    tree.delete_from_tree(key(i))
+                tree.query_batch([key(i) for i in ints[:100]])
+                tree.flush_all_buffers()
+
+                assert_is_proper_tree(self, tree)
+                self.assertEqual([key(i) for i in expected_ints], get_all_leaf_elements_in_sorted_list(tree))
+                self.assertEqual(sorted((key(i), i not in to_delete) for i in ints[:100]), sorted(tree.pop_query_results()))
+                self.assertEqual([key(i) for i in expected_ints if -100 <= i <= 100], list(tree.range(key(-100), key(100))))
@@ -1,6 +1,7 @@
 from current_implementation.new_buffer_tree import *
 from current_implementation.create_comparable_string import create_string_from_int_biggest_number
 import unittest
+from current_implementation.test.activate_tree import activate_until_end_of_test
 
 
 class TestTreeBuffer(unittest.TestCase):
@@ -65,9 +66,8 @@ class TestTreeBuffer(unittest.TestCase):
 
 
 
-    @staticmethod
-    def create_dummy_tree():
+    def create_dummy_tree(self):
         M = 2 * 4096
         B = 1024
 
-        return BufferTree(M=M, B_buffer=B)
+        return activate_until_end_of_test(self, BufferTree(M=M, B_buffer=B))
@@ -0,0 +1,99 @@
+import os
+import random
+import shutil
+import struct
+import tempfile
+import unittest
+from current_implementation.new_buffer_tree import *
+from current_implementation.sharded_buffer_tree import ShardedBufferTree
+from current_implementation.create_comparable_string import create_string_from_int_biggest_number
+
+COUNTER = struct.Struct('<q')
+
+
+def add_counters(value, delta):
+    return COUNTER.pack(COUNTER.unpack(value)[0] + COUNTER.unpack(delta)[0])
+
+
+class ShardedBufferTreeTests(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+
+    def test_hash_and_range_partitioning(self):
+        biggest_int = 20_000
+        key = lambda i: create_string_from_int_biggest_number(i, biggest_int)
+        ints = random.sample(range(biggest_int), 5_000)
+        to_delete = set(random.sample(ints, 1_000))
+        queried_ints = random.sample(range(biggest_int), 100)
+
+        for partitioning, split_keys in [('hash', None), ('range', [key(5_000), key(10_000), key(15_000)])]:
+            with ShardedBufferTree(4, resource_dir=os.path.join(RESOURCES_DIR, partitioning), partitioning=partitioning, split_keys=split_keys,
+                                   batch_size=300, B_buffer=41, M=349) as tree:
+                for i in ints:
+                    tree.insert_to_tree(key(i))
+                for i in to_delete:
+                    tree.delete_from_tree(key(i))
+                tree.query_batch([key(i) for i in queried_ints])
+                tree.flush_all_buffers()
+
+                expected_ints = sorted(set(ints) - to_delete)
+                self.assertEqual([key(i) for i in expected_ints], tree.range(key(0), key(biggest_int)))
+                self.assertEqual([key(i) for i in expected_ints if 4_000 <= i <= 11_000], tree.range(key(4_000), key(11_000)))
+                self.assertEqual(sorted((key(i), i in ints and i not in to_delete) for i in queried_ints), sorted(tree.pop_query_results()))
+
+    def test_shards_with_values(self):
+        with ShardedBufferTree(3, B_buffer=41, M=349, key_type=int, with_values=True, combine=add_counters) as tree:
+            for i in range(1_000):
+                tree.combine_into_tree(i % 100, COUNTER.pack(1))
+            self.assertEqual([(i, COUNTER.pack(10)) for i in range(100)], tree.range_items(0, 100))
+
+    def test_errors_of_shards_are_raised(self):
+        with ShardedBufferTree(2, B_buffer=41, M=349) as tree:
+            with self.assertRaises(ValueError):
+                tree.insert_to_tree(1)
+            with self.assertRaises(ValueError):
+                tree.range_items('a', 'b')
+        with self.assertRaises(ValueError):
+            ShardedBufferTree(2, partitioning='range', split_keys=[], B_buffer=41, M=349)
+
+    def test_failed_batch_fails_all_later_calls(self):
+        with self.assertRaises(ValueError):
+            with ShardedBufferTree(1, B_buffer=41, M=349, key_type=int, with_values=True, batch_size=10) as tree:
+                # The shard's tree has no combine function, so the first batch fails
+                for i in range(10):
+                    tree.combine_into_tree(i, COUNTER.pack(1))
+                for i in range(10, 20):
+                    tree.insert_to_tree(i, COUNTER.pack(1))
+                with self.assertRaisesRegex(ValueError, 'batch 1'):
+                    tree.flush_all_buffers()
+                with self.assertRaisesRegex(ValueError, 'batch 1'):
+                    tree.range(0, 100)
+                with self.assertRaisesRegex(ValueError, 'batch 1'):
+                    tree.insert_to_tree(30, COUNTER.pack(1))
+
+    def test_close_ships_pending_batches(self):
+        tree = ShardedBufferTree(1, B_buffer=41, M=349, key_type=int, with_values=True)
+        tree.combine_into_tree(1, COUNTER.pack(1))
+        # Only shipped on close, where applying it fails
+        with self.assertRaisesRegex(ValueError, 'batch 1'):
+            tree.close()
+
+        # Leaving the block by an exception drops the pending batch instead
+        with self.assertRaisesRegex(KeyError, 'leave'):
+            with ShardedBufferTree(1, B_buffer=41, M=349, key_type=int, with_values=True) as tree:
+                tree.combine_into_tree(1, COUNTER.pack(1))
+                raise KeyError('leave')
+
+    def test_each_shard_has_its_own_write_ahead_log(self):
+        log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, log_dir, ignore_errors=True)
+        log_path = os.path.join(log_dir, 'write_ahead_log')
+        with ShardedBufferTree(3, B_buffer=41, M=349, key_type=int, write_ahead_log_path=log_path) as tree:
+            for i in range(300):
+                tree.insert_to_tree(i)
+        self.assertEqual(sorted(f'write_ahead_log.shard_{i}' for i in range(3)), sorted(os.listdir(log_dir)))
+
+        # The tree files get deleted by the new shards, each recovers its own keys from its log
+        with ShardedBufferTree(3, B_buffer=41, M=349, key_type=int, write_ahead_log_path=log_path) as tree:
+            self.assertEqual(list(range(300)), tree.range(0, 300))
@@ -1,6 +1,7 @@
 import unittest
 from current_implementation.new_buffer_tree import *
 from current_implementation.create_comparable_string import create_string_from_int_biggest_number
+from current_implementation.test.activate_tree import activate_until_end_of_test
 
 
 class TestTreeNodeSplit(unittest.TestCase):
@@ -49,10 +50,9 @@ class TestTreeNodeSplit(unittest.TestCase):
         self.assertEqual([], reloaded_old_root_node.handles)
         self.assertEqual(None, reloaded_old_root_node.parent_id)
 
-    @staticmethod
-    def create_dummy_tree():
+    def create_dummy_tree(self):
         M = 2 * 4096
         B = 1024
         # m = 8
 
-        return BufferTree(M=M, B_buffer=B)
\ No newline at end of file
+        return activate_until_end_of_test(self, BufferTree(M=M, B_buffer=B))
\ No newline at end of file
@@ -0,0 +1,76 @@
+import io
+import random
+import unittest
+from itertools import islice
+from current_implementation.new_buffer_tree import *
+from current_implementation.storage_codec import STORAGE_CODECS, get_storage_codec_by_name
+from current_implementation.create_comparable_string import create_string_from_int_with_byte_size
+from current_implementation.test.is_proper_tree import assert_is_proper_tree
+from current_implementation.test.get_all_leaf_elements import get_all_leaf_elements_in_sorted_list
+
+
+class StorageCodecTests(unittest.TestCase):
+
+    def setUp(self):
+        clean_up_and_initialize_resource_directories()
+
+    def test_buffer_elements_round_trip(self):
+        # Keys may contain line boundaries other than '\n'
+        elements = [BufferElement('a', Action.INSERT), BufferElement('bä', Action.DELETE), BufferElement('c', Action.QUERY, timestamp=1.5),
+                    BufferElement('d\re', Action.INSERT), BufferElement('f\x1cg\u2028', Action.DELETE)]
+        for codec in STORAGE_CODECS.values():
+            data = codec.encode_buffer_elements(elements)
+            self.assertEqual(elements, codec.decode_buffer_elements(data))
+            self.assertEqual(elements, list(codec.iterate_buffer_elements(io.BytesIO(data))))
+            self.assertEqual(elements, codec.decode_buffer_elements(memoryview(data)))
+
+    def test_iterating_buffer_elements_does_not_read_ahead(self):
+        first_elements = [BufferElement('a', Action.INSERT), BufferElement('b', Action.DELETE)]
+        second_elements = [BufferElement('c', Action.INSERT)]
+        for codec in STORAGE_CODECS.values():
+            file_reader = io.BytesIO(codec.encode_buffer_elements(first_elements + second_elements))
+            self.assertEqual(first_elements[:1], list(islice(codec.iterate_buffer_elements(file_reader), 1)))
+            self.assertEqual(first_elements[1:] + second_elements, list(codec.iterate_buffer_elements(file_reader)))
+
+    def test_leaf_elements_round_trip(self):
+        elements = ['a', 'b', 'some element']
+        for codec in STORAGE_CODECS.values():
+            self.assertEqual(elements, codec.decode_leaf_elements(codec.encode_leaf_elements(elements)))
+            self.assertEqual([], codec.decode_leaf_elements(codec.encode_leaf_elements([])))
+
+    def test_node_round_trip(self):
+        nodes = [
+            TreeNode(is_internal_node=True, node_id='1', handles=['b', 'd'], children=['2', '3', '4'], buffer_block_ids=['1', '2'], last_buffer_size=17, parent_id='5'),
+            TreeNode(is_internal_node=False, node_id='6', handles=[], children=[], buffer_block_ids=[], last_buffer_size=0, parent_id=None)
+        ]
+        for codec in STORAGE_CODECS.values():
+            for node in nodes:
+                decoded = codec.decode_node(codec.encode_node(node))
+                self.assertEqual((node.is_internal_node(), node.handles, node.children_ids, node.buffer_block_ids, node.last_buffer_size, node.parent_id, None), decoded)
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            get_storage_codec_by_name('csv')
+        with self.assertRaises(ValueError):
+            BufferTree(B_buffer=41, M=349, codec='csv')
+
+    def test_binary_codec_rejects_too_long_elements(self):
+        with self.assertRaises(ValueError):
+            get_storage_codec_by_name('binary').encode_leaf_elements(['a' * 2 ** 16])
+
+    def test_trees_with_both_codecs_hold_the_same_elements(self):
+        ints = [random.randint(1, 100_000) for _ in range(3_000)]
+        to_delete = set(random.sample(ints, 500))
+        expected = [create_string_from_int_with_byte_size(i, 10) for i in sorted(set(ints) - to_delete)]
+
+        for codec_name in STORAGE_CODECS:
+            clean_up_and_initialize_resource_directories()
+            tree = BufferTree(B_buffer=41, M=349, codec=codec_name)
+            for i in ints:
+                tree.insert_to_tree(create_string_from_int_with_byte_size(i, 10))
+            for i in to_delete:
+                tree.delete_from_tree(create_string_from_int_with_byte_size(i, 10))
+            tree.flush_all_buffers()
+
+            assert_is_proper_tree(self, tree)
+            self.assertEqual(expected, get_all_leaf_elements_in_sorted_list(tree))
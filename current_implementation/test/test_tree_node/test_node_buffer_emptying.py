@@ -1,6 +1,7 @@
 from current_implementation.new_buffer_tree import *
 from current_implementation.create_comparable_string import create_string_from_int_biggest_number
 import unittest
+from current_implementation.test.activate_tree import activate_until_end_of_test
 
 
 class TestNodeBufferEmptying(unittest.TestCase):
@@ -97,9 +98,8 @@ class TestNodeBufferEmptying(unittest.TestCase):
         reloaded_buffer_elements = reloaded_left_child.read_sort_and_remove_duplicates_from_buffer_files_with_read_size(tree.m)
         self.assertEqual(buffer_elements_sorted, reloaded_buffer_elements)
 
-    @staticmethod
-    def create_dummy_tree():
+    def create_dummy_tree(self):
         M = 2 * 4096
         B = 1024
 
-        return BufferTree(M=M, B_buffer=B)
+        return activate_until_end_of_test(self, BufferTree(M=M, B_buffer=B))
@@ -1,6 +1,7 @@
 from current_implementation.new_buffer_tree import *
 from current_implementation.create_comparable_string import create_string_from_int_biggest_number
 import unittest
+from current_implementation.test.activate_tree import activate_until_end_of_test
 
 
 class TestNodeBuffer(unittest.TestCase):
@@ -120,6 +121,7 @@ class TestNodeBuffer(unittest.TestCase):
                             'Buffer timestamps are not smaller than each other')
 
     def test_writing_and_reading_node_buffer_elements(self):
+        self.create_dummy_tree()
         node_id = generate_new_node_dir()
         buffer_block_id = 'some_block_id'
         original_buffer_elements = [BufferElement('SomeElement', Action.INSERT) for _ in range(100000)]
@@ -128,6 +130,7 @@ class TestNodeBuffer(unittest.TestCase):
         self.assertEqual(original_buffer_elements, reloaded_elements)
 
     def test_writing_and_reading_node_buffer_basic(self):
+        self.create_dummy_tree()
         fake_node = TreeNode(is_internal_node=False)
         elements = [BufferElement(str(i), Action.INSERT) for i in range(10)]
         buffer_block_id = fake_node.get_new_buffer_block_id()
@@ -135,9 +138,8 @@ class TestNodeBuffer(unittest.TestCase):
         reloaded_elements = read_buffer_block_elements(fake_node.node_id, buffer_block_id)
         self.assertEqual(elements, reloaded_elements)
 
-    @staticmethod
-    def create_dummy_tree():
+    def create_dummy_tree(self):
         M = 2 * 4096
         B = 1024
 
-        return BufferTree(M=M, B_buffer=B)
+        return activate_until_end_of_test(self, BufferTree(M=M, B_buffer=B))
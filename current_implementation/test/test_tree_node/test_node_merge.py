@@ -1,6 +1,7 @@
 import unittest
 from current_implementation.new_buffer_tree import *
 from current_implementation.create_comparable_string import create_string_from_int_biggest_number
+from current_implementation.test.activate_tree import activate_until_end_of_test
 
 
 class TestTreeNodeSplit(unittest.TestCase):
@@ -70,8 +71,7 @@ class TestTreeNodeSplit(unittest.TestCase):
         current_node = TreeNode(is_internal_node=False, handles=current_node_handles, children=current_node_children_ids, parent_id=tree.root_node_id)
         return current_node
 
-    @staticmethod
-    def create_dummy_tree():
+    def create_dummy_tree(self):
         M = 2 * 4096
         B = 512
         # b = m = 16
@@ -80,4 +80,4 @@ class TestTreeNodeSplit(unittest.TestCase):
         # t = 6
         # -> a + t + 1 = 11, with under 11 children on neighbor, we merge
 
-        return BufferTree(M=M, B_buffer=B)
+        return activate_until_end_of_test(self, BufferTree(M=M, B_buffer=B))
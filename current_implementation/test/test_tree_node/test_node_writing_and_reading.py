@@ -1,4 +1,5 @@
 from current_implementation.new_buffer_tree import *
+from current_implementation.test.activate_tree import activate_until_end_of_test
 import unittest
 
 
@@ -6,6 +7,7 @@ class TestNodeBasicStructure(unittest.TestCase):
 
     def setUp(self):
         clean_up_and_initialize_resource_directories()
+        activate_until_end_of_test(self, BufferTree(B_buffer=41, M=349))
 
     def test_basic_node_writing_and_reading(self):
         new_node = TreeNode(is_internal_node=False)
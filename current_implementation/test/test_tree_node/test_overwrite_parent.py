@@ -1,10 +1,12 @@
 import unittest
 from current_implementation.new_buffer_tree import *
+from current_implementation.test.activate_tree import activate_until_end_of_test
 
 
 class TestOverwriteParentID(unittest.TestCase):
     def setUp(self):
         clean_up_and_initialize_resource_directories()
+        activate_until_end_of_test(self, BufferTree(B_buffer=41, M=349))
 
     def test_parent_ids_equal_length(self):
         new_parent_id = 'a'
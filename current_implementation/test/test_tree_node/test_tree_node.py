@@ -1,6 +1,8 @@
+import random
 import unittest
 from current_implementation.new_buffer_tree import *
 from current_implementation.create_comparable_string import create_string_from_int_biggest_number
+from current_implementation.test.activate_tree import activate_until_end_of_test
 
 
 class TestTreeNode(unittest.TestCase):
@@ -88,12 +90,12 @@ class TestTreeNode(unittest.TestCase):
 
         write_leaf_block(old_leaf_ids[0], first_leaf_elements)
         write_leaf_block(old_leaf_ids[1], second_leaf_elements)
-        leaf_node = TreeNode(is_internal_node=False, children=old_leaf_ids, handles=first_leaf_elements[-1])
+        leaf_node = TreeNode(is_internal_node=False, children=old_leaf_ids, handles=[first_leaf_elements[-1]])
         sorted_id = get_new_sorted_id()
         append_to_sorted_buffer_elements_file(leaf_node.node_id, sorted_id, sorted_buffer_elements)
 
-        sorted_filepath = get_sorted_file_path_from_ids(leaf_node.node_id, sorted_id)
-        leaf_node.merge_sorted_buffer_with_leaf_blocks(sorted_filepath)
+        sorted_buffer_element_deques = group_buffer_elements_into_deques(iterate_merged_sorted_files(leaf_node.node_id, [sorted_id], tree.M), tree.B_leaf)
+        leaf_node.merge_sorted_buffer_deques_with_leaf_blocks(sorted_buffer_element_deques)
 
         all_elements_before_unsorted = []
         all_elements_before_unsorted.extend(first_leaf_elements)
@@ -138,12 +140,12 @@ class TestTreeNode(unittest.TestCase):
 
         write_leaf_block(old_leaf_ids[0], first_leaf_elements)
         write_leaf_block(old_leaf_ids[1], second_leaf_elements)
-        leaf_node = TreeNode(is_internal_node=False, children=old_leaf_ids, handles=first_leaf_elements[-1])
+        leaf_node = TreeNode(is_internal_node=False, children=old_leaf_ids, handles=[first_leaf_elements[-1]])
         sorted_id = get_new_sorted_id()
         append_to_sorted_buffer_elements_file(leaf_node.node_id, sorted_id, sorted_buffer_elements)
 
-        sorted_filepath = get_sorted_file_path_from_ids(leaf_node.node_id, sorted_id)
-        leaf_node.merge_sorted_buffer_with_leaf_blocks(sorted_filepath)
+        sorted_buffer_element_deques = group_buffer_elements_into_deques(iterate_merged_sorted_files(leaf_node.node_id, [sorted_id], tree.M), tree.B_leaf)
+        leaf_node.merge_sorted_buffer_deques_with_leaf_blocks(sorted_buffer_element_deques)
 
         expected_split_keys_as_int = [tree.B_buffer - 1, 2 * tree.B_buffer - 1, int(3.5 * tree.B_buffer) - 2]
         expected_split_keys = [create_string_from_int_biggest_number(i, biggest_int) for i in expected_split_keys_as_int]
@@ -164,6 +166,35 @@ class TestTreeNode(unittest.TestCase):
         self.assertEqual(reloaded_leaf_lists[2], expected_third_leaf)
         self.assertEqual(reloaded_leaf_lists[3], expected_fourth_leaf)
 
+    def test_merge_buffer_with_leaf_blocks_streaming(self):
+        tree = activate_until_end_of_test(self, BufferTree(B_buffer=41, M=349))
+        # -> m = 8, so more than 7 buffer blocks don't fit into internal memory at once
+        biggest_int = 2000
+        for amount_buffer_blocks in [3, 20]:
+            old_leaf_ids = [generate_new_leaf_id(), generate_new_leaf_id()]
+            old_leaf_ints = list(range(0, biggest_int, 25))
+            write_leaf_block(old_leaf_ids[0], [create_string_from_int_biggest_number(i, biggest_int) for i in old_leaf_ints[:len(old_leaf_ints) // 2]])
+            write_leaf_block(old_leaf_ids[1], [create_string_from_int_biggest_number(i, biggest_int) for i in old_leaf_ints[len(old_leaf_ints) // 2:]])
+            leaf_node = TreeNode(is_internal_node=False, children=old_leaf_ids, handles=[create_string_from_int_biggest_number(old_leaf_ints[len(old_leaf_ints) // 2 - 1], biggest_int)])
+
+            expected_ints = set(old_leaf_ints)
+            buffer_elements = []
+            for i in random.sample(range(biggest_int), amount_buffer_blocks * tree.B_buffer):
+                action = random.choice([Action.INSERT, Action.DELETE])
+                buffer_elements.append(BufferElement(create_string_from_int_biggest_number(i, biggest_int), action))
+                if action == Action.INSERT:
+                    expected_ints.add(i)
+                else:
+                    expected_ints.discard(i)
+            leaf_node.add_elements_to_buffer(buffer_elements)
+
+            leaf_node.merge_sorted_buffer_deques_with_leaf_blocks(leaf_node.everything_for_external_merge_sort_get_sorted_deques())
+
+            reloaded_leaf_elements = [element for leaf_id in leaf_node.children_ids for element in read_leaf_block_elements_as_deque(leaf_id)]
+            self.assertEqual([create_string_from_int_biggest_number(i, biggest_int) for i in sorted(expected_ints)], reloaded_leaf_elements)
+            self.assertEqual([], leaf_node.buffer_block_ids)
+            self.assertFalse([file_name for file_name in os.listdir(get_node_dir_path_from_id(leaf_node.node_id)) if file_name.startswith(SORTED_STRING)])
+
     def test_creating_root_buffer(self):
         tree = self.create_dummy_tree()
         root_node_id = tree.root_node_id
@@ -214,6 +245,7 @@ class TestTreeNode(unittest.TestCase):
         self.assertEqual(0, root_node.last_buffer_size)
 
     def test_identify_handles_and_split_keys_to_be_inserted_non_empty_node(self):
+        self.create_dummy_tree()
         num_children_before = 3
         old_children_ids = [str(i) for i in range(num_children_before)]
         old_split_keys = [str(i)*4 for i in range(num_children_before - 1)]
@@ -236,6 +268,7 @@ class TestTreeNode(unittest.TestCase):
         self.assertEqual(old_split_keys, some_node.handles)
 
     def test_identify_handles_and_split_keys_to_be_inserted_empty_node(self):
+        self.create_dummy_tree()
         num_children_before = 0
         num_new_children = 2
         new_children_ids = [str(i) for i in range(num_new_children)]
@@ -253,13 +286,12 @@ class TestTreeNode(unittest.TestCase):
         self.assertEqual([new_children_ids[0]], some_node.children_ids)
         self.assertEqual([], some_node.handles)
 
-    @staticmethod
-    def create_dummy_tree():
+    def create_dummy_tree(self):
         M = 2 * 4096
         B = 1024
         # m = 8
 
-        return BufferTree(M=M, B_buffer=B)
+        return activate_until_end_of_test(self, BufferTree(M=M, B_buffer=B))
 
     def assert_list_is_incrementing_by_1(self, some_list_of_strings, failure_message):
         for i in range(1, len(some_list_of_strings)):
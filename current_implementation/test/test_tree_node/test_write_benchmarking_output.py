@@ -2,6 +2,7 @@ import unittest
 from current_implementation.new_buffer_tree import *
 from current_implementation.create_comparable_string import create_string_from_int_biggest_number
 from current_implementation.test.is_proper_tree import assert_is_proper_tree
+from current_implementation.test.activate_tree import activate_until_end_of_test
 """ Those aren't actual new unittests (kinda only what happens in test_big_test.py), but it's good for manually checking out the benchmark output."""
 
 
@@ -75,11 +76,10 @@ class BigTestsWithTracking(unittest.TestCase):
         tree.flush_all_buffers()
         tree.stop_tracking_handler()
 
-    @staticmethod
-    def create_dummy_tree():
+    def create_dummy_tree(self):
         M = 2 * 4096
         B = 1024
         # m = 8
 
-        return BufferTree(M=M, B_buffer=B)
+        return activate_until_end_of_test(self, BufferTree(M=M, B_buffer=B))
 
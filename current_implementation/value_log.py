@@ -0,0 +1,68 @@
+""" Values of key-value trees. Small values are carried through the buffers and stored in the leaf blocks as they are,
+values bigger than the threshold are appended to the value log once and only their (offset, length) reference travels down the tree.
+The value log is append-only, values of overwritten or deleted keys are not reclaimed."""
+import os
+import threading
+from collections import namedtuple
+from pathlib import Path
+from current_implementation.constants_and_helpers import VALUE_LOG_PATH
+
+ValueReference = namedtuple('ValueReference', ['offset', 'length'])
+
+# Values of up to this many bytes are stored inline
+DEFAULT_VALUE_LOG_THRESHOLD = 64
+
+
+class ValueLog:
+
+    def __init__(self, threshold=DEFAULT_VALUE_LOG_THRESHOLD, file_path=VALUE_LOG_PATH, size=None):
+        """ Without a size, a new log is created. Otherwise, the existing log is reopened and cut to size (the size at the last checkpoint)."""
+        if threshold < 0:
+            raise ValueError(f"Value log threshold must not be negative, but is {threshold}")
+
+        self.threshold = threshold
+        Path(os.path.dirname(file_path)).mkdir(parents=True, exist_ok=True)
+        if size is None:
+            self.file = open(file_path, 'w+b')
+            self.size = 0
+        else:
+            self.file = open(file_path, 'r+b')
+            self.file.truncate(size)
+            self.size = size
+        # Leaf buffers might be emptied by several threads at once, all of them reading and appending values
+        self.lock = threading.Lock()
+
+    def close(self):
+        self.file.close()
+
+    def sync(self):
+        with self.lock:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def store(self, value: bytes):
+        # Returns what is carried through the tree for the value: the value itself or a reference into the log
+        if type(value) is not bytes:
+            raise ValueError(f"Values must be bytes, but got {value!r}")
+        if len(value) <= self.threshold:
+            return value
+        return self.append(value)
+
+    def append(self, value: bytes) -> ValueReference:
+        with self.lock:
+            reference = ValueReference(self.size, len(value))
+            self.file.seek(self.size)
+            self.file.write(value)
+            self.size += len(value)
+            return reference
+
+    def read(self, reference: ValueReference) -> bytes:
+        with self.lock:
+            self.file.seek(reference.offset)
+            return self.file.read(reference.length)
+
+    def resolve(self, value):
+        # Inverse of store
+        if isinstance(value, ValueReference):
+            return self.read(value)
+        return value
@@ -0,0 +1,159 @@
+""" Append-only log of the insertions, deletions and combinations applied to a tree, written before they enter the tree buffer.
+Records are fsynced in groups: once group_commit_records records are pending or group_commit_interval seconds have passed since the last sync,
+so a crash loses at most the last (uncommitted) group. A background thread syncs pending records once the interval has passed, even if no further record is appended.
+A torn record at the end of the log is dropped when the log is recovered.
+The log starts with the number of the checkpoint it follows. Once a checkpoint is complete, the log is replaced by an empty one following it.
+Queries don't change the tree and are not logged."""
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+from current_implementation.buffer_element import Action
+from current_implementation.constants_and_helpers import get_current_timer_as_float
+
+# Number of the checkpoint the log follows (0 before the first one)
+LOG_HEADER = struct.Struct('<Q')
+# Length and crc32 of the record's payload
+RECORD_HEADER = struct.Struct('<II')
+# Action, whether a value follows the key, length of the key. Key and value (the rest of the payload) follow
+RECORD_PAYLOAD_HEADER = struct.Struct('<c?I')
+
+DEFAULT_GROUP_COMMIT_RECORDS = 100
+DEFAULT_GROUP_COMMIT_INTERVAL = 0.01
+
+
+def check_group_commit(group_commit_records, group_commit_interval):
+    if group_commit_records < 1:
+        raise ValueError(f"A group commit needs at least one record, but got {group_commit_records}")
+    if group_commit_interval < 0:
+        raise ValueError(f"Group commit interval must not be negative, but is {group_commit_interval}")
+
+
+def read_checkpoint_number(file_path):
+    # Number of the checkpoint the log at file_path follows, 0 if there is no (complete) log
+    if not os.path.exists(file_path) or os.path.getsize(file_path) < LOG_HEADER.size:
+        return 0
+    with open(file_path, 'rb') as f:
+        return LOG_HEADER.unpack(f.read(LOG_HEADER.size))[0]
+
+
+class WriteAheadLog:
+
+    def __init__(self, file_path, key_type, group_commit_records=DEFAULT_GROUP_COMMIT_RECORDS, group_commit_interval=DEFAULT_GROUP_COMMIT_INTERVAL):
+        """ Opens the log at file_path, or creates it. Records already in the log have to be replayed via recover before appending new ones."""
+        check_group_commit(group_commit_records, group_commit_interval)
+        self.file_path = file_path
+        self.key_type = key_type
+        self.group_commit_records = group_commit_records
+        self.group_commit_interval = group_commit_interval
+
+        Path(os.path.dirname(file_path)).mkdir(parents=True, exist_ok=True)
+        if os.path.exists(file_path) and os.path.getsize(file_path) >= LOG_HEADER.size:
+            self.checkpoint_number = read_checkpoint_number(file_path)
+            self.file = open(file_path, 'r+b')
+            self.file.seek(0, os.SEEK_END)
+        else:
+            self.checkpoint_number = 0
+            self.file = open(file_path, 'w+b')
+            self.file.write(LOG_HEADER.pack(self.checkpoint_number))
+
+        self.pending_records = 0
+        self.last_sync = get_current_timer_as_float()
+        # Guards the file and the pending records, which are shared with the flusher thread
+        self.lock = threading.Condition()
+        self.closed = False
+        self.flusher = threading.Thread(target=self.sync_after_interval, daemon=True)
+        self.flusher.start()
+
+    def recover(self, replay_from=LOG_HEADER.size):
+        """ Yields the complete records starting at offset replay_from (by default the first one) as (key, action, value),
+            reading the log a record at a time. Once all are yielded, the log is cut after the last complete record."""
+        self.file.seek(replay_from)
+        valid_size = replay_from
+        while True:
+            header = self.file.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                break
+            length, checksum = RECORD_HEADER.unpack(header)
+            payload = self.file.read(length)
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                break
+            valid_size += RECORD_HEADER.size + length
+            yield self.decode_record(payload)
+        # Later records would be hidden behind a torn one
+        self.file.truncate(valid_size)
+        self.file.seek(valid_size)
+
+    def decode_record(self, payload):
+        action, has_value, key_length = RECORD_PAYLOAD_HEADER.unpack_from(payload)
+        key_end = RECORD_PAYLOAD_HEADER.size + key_length
+        key = self.key_type.from_bytes(payload[RECORD_PAYLOAD_HEADER.size:key_end])
+        return key, Action(action.decode()), payload[key_end:] if has_value else None
+
+    def append(self, key, action, value=None):
+        key_bytes = self.key_type.to_bytes(key)
+        payload = RECORD_PAYLOAD_HEADER.pack(action.value.encode(), value is not None, len(key_bytes)) + key_bytes + (value or b'')
+        with self.lock:
+            self.file.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+            self.pending_records += 1
+            if self.pending_records >= self.group_commit_records or get_current_timer_as_float() - self.last_sync >= self.group_commit_interval:
+                self.sync()
+            elif self.pending_records == 1:
+                # The flusher thread waits for the first pending record of a group
+                self.lock.notify()
+
+    def size(self):
+        with self.lock:
+            return self.file.tell()
+
+    def sync(self):
+        # Commits all pending records with a single fsync
+        with self.lock:
+            if self.pending_records:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.pending_records = 0
+            self.last_sync = get_current_timer_as_float()
+
+    def start_after_checkpoint(self, checkpoint_number):
+        """ Replaces the log by an empty one following the (complete) checkpoint. The new log is in place atomically."""
+        with self.lock:
+            self.sync()
+            temporary_path = self.file_path + '.tmp'
+            with open(temporary_path, 'wb') as f:
+                f.write(LOG_HEADER.pack(checkpoint_number))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary_path, self.file_path)
+            directory = os.open(os.path.dirname(self.file_path), os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+
+            self.file.close()
+            self.file = open(self.file_path, 'r+b')
+            self.file.seek(0, os.SEEK_END)
+            self.checkpoint_number = checkpoint_number
+
+    def sync_after_interval(self):
+        # Main loop of the flusher thread, syncs pending records once group_commit_interval has passed since the last sync
+        with self.lock:
+            while not self.closed:
+                if not self.pending_records:
+                    self.lock.wait()
+                    continue
+                remaining = self.last_sync + self.group_commit_interval - get_current_timer_as_float()
+                if remaining > 0:
+                    self.lock.wait(remaining)
+                else:
+                    self.sync()
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.lock.notify()
+        self.flusher.join()
+        self.sync()
+        self.file.close()